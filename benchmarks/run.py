@@ -0,0 +1,376 @@
+# benchmarks/run.py
+# Benchmark harness for the vision and coaching hot paths. Everything runs on
+# synthetic data (benchmarks/synthetic.py, a throwaway SQLite history, a FAISS
+# index over generated text with the offline hashing embedder), so numbers are
+# reproducible without videos, YOLO weights or API keys.
+#
+#   python -m benchmarks.run                         # run, compare with benchmarks/baseline.json
+#   python -m benchmarks.run --save-baseline         # record a new baseline
+#   python -m benchmarks.run --quick --only geometry # smaller sizes, one group
+#
+# Case names carry their workload size, and the baseline keeps one entry per
+# mode (quick / default / full), so a run is only compared with the same work.
+# Times are the fastest repeat, scaled by a fixed reference workload timed next
+# to each group, so a machine that is busier than when the baseline was recorded
+# does not show up as a regression. A group that still looks slower is re-run
+# (--retries) before it counts. Exit code 1 when a case is slower than the
+# baseline by more than --tolerance and by more than --min-delta-ms.
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.synthetic import PROFILES, synthetic_trajectory  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+EXERCISES = tuple(PROFILES)
+# Default clip sizes (frames) and noise levels (pixel std, dropped-frame fraction)
+LENGTHS = (300, 3000)
+NOISE_LEVELS = ((0.0, 0.0), (3.0, 0.05))
+HISTORY_SIZES = (1_000, 10_000, 100_000)
+FULL_HISTORY_SIZES = HISTORY_SIZES + (1_000_000,)
+
+
+def measure(fn, repeat=5, number=1, warmup=1):
+    """Runs fn `number` times per sample; -> {"median_s", "min_s", "repeat", "number"} per call."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return {"median_s": statistics.median(samples), "min_s": min(samples), "repeat": repeat, "number": number}
+
+
+def _with_rate(result, items, unit):
+    result[f"{unit}_per_s"] = round(items / result["median_s"], 1) if result["median_s"] > 0 else None
+    return result
+
+
+def _reference_work(rng=np.random.default_rng(0)):
+    """Fixed mix of per-item Python and numpy work, timed to gauge how fast the machine is right now."""
+    x = rng.random((2000, 17, 2))
+    total = 0.0
+    for i in range(len(x)):
+        total += float(np.hypot(*(x[i, 5] - x[i, 7])))
+    return total + float(np.degrees(np.arctan2(x[..., 1], x[..., 0])).sum())
+
+
+def calibrate():
+    """Fastest time of the reference work; cases are compared relative to it."""
+    return measure(_reference_work, repeat=7)["min_s"]
+
+
+# ---------------- CASES ----------------
+def bench_geometry(quick=False):
+    """Per-frame calculate_angle + check-function path vs the vectorized one."""
+    from core.geometry import FORM_RULES, calculate_angle, calculate_angles, check_squat_form, evaluate_form
+
+    results = {}
+    for frames in LENGTHS[:1] if quick else LENGTHS:
+        kps = synthetic_trajectory("Squat", frames, reps=frames // 60)
+        hip, knee, ankle = kps[:, 11, :2], kps[:, 13, :2], kps[:, 15, :2]
+
+        def scalar():
+            for i in range(frames):
+                angle = calculate_angle(hip[i], knee[i], ankle[i])
+                check_squat_form(None, angle)
+
+        def vectorized():
+            angles = calculate_angles(hip, knee, ankle)
+            evaluate_form(FORM_RULES["Squat"], angles, 0)
+
+        results[f"geometry.scalar/{frames}"] = _with_rate(measure(scalar), frames, "frames")
+        results[f"geometry.vectorized/{frames}"] = _with_rate(measure(vectorized, number=20), frames, "frames")
+    return results
+
+
+def bench_state_machines(quick=False):
+    """Feature extraction + rep state machine per exercise, clip length and noise level."""
+    from core.trajectory import RepSegmenter, analyze_trajectory, compute_features, detect_exercise
+
+    results = {}
+    lengths = LENGTHS[:1] if quick else LENGTHS
+    for exercise in EXERCISES:
+        for frames in lengths:
+            for noise, dropout in NOISE_LEVELS:
+                kps = synthetic_trajectory(exercise, frames, reps=frames // 60, noise=noise, dropout=dropout)
+                name = f"{exercise}/{frames}/noise={noise:g}"
+                results[f"analyze.{name}"] = _with_rate(
+                    measure(lambda: analyze_trajectory(kps, exercise), number=5), frames, "frames")
+
+                # Streaming path, as process_video feeds it: batches of 4 frames
+                def streamed():
+                    segmenter = RepSegmenter(exercise)
+                    for start in range(0, frames, 4):
+                        segmenter.feed(compute_features(kps[start:start + 4], exercise))
+
+                results[f"stream.{name}"] = _with_rate(measure(streamed), frames, "frames")
+        kps = synthetic_trajectory(exercise, lengths[-1], reps=lengths[-1] // 60)
+        results[f"detect.{exercise}/{lengths[-1]}"] = _with_rate(
+            measure(lambda: detect_exercise(kps)), lengths[-1], "frames")
+    return results
+
+
+def _rep_rows(count, sessions=100, user_id="bench", seed=0):
+    rng = np.random.default_rng(seed)
+    session_ids = [f"bench-{seed}-{k}" for k in range(sessions)]
+    exercises = np.array(EXERCISES)
+    tags = np.array(["NONE", "NONE", "NONE", "SHALLOW_SQUAT", "ELBOW_SWINGING"])
+    now = time.time()
+    ts = np.sort(now - rng.uniform(0, 60 * 86400, count))
+    ex = exercises[rng.integers(0, len(exercises), count)]
+    tag = tags[rng.integers(0, len(tags), count)]
+    m1, m2 = rng.uniform(40, 170, count).round(2), rng.uniform(0, 90, count).round(2)
+    per_session = max(1, count // sessions)
+    return [
+        (float(ts[i]), session_ids[min(i // per_session, sessions - 1)], user_id, None, str(ex[i]),
+         i % per_session + 1, float(m1[i]), float(m2[i]), str(tag[i]))
+        for i in range(count)
+    ]
+
+
+def bench_logging(quick=False):
+    """WorkoutLogger.log_rep throughput (buffered inserts into the SQLite store)."""
+    from utils.csv_handler import WorkoutLogger
+
+    reps = 2_000 if quick else 20_000
+    results = {}
+    for flush_every in (1, 32):
+        logger = WorkoutLogger(filename=f"data/bench/log_{flush_every}.sqlite", user_id="bench",
+                               flush_every=flush_every)
+        count = reps // 10 if flush_every == 1 else reps
+
+        def log():
+            logger.start_session()
+            for i in range(count):
+                logger.log_rep("Squat", i + 1, 92.5, 0.0, "NONE")
+            logger.flush()
+
+        results[f"log_rep/flush_every={flush_every}/{count}"] = _with_rate(measure(log, repeat=3), count, "reps")
+    return results
+
+
+def bench_summary(quick=False, full=False):
+    """generate_workout_summary (last session and all time) over histories of growing size."""
+    from utils.helpers import generate_training_history, generate_workout_summary
+    from utils.workout_store import get_workout_store
+
+    store = get_workout_store()
+    results, logged = {}, 0
+    sizes = HISTORY_SIZES[:2] if quick else FULL_HISTORY_SIZES if full else HISTORY_SIZES
+    for size in sizes:
+        rows = _rep_rows(size - logged, seed=size)
+        for start in range(0, len(rows), 50_000):
+            store.append(rows[start:start + 50_000])
+        logged = size
+        results[f"summary.last_session/{size}"] = measure(lambda: generate_workout_summary(), number=20)
+        results[f"summary.all_time/{size}"] = measure(lambda: generate_workout_summary(since=0), number=20)
+        results[f"summary.training_history/{size}"] = measure(lambda: generate_training_history(), number=10)
+    return results
+
+
+def _corpus(chunks, seed=0):
+    rng = np.random.default_rng(seed)
+    words = ("squat depth knee valgus hip hinge lumbar flexion shear torque elbow swinging curl press lockout "
+             "deadlift bar path spine neutral glute hamstring quadriceps ankle dorsiflexion shoulder scapula "
+             "tendon load volume intensity fatigue recovery injury risk biomechanics moment arm").split()
+    return [" ".join(rng.choice(words, 120)) + f" (study {i})" for i in range(chunks)]
+
+
+def bench_retrieval(quick=False):
+    """KnowledgeBase.query over a generated corpus with the offline hashing embedder."""
+    from langchain_community.vectorstores import FAISS
+    from nlp.embeddings import HashingEmbeddings
+    from nlp.rag_engine import KnowledgeBase, save_index, save_lexical_index
+    from nlp.retrieval_cache import RetrievalCache
+
+    embeddings = HashingEmbeddings()
+    results = {}
+    for chunks in (500,) if quick else (500, 5_000):
+        kb = KnowledgeBase(None, embeddings=embeddings, retrieval_cache=False)
+        kb.db_path = f"data/bench/faiss_{chunks}"
+        save_index(FAISS.from_texts(_corpus(chunks), embeddings), kb.db_path)
+        queries = ["why does knee valgus matter in a squat", "ELBOW_SWINGING on curls", "deadlift lumbar flexion"]
+        kb.query(queries[0])  # index load is per process, not per query
+
+        results[f"kb.query.uncached/{chunks}"] = _with_rate(
+            measure(lambda: [kb.query(q) for q in queries], number=10), len(queries), "queries")
+        kb.retrieval_cache = RetrievalCache()
+        results[f"kb.query.cached/{chunks}"] = _with_rate(
+            measure(lambda: [kb.query(q) for q in queries], number=50), len(queries), "queries")
+
+        # With the BM25 index next to FAISS: error-tag queries skip the embedding, the rest fuse both
+        vectorstore = FAISS.load_local(kb.db_path, embeddings, allow_dangerous_deserialization=True)
+        results[f"lexical.build/{chunks}"] = measure(lambda: save_lexical_index(vectorstore, kb.db_path), number=3)
+        kb.retrieval_cache = False
+        kb.query(queries[0])
+        results[f"kb.query.hybrid/{chunks}"] = _with_rate(
+            measure(lambda: [kb.query(q) for q in queries], number=10), len(queries), "queries")
+    return results
+
+
+GROUPS = {
+    "geometry": bench_geometry,
+    "state_machines": bench_state_machines,
+    "logging": bench_logging,
+    "summary": bench_summary,
+    "retrieval": bench_retrieval,
+}
+
+
+# ---------------- REPORT ----------------
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run_mode(quick=False, full=False):
+    return "quick" if quick else "full" if full else "default"
+
+
+def baseline_runs(baseline):
+    """{mode: report} of a baseline file (older files hold a single report)."""
+    if "runs" in baseline:
+        return baseline["runs"]
+    return {run_mode(baseline.get("quick", False)): baseline}
+
+
+def compare(results, baseline, tolerance=0.25, min_delta=0.0001):
+    """
+    Cases whose fastest repeat, scaled to the machine speed of the baseline run
+    (see calibrate), is slower than the baseline's by more than `tolerance` and
+    by more than `min_delta` seconds -> [(case, baseline_s, now_s, ratio)].
+    """
+    regressions = []
+    for case, result in results.items():
+        before = baseline.get(case)
+        if not before or not before.get("min_s"):
+            continue
+        now = result["min_s"]
+        if result.get("reference_s") and before.get("reference_s"):
+            now *= before["reference_s"] / result["reference_s"]
+        ratio = now / before["min_s"]
+        if ratio > 1 + tolerance and now - before["min_s"] > min_delta:
+            regressions.append((case, before["min_s"], now, round(ratio, 2)))
+    return regressions
+
+
+def _relative(result):
+    return result["min_s"] / result.get("reference_s", 1.0)
+
+
+def run_group(name, quick=False, full=False):
+    """One benchmark group in its own scratch dir (workout store, indexes and caches use relative paths)."""
+    with tempfile.TemporaryDirectory(prefix="fitness-bench-") as scratch:
+        cwd = os.getcwd()
+        os.chdir(scratch)
+        try:
+            reference = calibrate()
+            bench = GROUPS[name]
+            group = bench(quick, full) if name == "summary" else bench(quick)
+        finally:
+            os.chdir(cwd)
+    for result in group.values():
+        result["reference_s"] = reference
+    return group
+
+
+def _print_group(name, group):
+    print(f"[{name}]", file=sys.stderr)
+    for case, result in group.items():
+        rate = next((f"{v} {k[:-6]}/s" for k, v in result.items() if k.endswith("_per_s")), "")
+        print(f"  {case:<48} {1000 * result['median_s']:10.3f} ms  {rate}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the vision and coaching hot paths.")
+    parser.add_argument("--only", nargs="+", choices=list(GROUPS), help="benchmark groups to run (default: all)")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for a fast sanity run")
+    parser.add_argument("--full", action="store_true", help="include the 1M-rep workout history")
+    parser.add_argument("--output", default=None, help="write results JSON here")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="slowdowns smaller than this many ms never count as regressions")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="re-run groups with regressions this many times, keeping each case's best run "
+                             "(with --save-baseline: extra runs, keeping each case's median)")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline)
+    mode = run_mode(args.quick, args.full)
+    runs = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            runs = baseline_runs(json.load(f))
+    baseline = runs.get(mode, {}).get("results", {})
+    min_delta = args.min_delta_ms / 1000
+
+    results = {}
+    for name in args.only or GROUPS:
+        if args.save_baseline:
+            # A baseline from one unusually fast run fails every later run: store each case's median run
+            runs_of_group = [run_group(name, args.quick, args.full) for _ in range(1 + args.retries)]
+            group = {case: sorted((run[case] for run in runs_of_group), key=_relative)[len(runs_of_group) // 2]
+                     for case in runs_of_group[0]}
+            _print_group(name, group)
+            results.update(group)
+            continue
+        group = run_group(name, args.quick, args.full)
+        _print_group(name, group)
+        # A busy machine makes whole runs slow: confirm a regression before reporting it
+        for attempt in range(args.retries):
+            if not compare(group, baseline, args.tolerance, min_delta):
+                break
+            print(f"  (slower than the baseline, re-running {name}: {attempt + 1}/{args.retries})", file=sys.stderr)
+            again = run_group(name, args.quick, args.full)
+            group = {case: min(result, again.get(case, result), key=_relative) for case, result in group.items()}
+        results.update(group)
+
+    report = {"environment": environment(), "mode": mode, "results": results}
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        # Only this mode's entry is replaced; a partial run (--only) keeps the other groups' cases
+        runs[mode] = {**report, "results": {**baseline, **results}}
+        with open(baseline_path, "w") as f:
+            json.dump({"runs": runs}, f, indent=2)
+        print(f"Baseline ({mode}) saved to {baseline_path}", file=sys.stderr)
+        return 0
+
+    if not baseline:
+        print(f"No {mode} baseline to compare against (run with --save-baseline).", file=sys.stderr)
+        return 0
+    regressions = compare(results, baseline, args.tolerance, min_delta)
+    for case, before, now, ratio in regressions:
+        print(f"REGRESSION {case}: {1000 * before:.3f} ms -> {1000 * now:.3f} ms ({ratio}x, speed-adjusted)",
+              file=sys.stderr)
+    if not regressions:
+        print(f"No regressions vs the {mode} baseline in {baseline_path} (tolerance {args.tolerance:.0%}, "
+              f"{args.min_delta_ms:g} ms).", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# benchmarks/synthetic.py
+# Synthetic YOLO-style keypoint clips, so rep counting can be exercised and
+# timed without a video or a pose model. A clip is a standing figure whose
+# driving joint angle (see core.exercises) swings between a rest and a working
+# angle `reps` times, plus pixel noise, jittered confidences and dropped frames.
+import numpy as np
+
+NUM_KEYPOINTS = 17
+
+# Standing figure facing right, (x, y) pixels in a 640x480 frame
+_STANDING = np.array([
+    [330, 90], [335, 85], [325, 85], [340, 88], [320, 88],   # nose, eyes, ears
+    [345, 130], [315, 130],                                 # shoulders
+    [348, 190], [312, 190],                                 # elbows
+    [350, 245], [310, 245],                                 # wrists
+    [340, 260], [320, 260],                                 # hips
+    [342, 350], [318, 350],                                 # knees
+    [340, 440], [320, 440],                                 # ankles
+], dtype=np.float64)
+
+# Angle swing per exercise: (rest angle, working angle), degrees
+PROFILES = {
+    "Squat": (170.0, 85.0),
+    "Bicep Curl": (170.0, 40.0),
+    "Overhead Press": (170.0, 70.0),
+    "Deadlift": (172.0, 95.0),
+}
+SEGMENT = 90.0
+
+
+def angle_profile(frames, reps, rest, work):
+    """rest -> work -> rest, `reps` times over `frames` frames (cosine easing)."""
+    t = np.arange(frames) / max(frames, 1)
+    return work + (rest - work) * (0.5 + 0.5 * np.cos(2 * np.pi * reps * t))
+
+
+def _place(origin, direction_deg, length=SEGMENT):
+    """Points `length` px from origin at direction_deg (0 = right, 90 = up on screen)."""
+    rad = np.radians(direction_deg)
+    return np.stack([origin[..., 0] + length * np.cos(rad), origin[..., 1] - length * np.sin(rad)], axis=-1)
+
+
+def _pose(exercise, angle):
+    """(frames, 17, 2) figure with the exercise's driving angle set to `angle` per frame."""
+    n = len(angle)
+    xy = np.repeat(_STANDING[None], n, axis=0)
+    if exercise == "Squat":
+        for hip, knee, ankle, shoulder in ((11, 13, 15, 5), (12, 14, 16, 6)):
+            xy[:, ankle] = _place(xy[:, knee], -90)
+            xy[:, hip] = _place(xy[:, knee], -90 + angle)
+            xy[:, shoulder] = _place(xy[:, hip], 100, 130)
+            # Back squat grip: elbows bent, hands by the shoulders, riding along with them
+            xy[:, shoulder + 2] = _place(xy[:, shoulder], -120, 50)
+            xy[:, shoulder + 4] = _place(xy[:, shoulder + 2], 120, 45)
+    elif exercise == "Bicep Curl":
+        for shoulder, elbow, wrist in ((5, 7, 9), (6, 8, 10)):
+            xy[:, elbow] = _place(xy[:, shoulder], -90, 60)
+            xy[:, wrist] = _place(xy[:, elbow], 90 - angle, 55)
+    elif exercise == "Overhead Press":
+        for shoulder, elbow, wrist in ((5, 7, 9), (6, 8, 10)):
+            # Upper arm out and slightly up; forearm swings from folded down to overhead
+            xy[:, elbow] = _place(xy[:, shoulder], 20 if shoulder == 5 else 160, 55)
+            side = -1 if shoulder == 5 else 1
+            xy[:, wrist] = _place(xy[:, elbow], (200 if shoulder == 5 else -20) + side * angle, 55)
+    elif exercise == "Deadlift":
+        for shoulder, hip, knee, ankle in ((5, 11, 13, 15), (6, 12, 14, 16)):
+            # Straight-ish legs, torso hinging forward at the hip
+            xy[:, shoulder] = _place(xy[:, hip], -90 + angle, 130)
+            xy[:, knee] = _place(xy[:, hip], -92, 90)
+            xy[:, ankle] = _place(xy[:, knee], -90, 90)
+            # Straight arms hanging from the shoulders
+            xy[:, shoulder + 2] = _place(xy[:, shoulder], -90, 60)
+            xy[:, shoulder + 4] = _place(xy[:, shoulder + 2], -90, 55)
+    else:
+        raise ValueError(f"Unknown exercise type: {exercise}")
+    return xy
+
+
+def synthetic_trajectory(exercise="Squat", frames=600, reps=10, noise=0.0, dropout=0.0, seed=0):
+    """
+    (frames, 17, 3) float32 keypoints (x, y, conf) of `reps` clean reps.
+    noise: gaussian pixel noise (std); dropout: fraction of frames with no person.
+    """
+    rng = np.random.default_rng(seed)
+    rest, work = PROFILES[exercise]
+    xy = _pose(exercise, angle_profile(frames, reps, rest, work))
+    if noise > 0:
+        xy = xy + rng.normal(0.0, noise, xy.shape)
+    kps = np.zeros((frames, NUM_KEYPOINTS, 3), dtype=np.float32)
+    kps[..., :2] = xy
+    kps[..., 2] = rng.uniform(0.6, 1.0, (frames, NUM_KEYPOINTS))
+    if dropout > 0:
+        kps[rng.random(frames) < dropout] = 0
+    return kps
@@ -0,0 +1,197 @@
+# core/backends.py
+# Optimized CPU runtimes for the pose model. The PyTorch weights are exported
+# once to ONNX (ONNX Runtime) or OpenVINO, optionally INT8, and the artifact is
+# kept next to the weights. Ultralytics loads those artifacts behind the same
+# YOLO interface, so callers get the same Results (keypoints.xy / .conf) either way.
+#
+#   python -m core.backends --backend onnx --int8 --check sample.mp4   # export + parity check
+#   POSE_BACKEND=onnx POSE_INT8=1 streamlit run ui/app.py
+import argparse
+import logging
+import os
+import sys
+import threading
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+log = logging.getLogger("fitness.backends")
+
+_EXPORT_LOCK = threading.Lock()
+
+
+def resolve_backend(backend=None, int8=None, model_path=None):
+    """
+    Explicit args > POSE_BACKEND / POSE_INT8 env vars > torch, fp32. -> (backend, int8)
+
+    POSE_INT8 only applies once the INT8 export of model_path exists, i.e. after
+    `python -m core.backends --int8` (ideally with --check) has been run for it;
+    until then the app and batch runner keep to fp32.
+    """
+    backend = (backend or os.getenv("POSE_BACKEND") or "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown pose backend: {backend} (expected one of {BACKENDS})")
+    if backend == "torch":
+        return backend, False
+    if int8 is None:
+        int8 = os.getenv("POSE_INT8", "0") == "1"
+        if int8 and model_path and not os.path.exists(exported_path(model_path, backend, True)):
+            log.warning("POSE_INT8 ignored: no INT8 %s export of %s yet (python -m core.backends --backend %s "
+                        "--int8 --check VIDEO)", backend, model_path, backend)
+            int8 = False
+    return backend, bool(int8)
+
+
+def exported_path(model_path, backend, int8=False):
+    """Where the exported artifact of a weight file lives (next to the weights)."""
+    root = os.path.splitext(model_path)[0]
+    if backend == "onnx":
+        return f"{root}-int8.onnx" if int8 else f"{root}.onnx"
+    if backend == "openvino":
+        # Ultralytics' own naming for OpenVINO exports
+        return f"{root}_int8_openvino_model" if int8 else f"{root}_openvino_model"
+    return model_path
+
+
+def _is_current(target, model_path):
+    if not os.path.exists(target):
+        return False
+    # Weights not downloaded yet (e.g. yolov8n-pose.pt): any existing export will do
+    return not os.path.isfile(model_path) or os.path.getmtime(target) >= os.path.getmtime(model_path)
+
+
+def export_model(model_path, backend="onnx", int8=False, data=None, force=False):
+    """
+    Exports the weights for `backend` unless a current export exists; returns the
+    artifact path. Exports use dynamic input shapes, so batches and the smaller
+    ROI crops (core.roi) work like with the PyTorch model.
+
+    INT8: OpenVINO quantizes statically during export (`data` is the calibration
+    dataset yaml, Ultralytics' default for pose otherwise); ONNX gets dynamic
+    weight quantization through onnxruntime.
+    """
+    if backend == "torch":
+        return model_path
+    target = exported_path(model_path, backend, int8)
+    with _EXPORT_LOCK:
+        if not force and _is_current(target, model_path):
+            return target
+        from ultralytics import YOLO
+
+        yolo = YOLO(model_path)
+        if backend == "onnx":
+            fp32 = yolo.export(format="onnx", dynamic=True, simplify=True)
+            if int8:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+                quantize_dynamic(fp32, target, weight_type=QuantType.QUInt8)
+            elif os.path.abspath(fp32) != os.path.abspath(target):
+                os.replace(fp32, target)
+        else:
+            kwargs = {"data": data} if data else {}
+            exported = yolo.export(format="openvino", dynamic=True, int8=int8, **kwargs)
+            if os.path.abspath(exported.rstrip(os.sep)) != os.path.abspath(target):
+                os.replace(exported, target)
+    return target
+
+
+def _athlete_rows(results):
+    """Biggest person's (17, 3) keypoint row per result, zeros where nobody was found."""
+    rows = np.zeros((len(results), 17, 3), dtype=np.float32)
+    for i, result in enumerate(results):
+        if len(result.keypoints) == 0 or result.keypoints.conf is None:
+            continue
+        boxes = result.boxes.xyxy.cpu().numpy()
+        best = int(np.argmax((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])))
+        rows[i, :, :2] = result.keypoints.xy[best].cpu().numpy()
+        rows[i, :, 2] = result.keypoints.conf[best].cpu().numpy()
+    return rows
+
+
+def check_parity(frames, model_path=None, backend="onnx", int8=False, tolerance=None, batch_size=4):
+    """
+    Runs the PyTorch model and the exported backend on the same frames and
+    compares the joint angles every exercise would feed its state machine.
+    Returns {"frames", "compared", "max_diff": {exercise: degrees}, "mean_diff", "tolerance", "ok"}.
+    """
+    from core.exercises import EXERCISES
+    from core.trajectory import compute_features
+    from core.vision import SharedPoseModel, resolve_model_path
+
+    model_path = resolve_model_path(model_path)
+    if tolerance is None:
+        tolerance = 8.0 if int8 else 3.0
+    reference = SharedPoseModel(model_path, backend="torch")
+    candidate = SharedPoseModel(model_path, backend=backend, int8=int8)
+
+    def rows(model):
+        results = []
+        for start in range(0, len(frames), batch_size):
+            results.extend(model(frames[start:start + batch_size], verbose=False))
+        return _athlete_rows(results)
+
+    ref_rows, new_rows = rows(reference), rows(candidate)
+    max_diff, mean_diff, compared = {}, {}, 0
+    for name in EXERCISES:
+        ref, new = compute_features(ref_rows, name), compute_features(new_rows, name)
+        both = ref["valid"] & new["valid"]
+        diff = np.abs(ref["angle"][both] - new["angle"][both])
+        compared = max(compared, int(both.sum()))
+        max_diff[name] = round(float(diff.max()), 2) if diff.size else None
+        mean_diff[name] = round(float(diff.mean()), 2) if diff.size else None
+    worst = max((d for d in max_diff.values() if d is not None), default=None)
+    return {
+        "frames": len(frames),
+        "compared": compared,
+        "max_diff": max_diff,
+        "mean_diff": mean_diff,
+        "tolerance": tolerance,
+        "ok": worst is not None and worst <= tolerance,
+    }
+
+
+def _read_frames(path, limit, width=640):
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (width, int(frame.shape[0] * (width / frame.shape[1])))))
+    cap.release()
+    return frames
+
+
+def main(argv=None):
+    from core.vision import resolve_model_path
+
+    parser = argparse.ArgumentParser(description="Export the pose model to an optimized CPU runtime.")
+    parser.add_argument("--backend", default="onnx", choices=BACKENDS[1:])
+    parser.add_argument("--int8", action="store_true", help="INT8 quantization")
+    parser.add_argument("--model", default=None, help="pose weights (default: see core/vision.py)")
+    parser.add_argument("--data", default=None, help="calibration dataset yaml for OpenVINO INT8")
+    parser.add_argument("--force", action="store_true", help="re-export even if a current export exists")
+    parser.add_argument("--check", default=None, metavar="VIDEO",
+                        help="compare joint angles against the PyTorch model on this video")
+    parser.add_argument("--frames", type=int, default=120, help="frames of VIDEO to compare")
+    args = parser.parse_args(argv)
+
+    model_path = resolve_model_path(args.model)
+    target = export_model(model_path, args.backend, args.int8, data=args.data, force=args.force)
+    print(f"Exported {model_path} -> {target}", file=sys.stderr)
+    if not args.check:
+        return 0
+
+    frames = _read_frames(args.check, args.frames)
+    if not frames:
+        parser.error(f"could not read frames from {args.check}")
+    report = check_parity(frames, model_path, args.backend, args.int8)
+    print(f"Angles on {report['compared']}/{report['frames']} frames, max |diff| (deg): {report['max_diff']}, "
+          f"mean: {report['mean_diff']} -> {'OK' if report['ok'] else 'FAIL'} (tolerance {report['tolerance']})",
+          file=sys.stderr)
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
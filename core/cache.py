@@ -0,0 +1,109 @@
+# core/cache.py
+# On-disk cache of per-frame keypoints, so re-analysing a clip we have
+# already seen (new exercise, new thresholds, server restart) skips YOLO.
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+# Bump when the stored keypoints change meaning (v2: biggest person is the athlete)
+CACHE_VERSION = "v2"
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def model_fingerprint(model_path):
+    """
+    Resolved path + size + mtime of the weights (or exported model), so retrained
+    weights under the same name, or same-named files in other folders, never share
+    entries. A name that is not on disk (downloaded by the hub) is used as-is.
+    """
+    path = os.path.realpath(str(model_path))
+    try:
+        st = os.stat(path)
+    except OSError:
+        return str(model_path)
+    return f"{path}|{st.st_size}|{st.st_mtime_ns}"
+
+
+class KeypointCache:
+    """
+    One .npy file per clip holding its (frames, 17, 3) keypoint tensor.
+    Entries are keyed by video content hash + model fingerprint, loaded memory-mapped,
+    and evicted least-recently-used first once the folder grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir="data/cache/keypoints", max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, video_hash, model_path):
+        raw = f"{CACHE_VERSION}|{video_hash}|{model_fingerprint(model_path)}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key):
+        """Returns the cached tensor (read-only memmap) or None."""
+        path = self._path(key)
+        try:
+            kps = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        # Touch the file so eviction treats it as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return kps
+
+    def put(self, key, kps):
+        """Stores a tensor atomically, then trims the cache to size."""
+        kps = np.ascontiguousarray(kps, dtype=np.float32)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, kps)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Deletes least-recently-used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy"):
+                os.remove(os.path.join(self.cache_dir, name))
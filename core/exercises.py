@@ -0,0 +1,136 @@
+# core/exercises.py
+# Declarative exercise table. Each entry says which joints to read, which
+# joint angle drives the rep, where the phase changes happen, which peak
+# values to keep during a rep and how to grade them. core/trajectory.py turns
+# an entry into vectorized features and a rep state machine, so adding an
+# exercise means adding an entry here, not touching the processing loop.
+from core.geometry import (FORM_RULES, calculate_angles, calculate_heights, calculate_inclinations,
+                           calculate_swing_scores)
+
+# Pseudo exercise: score every entry on the same keypoints and keep the best fit
+AUTO_DETECT = "Auto"
+
+# YOLO keypoint indices of each joint as (left, right)
+JOINTS = {
+    "shoulder": (5, 6),
+    "elbow": (7, 8),
+    "wrist": (9, 10),
+    "hip": (11, 12),
+    "knee": (13, 14),
+    "ankle": (15, 16),
+}
+
+# Extra per-frame signals: joints they read and the (vectorized) function of those joints
+SIGNALS = {
+    "swing": (("shoulder", "elbow", "hip"), calculate_swing_scores),
+    "back": (("shoulder", "hip"), calculate_inclinations),
+    "knee": (("hip", "knee", "ankle"), calculate_angles),
+    "wrist_height": (("shoulder", "wrist", "hip"), calculate_heights),
+}
+
+# What one unit of detect margin is worth per signal: angles in 45 degree steps,
+# wrist height in half torso lengths
+DETECT_SCALES = {"angle": 45.0, "knee": 45.0, "back": 45.0, "swing": 0.5, "wrist_height": 0.5}
+
+# Every entry:
+#   side        - "left", or "auto" to use whichever side YOLO is more sure about
+#   angle       - (a, b, c) joints; the angle at b drives the phases ("angle" signal)
+#   signals     - extra SIGNALS to compute
+#   thresholds  - phase transition angles (degrees), overridable per call
+#   initial     - stage at the start of a clip
+#   start       - (from stage, op, threshold, to stage): enters the working phase
+#   finish      - (from stage, op, threshold, to stage): completes a rep
+#   track       - peak values kept during a rep: signal, "min"/"max", the stage it is
+#                 tracked in and its reset value. Tracked after the start check unless
+#                 "before_start" is set.
+#   metrics     - tracked values logged as (primary, secondary); None logs 0
+#   rules       - FORM_RULES entry grading (primary, secondary)
+#   peak_regions - (side, threshold) ranges where a metric peaks (used by core/stride.py)
+#   detect      - (signal, percentile, op, value) that must hold over a clip for
+#                 auto-detection to pick this exercise. When several exercises fit,
+#                 the one whose weakest condition holds by the widest margin wins
+#                 (margins are in DETECT_SCALES units, so degrees and heights compare)
+EXERCISES = {
+    "Squat": {
+        "side": "left",
+        "angle": ("hip", "knee", "ankle"),
+        "signals": (),
+        "thresholds": {"down": 140, "up": 150},
+        "initial": "up",
+        "start": ("up", "<", "down", "down"),
+        "finish": ("down", ">", "up", "up"),
+        "track": {
+            "depth": {"signal": "angle", "keep": "min", "stage": "down", "reset": 180.0},
+        },
+        "metrics": ("depth", None),
+        "rules": FORM_RULES["Squat"],
+        "peak_regions": (("below", "down"),),
+        "detect": (("angle", 5, "<", 115),),
+    },
+    "Bicep Curl": {
+        "side": "auto",
+        "angle": ("shoulder", "elbow", "wrist"),
+        "signals": ("swing", "wrist_height", "knee"),
+        "thresholds": {"flex": 140, "extend": 155},
+        "initial": "up",
+        "start": ("down", "<", "flex", "up"),
+        "finish": ("up", ">", "extend", "down"),
+        "track": {
+            "swing": {"signal": "swing", "keep": "max", "stage": "up", "reset": 0.0, "before_start": True},
+            "peak": {"signal": "angle", "keep": "min", "stage": "up", "reset": 180.0},
+        },
+        "metrics": ("peak", "swing"),
+        "rules": FORM_RULES["Bicep Curl"],
+        "peak_regions": (("below", "flex"),),
+        # The elbow really bends, the hands stay below the shoulders and the legs
+        # stay straight (a back squat also keeps the elbows bent and the wrists low)
+        "detect": (("angle", 5, "<", 100), ("wrist_height", 95, "<", 0.2), ("knee", 5, ">", 150)),
+    },
+    "Overhead Press": {
+        "side": "auto",
+        "angle": ("shoulder", "elbow", "wrist"),
+        "signals": ("wrist_height", "knee"),
+        "thresholds": {"lockout": 150, "bottom": 100},
+        "initial": "up",
+        "start": ("down", ">", "lockout", "up"),
+        "finish": ("up", "<", "bottom", "down"),
+        "track": {
+            "lockout": {"signal": "angle", "keep": "max", "stage": "up", "reset": 0.0},
+            "depth": {"signal": "angle", "keep": "min", "stage": "down", "reset": 180.0},
+        },
+        "metrics": ("lockout", "depth"),
+        "rules": FORM_RULES["Overhead Press"],
+        "peak_regions": (("above", "lockout"), ("below", "bottom")),
+        "detect": (("wrist_height", 95, ">", 0.2), ("knee", 5, ">", 150)),
+    },
+    "Deadlift": {
+        "side": "auto",
+        "angle": ("shoulder", "hip", "knee"),
+        "signals": ("back", "knee"),
+        "thresholds": {"down": 120, "lockout": 160},
+        "initial": "up",
+        "start": ("up", "<", "down", "down"),
+        "finish": ("down", ">", "lockout", "up"),
+        "track": {
+            "depth": {"signal": "angle", "keep": "min", "stage": "down", "reset": 180.0},
+            "back": {"signal": "back", "keep": "min", "stage": "down", "reset": 90.0},
+        },
+        "metrics": ("back", "depth"),
+        "rules": FORM_RULES["Deadlift"],
+        "peak_regions": (("below", "down"),),
+        # Hinge, not a squat: the knees stay fairly straight
+        "detect": (("knee", 5, ">", 110), ("angle", 5, "<", 140)),
+    },
+}
+
+
+def get_exercise(exercise_type):
+    try:
+        return EXERCISES[exercise_type]
+    except KeyError:
+        raise ValueError(f"Unknown exercise type: {exercise_type}") from None
+
+
+def resolve_thresholds(exercise_type, thresholds=None):
+    """The exercise's default thresholds with any overrides applied."""
+    return {**get_exercise(exercise_type)["thresholds"], **(thresholds or {})}
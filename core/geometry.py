@@ -1,6 +1,15 @@
 # Math logic (angle calculations, error detection)
+import operator
 import numpy as np
 
+# Comparison operators usable in the rule tables (work on scalars and arrays)
+COMPARE = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
 def calculate_angle(a, b, c):
     if np.any(a == 0) or np.any(b == 0) or np.any(c == 0):
         return None
@@ -17,86 +26,144 @@ def calculate_angle(a, b, c):
         
     return angle
 
-def check_squat_form(hip_angle, knee_angle):
+def calculate_angles(a, b, c):
     """
-    Evaluates the peak depth of a completed repetition.
+    Vectorized calculate_angle for whole clips.
+    a, b, c are (..., 2) arrays of joint coordinates; returns the angle at b
+    for every row, with NaN wherever a joint is missing (a 0 coordinate).
     """
-    feedback = "Good Depth"
-    error_tag = "NONE"
-    
-    # Excellent: Knee angle is 95 degrees or less (Deep)
-    if knee_angle <= 95:
-        feedback = "Excellent Depth"
-        error_tag = "NONE"
-    
-    # Shallow: Stopped between 96 and 115 degrees
-    elif 95 < knee_angle < 115:
-        feedback = "Slightly Shallow"
-        error_tag = "SHALLOW_SQUAT"
-        
-    # Critical: Didn't even reach near parallel
-    elif knee_angle >= 115:
-        feedback = "Very Shallow"
-        error_tag = "CRITICAL_SHALLOW"
+    a, b, c = np.asarray(a), np.asarray(b), np.asarray(c)
+    radians = np.arctan2(c[..., 1]-b[..., 1], c[..., 0]-b[..., 0]) - np.arctan2(a[..., 1]-b[..., 1], a[..., 0]-b[..., 0])
+    angle = np.abs(radians*180.0/np.pi)
+    angle = np.where(angle > 180.0, 360 - angle, angle)
+
+    missing = np.any(a == 0, axis=-1) | np.any(b == 0, axis=-1) | np.any(c == 0, axis=-1)
+    return np.where(missing, np.nan, angle)
+
+def calculate_swing_scores(shoulder, elbow, hip):
+    """
+    Horizontal elbow drift normalised by torso length, per frame.
+    NaN where the torso length is zero.
+    """
+    shoulder, elbow, hip = np.asarray(shoulder), np.asarray(elbow), np.asarray(hip)
+    diff = shoulder - hip
+    torso_length = np.sqrt(np.sum(diff * diff, axis=-1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        swing = np.abs(shoulder[..., 0] - elbow[..., 0]) / torso_length
+    return np.where(torso_length > 0, swing, np.nan)
+
+def calculate_inclinations(upper, lower):
+    """
+    Angle of the upper->lower segment above the horizontal, 0-90 degrees per
+    frame (e.g. shoulder->hip: 0 = torso flat, 90 = upright). NaN if a point is missing.
+    """
+    upper, lower = np.asarray(upper), np.asarray(lower)
+    diff = upper - lower
+    angle = np.degrees(np.arctan2(np.abs(diff[..., 1]), np.abs(diff[..., 0])))
+    missing = np.any(upper == 0, axis=-1) | np.any(lower == 0, axis=-1)
+    return np.where(missing, np.nan, angle)
+
+def calculate_heights(shoulder, wrist, hip):
+    """
+    How far the wrist is above the shoulder, in torso lengths, per frame
+    (negative = below). NaN where a point is missing.
+    """
+    shoulder, wrist, hip = np.asarray(shoulder), np.asarray(wrist), np.asarray(hip)
+    diff = shoulder - hip
+    torso_length = np.sqrt(np.sum(diff * diff, axis=-1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        height = (shoulder[..., 1] - wrist[..., 1]) / torso_length
+    missing = np.any(shoulder == 0, axis=-1) | np.any(wrist == 0, axis=-1) | (torso_length == 0)
+    return np.where(missing, np.nan, height)
+
+
+# ---------------- FORM RULES ----------------
+# Per exercise: ordered (metric, op, value, feedback, error_tag) rules, first
+# match wins, plus the result when none match. "primary" / "secondary" are the
+# two metrics logged with each rep (see core/exercises.py).
+FORM_RULES = {
+    "Squat": {
+        "rules": [
+            # Excellent: Knee angle is 95 degrees or less (Deep)
+            ("primary", "<=", 95, "Excellent Depth", "NONE"),
+            # Shallow: Stopped between 96 and 115 degrees
+            ("primary", "<", 115, "Slightly Shallow", "SHALLOW_SQUAT"),
+            # Critical: Didn't even reach near parallel
+            ("primary", ">=", 115, "Very Shallow", "CRITICAL_SHALLOW"),
+        ],
+        "default": ("Good Depth", "NONE"),
+    },
+    "Bicep Curl": {
+        "rules": [
+            # 1. Contraction check
+            ("primary", ">", 65, "Bring the weight higher!", "INCOMPLETE_CONTRACTION"),
+            # 2. TIGHTENED THRESHOLD:
+            # Based on your logs, bad reps are ~0.33.
+            # Let's set the limit to 0.20 to catch that sway.
+            ("secondary", ">", 0.20, "Elbow moved! Keep it pinned to your ribcage.", "ELBOW_SWINGING"),
+        ],
+        "default": ("Good Rep", "NONE"),
+    },
+    "Overhead Press": {
+        "rules": [
+            # Full extension (Lockout) should be high
+            ("primary", "<", 150, "Push higher! Fully straighten your arms.", "INCOMPLETE_LOCKOUT"),  # Changed from 155 to 150
+            # Hands should come down near shoulders (angle < 105)
+            ("secondary", ">", 105, "Bring the weights lower to your shoulders.", "SHORT_RANGE_OF_MOTION"),  # Changed from 100 to 105
+        ],
+        "default": ("Good Rep", "NONE"),
+    },
+    "Deadlift": {
+        # Back Angle is the inclination of the torso (Shoulder to Hip).
+        # In a setup, the back should be between 30 and 45 degrees for most people.
+        # If the angle is too high (>60) while hips are low, it's often a 'Squatty Deadlift'.
+        # If the back angle is too low (<20), it puts extreme shear on the L4-L5.
+        "rules": [
+            ("primary", "<", 25, "Back too horizontal!", "EXCESSIVE_LEAN"),
+            ("primary", ">", 65, "Hips too low (Squatty)!", "SQUATTY_DEADLIFT"),
+        ],
+        "default": ("Good Pull", "NONE"),
+    },
+}
 
+
+def evaluate_form(rules, primary, secondary):
+    """
+    Applies a FORM_RULES entry to one rep (scalars) or many reps at once (arrays).
+    Returns (feedback, error_tag), as strings or as string arrays.
+    """
+    scalar = np.ndim(primary) == 0 and np.ndim(secondary) == 0
+    metrics = {
+        "primary": np.atleast_1d(np.asarray(primary, dtype=np.float64)),
+        "secondary": np.atleast_1d(np.asarray(secondary, dtype=np.float64)),
+    }
+    hits = [COMPARE[op](metrics[metric], value) for metric, op, value, _, _ in rules["rules"]]
+    feedback = np.select(hits, [rule[3] for rule in rules["rules"]], rules["default"][0])
+    error_tag = np.select(hits, [rule[4] for rule in rules["rules"]], rules["default"][1])
+    if scalar:
+        return str(feedback[0]), str(error_tag[0])
     return feedback, error_tag
 
 
-# def check_deadlift_form(back_angle, hip_angle):
-#     """
-#     Evaluates deadlift form. 
-#     Back Angle is the inclination of the torso (Shoulder to Hip).
-#     """
-#     feedback = "Good Pull"
-#     error_tag = "NONE"
+def check_squat_form(hip_angle, knee_angle):
+    """
+    Evaluates the peak depth of a completed repetition.
+    """
+    return evaluate_form(FORM_RULES["Squat"], knee_angle, 0)
 
-#     # 1. Back Angle Check (Rounded vs Flat)
-#     # In a setup, the back should be between 30 and 45 degrees for most people.
-#     # If the angle is too high (>60) while hips are low, it's often a 'Squatty Deadlift'.
-#     # If the back angle is too low (<20), it puts extreme shear on the L4-L5.
-    
-#     if back_angle < 25:
-#         feedback = "Back too horizontal!"
-#         error_tag = "EXCESSIVE_LEAN"
-#     elif back_angle > 65:
-#         feedback = "Hips too low (Squatty)!"
-#         error_tag = "SQUATTY_DEADLIFT"
-        
-#     return feedback, error_tag    
+
+def check_deadlift_form(back_angle, hip_angle):
+    """
+    Evaluates deadlift form.
+    Back Angle is the inclination of the torso (Shoulder to Hip).
+    """
+    return evaluate_form(FORM_RULES["Deadlift"], back_angle, hip_angle)
 
 
 # --- BICEP CURL LOGIC ---
 def check_curl_form(elbow_angle, swing_score):
-    feedback = "Good Rep"
-    error_tag = "NONE"
-    
-    # 1. Contraction check
-    if elbow_angle > 65: 
-        feedback = "Bring the weight higher!"
-        error_tag = "INCOMPLETE_CONTRACTION"
-    
-    # 2. TIGHTENED THRESHOLD: 
-    # Based on your logs, bad reps are ~0.33. 
-    # Let's set the limit to 0.20 to catch that sway.
-    elif swing_score > 0.20: 
-        feedback = "Elbow moved! Keep it pinned to your ribcage."
-        error_tag = "ELBOW_SWINGING"
-        
-    return feedback, error_tag
+    return evaluate_form(FORM_RULES["Bicep Curl"], elbow_angle, swing_score)
 
 
 def check_press_form(max_extension, min_flexion):
-    feedback = "Good Rep"
-    error_tag = "NONE"
-
-    # Full extension (Lockout) should be high
-    if max_extension < 150: # Changed from 155 to 150
-        feedback = "Push higher! Fully straighten your arms."
-        error_tag = "INCOMPLETE_LOCKOUT"
-    
-    # Hands should come down near shoulders (angle < 105)
-    elif min_flexion > 105: # Changed from 100 to 105
-        feedback = "Bring the weights lower to your shoulders."
-        error_tag = "SHORT_RANGE_OF_MOTION"
-        
-    return feedback, error_tag
\ No newline at end of file
+    return evaluate_form(FORM_RULES["Overhead Press"], max_extension, min_flexion)
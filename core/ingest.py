@@ -0,0 +1,119 @@
+# core/ingest.py
+# Puts an upload, file or pipe in front of the video decoder without holding
+# the whole video in memory or copying it around:
+#   - paths (and file objects opened from one) are decoded in place,
+#   - seekable buffers (Streamlit uploads, BytesIO) are hashed and decoded
+#     straight from the buffer when OpenCV can read from Python streams,
+#   - anything else (pipes, older OpenCV builds) is spooled to a temp file in
+#     fixed-size chunks and deleted again on close().
+import hashlib
+import io
+import os
+import cv2
+from core.cache import hash_file
+from utils.tempfiles import remove_quietly, temp_path
+
+CHUNK_SIZE = 1 << 20
+
+
+def _stream_backend():
+    # OpenCV >= 4.11 builds with a stream-buffered backend (FFmpeg) take file objects;
+    # the backend has to be named explicitly
+    registry = getattr(cv2, "videoio_registry", None)
+    if not hasattr(cv2, "IStreamReader") or not hasattr(registry, "getStreamBufferedBackends"):
+        return None
+    backends = registry.getStreamBufferedBackends()
+    return backends[0] if len(backends) else None
+
+
+STREAM_BACKEND = _stream_backend()
+
+
+def _local_path(source):
+    """The file a source refers to on disk, if any."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    name = getattr(source, "name", None)
+    # Streamlit uploads have a .name too, but it's the browser's file name
+    if isinstance(name, str) and isinstance(source, io.BufferedReader) and os.path.isfile(name):
+        return name
+    return None
+
+
+def _seekable(source):
+    try:
+        return source.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+class VideoSource:
+    """
+    A video to analyze, with its content hash (for the keypoint cache) and a
+    decoder opened on demand. Use as a context manager, or call close().
+    """
+
+    def __init__(self, source, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.path = _local_path(source)
+        self.stream = None
+        self.spooled = False
+        self._capture = None
+
+        if self.path is not None:
+            self.video_hash = hash_file(self.path, chunk_size)
+        elif _seekable(source) and STREAM_BACKEND is not None:
+            self.stream = source
+            self.video_hash = self._hash_stream(source)
+        else:
+            self.path, self.video_hash = self._spool(source)
+            self.spooled = True
+
+    def _hash_stream(self, stream):
+        # Chunked reads, not getbuffer(): an upload's BytesIO shares its bytes, and
+        # exporting a buffer would force a full private copy of the video
+        h = hashlib.sha256()
+        stream.seek(0)
+        for chunk in iter(lambda: stream.read(self.chunk_size), b""):
+            h.update(chunk)
+        stream.seek(0)
+        return h.hexdigest()
+
+    def _spool(self, stream):
+        """Copies a stream to a temp file chunk by chunk, hashing on the way."""
+        if _seekable(stream):
+            stream.seek(0)
+        h = hashlib.sha256()
+        path = temp_path(".mp4")
+        try:
+            with open(path, "wb") as f:
+                for chunk in iter(lambda: stream.read(self.chunk_size), b""):
+                    h.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            remove_quietly(path)
+            raise
+        return path, h.hexdigest()
+
+    def open_capture(self):
+        if self._capture is None:
+            if self.stream is not None:
+                self.stream.seek(0)
+                self._capture = cv2.VideoCapture(self.stream, STREAM_BACKEND, [])
+            else:
+                self._capture = cv2.VideoCapture(self.path)
+        return self._capture
+
+    def close(self):
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+        if self.spooled:
+            remove_quietly(self.path)
+            self.spooled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
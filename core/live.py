@@ -0,0 +1,239 @@
+# core/live.py
+# Real-time coaching on a camera / stream source.
+# Capture and inference run on separate threads and only ever hand over the
+# newest frame: when inference falls behind, older frames are dropped instead
+# of queued, so feedback latency stays bounded.
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+from core.processor import _athlete, _people
+from core.render import annotate_frame
+from core.vision import PoseEstimator
+from core.trajectory import RepSegmenter, compute_features
+from utils.metrics import METRICS
+
+
+class LatencyStats:
+    """Rolling per-stage latency (seconds) over the last `window` samples."""
+
+    STAGES = ("capture", "inference", "geometry", "render", "total")
+
+    def __init__(self, window=120):
+        self.samples = {stage: deque(maxlen=window) for stage in self.STAGES}
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.samples[stage].append(seconds)
+        # Also kept process-wide (histograms for the metrics panel / Prometheus)
+        METRICS.observe(f"live_{stage}", seconds)
+
+    def summary(self):
+        """{stage: {"mean_ms", "p95_ms", "max_ms"}} for stages with samples."""
+        out = {}
+        with self.lock:
+            for stage, values in self.samples.items():
+                if not values:
+                    continue
+                arr = np.fromiter(values, dtype=np.float64) * 1000.0
+                out[stage] = {
+                    "mean_ms": round(float(arr.mean()), 1),
+                    "p95_ms": round(float(np.percentile(arr, 95)), 1),
+                    "max_ms": round(float(arr.max()), 1),
+                }
+        return out
+
+
+class LiveSession:
+    """
+    Runs the rep state machine on a live source.
+
+    source: camera index, stream URL or a video file. With loop=True a file is
+    replayed forever at its own frame rate, which makes it a stand-in camera.
+    latency_budget: frames older than this (seconds) when inference is ready for
+    them are dropped; feedback therefore never lags the camera by more than
+    roughly latency_budget + one inference.
+    """
+
+    def __init__(self, source=0, exercise_type="Squat", detector=None, latency_budget=0.25,
+                 loop=False, thresholds=None, logger=None, width=640):
+        self.source = source
+        self.exercise_type = exercise_type
+        self.detector = detector or PoseEstimator()
+        self.latency_budget = latency_budget
+        self.loop = loop
+        self.logger = logger
+        self.session_id = None
+        self.width = width
+
+        self.segmenter = RepSegmenter(exercise_type, thresholds)
+        self.stats = LatencyStats()
+        self.reps = []
+        self.last_feedback = ""
+        self.frames_captured = 0
+        self.frames_processed = 0
+        # One counter per thread, so neither needs a lock: replaced before inference
+        # picked them up (capture thread), too old once it did (inference thread)
+        self.frames_superseded = 0
+        self.frames_stale = 0
+        self.budget_overruns = 0
+
+        self._cap = None
+        self._slot = None                 # newest (frame, captured_at) from the camera
+        self._slot_cond = threading.Condition()
+        self._output = None               # newest annotated result
+        self._output_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self.error = None
+
+    # ---------------- LIFECYCLE ----------------
+    def start(self):
+        self._cap = cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            raise RuntimeError(f"Could not open video source: {self.source}")
+        if self.logger:
+            # Reps of this capture form one session, tagged with the source like a video hash
+            self.session_id = self.logger.start_session(video_id=f"live:{self.source}")
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="live-capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="live-inference", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._slot_cond:
+            self._slot_cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=2.0)
+        self._threads = []
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        if self.logger:
+            self.logger.flush()
+
+    @property
+    def frames_dropped(self):
+        return self.frames_superseded + self.frames_stale
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def latest(self):
+        """Newest output dict (frame, rep_count, feedback, latency_ms) or None."""
+        with self._output_lock:
+            return self._output
+
+    # ---------------- THREADS ----------------
+    def _capture_loop(self):
+        fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        # Files are read as fast as the disk allows, so pace them like a camera
+        pace = isinstance(self.source, str) and not self.source.startswith(("rtsp://", "http://", "https://"))
+        next_due = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                ret, frame = self._cap.read()
+                if not ret:
+                    if self.loop and self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                        continue
+                    break
+                frame = cv2.resize(frame, (self.width, int(frame.shape[0] * (self.width / frame.shape[1]))))
+                captured_at = time.perf_counter()
+                self.stats.add("capture", captured_at - t0)
+                self.frames_captured += 1
+
+                with self._slot_cond:
+                    if self._slot is not None:
+                        # Inference never picked up the previous frame -> drop it
+                        self.frames_superseded += 1
+                    self._slot = (frame, captured_at)
+                    self._slot_cond.notify()
+
+                if pace:
+                    next_due += 1.0 / fps
+                    delay = next_due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_due = time.perf_counter()
+        except Exception as e:
+            self.error = e
+        finally:
+            self._stop.set()
+            with self._slot_cond:
+                self._slot_cond.notify_all()
+
+    def _inference_loop(self):
+        try:
+            while True:
+                with self._slot_cond:
+                    while self._slot is None and not self._stop.is_set():
+                        self._slot_cond.wait(timeout=0.1)
+                    if self._slot is None:
+                        return
+                    frame, captured_at = self._slot
+                    self._slot = None
+
+                if time.perf_counter() - captured_at > self.latency_budget:
+                    # Too stale to be useful feedback
+                    self.frames_stale += 1
+                    continue
+                self._process(frame, captured_at)
+        except Exception as e:
+            self.error = e
+            self._stop.set()
+
+    def _process(self, frame, captured_at):
+        t0 = time.perf_counter()
+        results = self.detector.model(frame, verbose=False)
+        result = results[0]
+        t1 = time.perf_counter()
+
+        # Same athlete choice as uploads: the biggest person, not YOLO's most confident one
+        row, _ = _athlete(*_people(result))
+        features = compute_features(row[None], self.exercise_type)
+        reps, _ = self.segmenter.feed(features)
+        for rep in reps:
+            self.reps.append(rep)
+            self.last_feedback = rep["feedback"]
+            if self.logger:
+                self.logger.log_rep(self.exercise_type, rep["rep_count"], rep["primary_metric"], rep["secondary_metric"], rep["error_tag"])
+        t2 = time.perf_counter()
+
+        annotated_frame = annotate_frame(frame, row, self.segmenter.rep_count)
+        if self.last_feedback:
+            cv2.putText(annotated_frame, self.last_feedback, (30, 85),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+        t3 = time.perf_counter()
+
+        total = t3 - captured_at
+        self.stats.add("inference", t1 - t0)
+        self.stats.add("geometry", t2 - t1)
+        self.stats.add("render", t3 - t2)
+        self.stats.add("total", total)
+        self.frames_processed += 1
+        if total > self.latency_budget:
+            self.budget_overruns += 1
+
+        with self._output_lock:
+            self._output = {
+                "frame": annotated_frame,
+                "rep_count": self.segmenter.rep_count,
+                "feedback": self.last_feedback,
+                "latency_ms": round(total * 1000.0, 1),
+            }
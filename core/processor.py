@@ -1,175 +1,528 @@
 # core/processor.py
 import cv2
-import tempfile
-import streamlit as st
+import queue
+import threading
 import numpy as np
-import os
+import time
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from core.vision import PoseEstimator
-from core.geometry import calculate_angle, check_squat_form,check_curl_form,check_press_form
+from core.cache import KeypointCache
+from core.ingest import VideoSource
+from core.roi import AthleteROI, to_frame_coords
+from core.render import PreviewThrottle, annotate_frame, annotate_tracked
+from core.stride import AdaptiveStride
+from core.exercises import AUTO_DETECT, EXERCISES
+from core.tracking import PoseTracker
+from core.trajectory import (NUM_KEYPOINTS, RepSegmenter, TrackSegmenter, analyze_trajectory, compute_features,
+                             detect_exercise, pack_keypoints, stack_keypoints)
 from utils.csv_handler import WorkoutLogger
+from utils.metrics import METRICS
+from utils.tempfiles import remove_quietly, temp_path
+
+# Marks the end of a stage's output in the pipeline queues
+_END = object()
+
+# What process_video produces besides reps: an annotated .mp4, the keypoint
+# tensor as .npy, or nothing (reps / metrics only, no drawing or encoding)
+OUTPUT_MODES = ("video", "keypoints", "metrics")
+
 
 class VideoProcessor:
-    def __init__(self):
-        self.detector = PoseEstimator()
-        self.logger = WorkoutLogger()
+    def __init__(self, batch_size=4, queue_depth=16, pipelined=True, cache=None, detector=None,
+                 stride=1, stride_margin=10.0, logger=None, user_id="default", multi_person=False,
+                 output="video", preview_fps=10.0, roi=False, roi_imgsz=320):
+        if output not in OUTPUT_MODES:
+            raise ValueError(f"output must be one of {OUTPUT_MODES}, got {output!r}")
+        # PoseEstimator hands out the process-wide shared model, so this is cheap
+        self.detector = detector or PoseEstimator()
+        self.logger = logger or WorkoutLogger(user_id=user_id)
+        self.session_id = None
+        # Keypoints of clips we've already run through YOLO (pass False to disable)
+        self.cache = KeypointCache() if cache is None else cache
+
+        # Pipeline settings: frames per YOLO call and max frames buffered between stages
+        self.batch_size = max(1, int(batch_size))
+        self.queue_depth = max(1, int(queue_depth))
+        self.pipelined = pipelined
+        # Adaptive stride: infer every `stride` frames, interpolate the rest (1 = every frame)
+        self.stride = max(1, int(stride))
+        self.stride_margin = stride_margin
+        # Group videos: track every person and count reps per athlete. Needs every
+        # frame, so adaptive stride and the keypoint cache are skipped in this mode.
+        self.multi_person = multi_person
+        self.output = output
+        # The live preview is refreshed at most this often; frames are only drawn when encoded or shown
+        self.preview_fps = preview_fps
+        # Follow-the-athlete inference (core.roi): YOLO on a crop around the last
+        # box at roi_imgsz, full frame only to (re)find them. Single athlete only.
+        self.roi = roi
+        self.roi_imgsz = roi_imgsz
+        self._roi = None
 
         self.rep_count = 0
-        self.stage = "up"               # IMPORTANT
-        self.min_knee_angle = 180.0     # Squat depth
-
-        self.peak_val = 180.0           # Curl depth
-        self.max_val = 0.0              # Press lockout
-        self.max_swing_score = 0.0
-
-    def process_video(self, uploaded_file, exercise_type="Squat", st_frame_placeholder=None):
-        tfile = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-        tfile.write(uploaded_file.read())
-        cap = cv2.VideoCapture(tfile.name)
-        output_path = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4').name
-        
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')
-        out = None 
-        
-        # Setup initial peak values
-        if exercise_type == "Squat": self.peak_val = 180.0
-        else: self.peak_val = 180.0 # For Curl (tracking min elbow angle)
+        self.reps = []
+        # Exercise of the last clip (resolved when called with "Auto") and the
+        # reps every scored exercise hypothesis found: {exercise_type: reps}
+        self.exercise_type = None
+        self.hypotheses = {}
+        # (frames, 17, 3) keypoint tensor of the last processed clip, for re-scoring
+        self.trajectory = None
+        self.frames_total = 0
+        self.frames_inferred = 0
+        # {track id: rep count} of the last clip (multi_person only)
+        self.athletes = {}
+
+    def process_video(self, uploaded_file, exercise_type="Squat", st_frame_placeholder=None, thresholds=None):
+        """
+        uploaded_file: a Streamlit upload / binary file object, a pipe, or a path.
+        It is decoded in place where possible (see core.ingest), never read into memory whole.
+
+        exercise_type "Auto" scores every exercise in core.exercises on the same
+        pose pass and keeps the best fit (self.exercise_type); thresholds then
+        stay at their defaults and adaptive stride is skipped.
+        Returns (rep_count, output_path); output_path depends on self.output (see
+        OUTPUT_MODES) and is None in "metrics" mode or when a cache hit leaves no
+        video to annotate. Outputs go to the app's temp folder (swept by utils.tempfiles).
+        """
+        auto = exercise_type == AUTO_DETECT
+        if auto and self.multi_person:
+            raise ValueError("Auto-detect follows a single athlete; pick the exercise for group videos.")
+        started = time.perf_counter()
+        with VideoSource(uploaded_file) as source:
+            result = self._process_source(source, exercise_type, st_frame_placeholder, thresholds, auto)
+        self._record_video(time.perf_counter() - started)
+        return result
+
+    def _record_video(self, seconds):
+        # "video" reads as end-to-end seconds per frame; its per_sec is the clip's frames/sec
+        METRICS.observe("video", seconds, max(1, self.frames_total))
+        METRICS.inc("videos")
+        METRICS.inc("frames", self.frames_total)
+        METRICS.inc("frames_inferred", self.frames_inferred)
+        fps = self.frames_total / seconds if seconds > 0 else 0.0
+        METRICS.set("last_video_fps", round(fps, 1))
+        METRICS.log_event("video", exercise=self.exercise_type, frames=self.frames_total,
+                          frames_inferred=self.frames_inferred, seconds=round(seconds, 3), fps=round(fps, 1),
+                          output=self.output, multi_person=self.multi_person)
+
+    def _process_source(self, source, exercise_type, st_frame_placeholder, thresholds, auto):
+        video_hash = source.video_hash
+        # Every rep of this clip is logged under one session tagged with the video hash
+        self.session_id = self.logger.start_session(video_id=video_hash)
+
+        # Cache hit: same clip + same model -> re-score the stored keypoints, no YOLO.
+        # There is no freshly annotated video in that case, so output_path is None.
+        cache_key = None
+        if self.cache and not self.multi_person:
+            cache_key = self.cache.make_key(video_hash, self.detector.model_path)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                METRICS.inc("cache_hits")
+                self.trajectory = cached
+                if auto:
+                    exercise_type, self.hypotheses = detect_exercise(cached)
+                else:
+                    self.hypotheses = {exercise_type: analyze_trajectory(cached, exercise_type, thresholds)}
+                self.exercise_type = exercise_type
+                self.reps = self.hypotheses[exercise_type]
+                self._log_reps(exercise_type, self.reps)
+                self.rep_count = len(self.reps)
+                self.frames_total, self.frames_inferred = len(cached), 0
+                self.logger.flush()
+                return self.rep_count, self._save_keypoints() if self.output == "keypoints" else None
+
+        cap = source.open_capture()
+        fps = cap.get(cv2.CAP_PROP_FPS) or 20.0
+
+        rows = []
+        output_path = writer = None
+        if self.output == "video":
+            output_path = temp_path('.mp4')
+            writer = _AnnotatedWriter(output_path, fps)
+        preview = PreviewThrottle(st_frame_placeholder, self.preview_fps) if st_frame_placeholder else None
+        self.frames_total = self.frames_inferred = 0
+        self._roi = AthleteROI(imgsz=self.roi_imgsz) if self.roi and not self.multi_person else None
+
+        strider = None
+        if self.stride > 1 and not self.multi_person and not auto:
+            strider = AdaptiveStride(exercise_type, self.stride, self.stride_margin, thresholds,
+                                     batch_size=self.batch_size)
+            analyze = lambda frames: strider.run(frames, self._infer)
+        else:
+            analyze = self._batched
+
+        self.exercise_type = exercise_type
+        if self.multi_person:
+            segmenter, tracker = TrackSegmenter(exercise_type, thresholds), PoseTracker()
+            self.athletes = {}
+            self.reps = []
+            self.hypotheses = {exercise_type: self.reps}
+
+            def handle_batch(items):
+                self._handle_tracked_batch(items, segmenter, tracker, rows, writer, exercise_type, preview)
+        else:
+            # One state machine per exercise hypothesis, all fed from the same keypoints
+            if auto:
+                segmenters = {name: RepSegmenter(name) for name in EXERCISES}
+            else:
+                segmenters = {exercise_type: RepSegmenter(exercise_type, thresholds)}
+            self.hypotheses = {name: [] for name in segmenters}
+            self.reps = self.hypotheses.get(exercise_type, [])
+
+            def handle_batch(items):
+                self._handle_batch(items, segmenters, rows, writer, preview)
 
+        try:
+            if self.pipelined:
+                self._run_pipelined(cap, analyze, handle_batch)
+            else:
+                self._run_sequential(cap, analyze, handle_batch)
+        except BaseException:
+            if writer:
+                writer.release()
+            remove_quietly(output_path)
+            raise
+        finally:
+            cap.release()
+            if writer:
+                writer.release()
+            self.logger.flush()
+
+        # frames_inferred is counted in _infer; with a stride it is below frames_total
+        self.frames_total = len(rows)
+        self.trajectory = stack_keypoints(rows)
+        if auto:
+            # Reps were held back until the whole clip was seen
+            self.exercise_type, self.hypotheses = detect_exercise(self.trajectory, self.hypotheses)
+            self.reps = self.hypotheses[self.exercise_type]
+            self.rep_count = len(self.reps)
+            self._log_reps(self.exercise_type, self.reps)
+            self.logger.flush()
+        # Only exact (every-frame, full-frame) keypoints go in the cache
+        if cache_key and strider is None and self._roi is None:
+            self.cache.put(cache_key, self.trajectory)
+        if self.output == "keypoints":
+            output_path = self._save_keypoints()
+        return self.rep_count, output_path
+
+    def _save_keypoints(self):
+        path = temp_path('.npy')
+        np.save(path, np.asarray(self.trajectory))
+        return path
+
+    def rescore(self, exercise_type="Squat", thresholds=None, min_confidence=0.0):
+        """Re-runs rep segmentation on the last clip's keypoints without YOLO."""
+        if self.trajectory is None:
+            return []
+        return analyze_trajectory(self.trajectory, exercise_type, thresholds, min_confidence)
+
+    # ---------------- PIPELINE STAGES ----------------
+    def _run_sequential(self, cap, analyze, handle_batch):
+        """Decode -> inference -> annotate -> encode on one thread."""
+        for items in analyze(self._read_frames(cap)):
+            handle_batch(items)
+
+    def _run_pipelined(self, cap, analyze, handle_batch):
+        """
+        Decoder thread -> batched inference (this thread) -> writer thread.
+        Both queues are bounded so a slow stage throttles the others instead of
+        buffering the whole video. The writer consumes batches in frame order,
+        so rep counting sees exactly the same sequence as the sequential path.
+        """
+        frame_queue = queue.Queue(maxsize=self.queue_depth)
+        result_queue = queue.Queue(maxsize=max(1, self.queue_depth // self.batch_size))
+        stop = threading.Event()
+        errors = []
+
+        def decode():
+            try:
+                while cap.isOpened() and not stop.is_set():
+                    frame = self._decode(cap)
+                    if frame is None: break
+                    if not _put(frame_queue, self._resize(frame), stop): break
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                _put(frame_queue, _END, stop)
+
+        def write():
+            try:
+                while True:
+                    items = _get(result_queue, stop)
+                    if items is _END: break
+                    handle_batch(items)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+        decoder = threading.Thread(target=decode, name="video-decoder", daemon=True)
+        consumer = threading.Thread(target=write, name="video-writer", daemon=True)
+        # The writer pushes preview frames to Streamlit, so it needs the script context
+        ctx = get_script_run_ctx()
+        if ctx is not None:
+            add_script_run_ctx(consumer, ctx)
+        decoder.start()
+        consumer.start()
+
+        try:
+            for items in analyze(_drain(frame_queue, stop)):
+                if not _put(result_queue, items, stop): break
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(result_queue, _END, stop)
+            decoder.join()
+            consumer.join()
+
+        if errors:
+            raise errors[0]
+
+    def _read_frames(self, cap):
         while cap.isOpened():
+            frame = self._decode(cap)
+            if frame is None: break
+            yield self._resize(frame)
+
+    def _decode(self, cap):
+        with METRICS.timer("decode"):
             ret, frame = cap.read()
-            if not ret: break
-            
-            # (Resize logic)
-            width = 640
-            frame = cv2.resize(frame, (width, int(frame.shape[0] * (width/frame.shape[1]))))
-            
-            if out is None:
-                h, w, _ = frame.shape
-                out = cv2.VideoWriter(
-                    output_path,
-                    fourcc,
-                    cap.get(cv2.CAP_PROP_FPS) or 20.0,
-                    (w, h)
-                )
-
-            results = self.detector.model(frame, verbose=False)
-            annotated_frame = results[0].plot() 
-            
-            if len(results[0].keypoints) > 0:
-                keypoints = results[0].keypoints.xy[0].cpu().numpy()
-                conf = results[0].keypoints.conf[0].cpu().numpy()
-                
-                if len(keypoints) > 15:
-                    if exercise_type == "Squat":
-                        hip, knee, ankle = keypoints[11], keypoints[13], keypoints[15]
-                        k_angle = calculate_angle(hip, knee, ankle)
-
-                        if k_angle:
-                            # Track deepest point
-                            if self.stage == "down" and k_angle < self.min_knee_angle:
-                                self.min_knee_angle = k_angle
-
-                            # Start squat
-                            if k_angle < 140 and self.stage == "up":
-                                self.stage = "down"
-                                self.min_knee_angle = k_angle
-
-                            # Finish squat
-                            if k_angle > 150 and self.stage == "down":
-                                self.stage = "up"
-                                self.rep_count += 1
-
-                                feedback, error = check_squat_form(100, self.min_knee_angle)
-                                self.logger.log_rep(
-                                    "Squat",
-                                    self.rep_count,
-                                    self.min_knee_angle,
-                                    0,
-                                    error
-                                )
-
-                                self.min_knee_angle = 180.0
-
-                    elif exercise_type == "Bicep Curl":
-                        # 1. AUTO-ARM SELECTION
-                        l_score = conf[5] + conf[7] + conf[9]
-                        r_score = conf[6] + conf[8] + conf[10]
-                        
-                        if l_score > r_score:
-                            sh, el, hi = keypoints[5], keypoints[7], keypoints[11]
-                            wrist = keypoints[9]
-                        else:
-                            sh, el, hi = keypoints[6], keypoints[8], keypoints[12]
-                            wrist = keypoints[10]
-
-                        angle = calculate_angle(sh, el, wrist)
-                        
-                        if angle:
-                            torso_length = np.linalg.norm(sh - hi)
-                            if torso_length > 0:
-                                current_swing = abs(sh[0] - el[0]) / torso_length
-                                
-                                # DRAW A HELPER LINE: Shows the "Pinned" position
-                                cv2.line(annotated_frame, (int(sh[0]), int(sh[1])), (int(sh[0]), int(hi[1])), (255, 255, 0), 1)
-                                
-                                if self.stage == "up" and current_swing > self.max_swing_score:
-                                    self.max_swing_score = current_swing
-
-                            # 3. STATE MACHINE
-                            if angle < 140 and self.stage == "down":
-                                self.stage = "up"
-                            
-                            if self.stage == "up" and angle < self.peak_val:
-                                self.peak_val = angle
-
-                            if angle > 155 and self.stage == "up":
-                                self.stage = "down"
-                                self.rep_count += 1
-                                
-                                # EVALUATE using Normalized Score
-                                feedback, error = check_curl_form(self.peak_val, self.max_swing_score)
-                                self.logger.log_rep(exercise_type, self.rep_count, self.peak_val, self.max_swing_score, error)
-                                
-                                # Reset
-                                self.peak_val = 180.0
-                                self.max_swing_score = 0.0
-
-                    elif exercise_type == "Overhead Press":
-                        # Detect best arm
-                        l_score = conf[5] + conf[7] + conf[9]
-                        r_score = conf[6] + conf[8] + conf[10]
-                        if l_score > r_score:
-                            sh, el, wrist = keypoints[5], keypoints[7], keypoints[9]
-                        else:
-                            sh, el, wrist = keypoints[6], keypoints[8], keypoints[10]
-                        
-                        angle = calculate_angle(sh, el, wrist)
-                        if angle:
-                            # Tracking logic
-                            if angle > 150 and self.stage == "down": # Moving Up
-                                self.stage = "up"
-                            
-                            if self.stage == "up" and angle > self.max_val:
-                                self.max_val = angle # Track best lockout
-                            
-                            if self.stage == "down" and angle < self.peak_val:
-                                self.peak_val = angle # Track best depth
-
-                            if angle < 100 and self.stage == "up": # Back to Bottom
-                                self.stage = "down"
-                                self.rep_count += 1
-                                f, err = check_press_form(self.max_val, self.peak_val)
-                                self.logger.log_rep(exercise_type, self.rep_count, self.max_val, self.peak_val, err)
-                                # Reset
-                                self.max_val = 0.0
-                                self.peak_val = 180.0
-
-                    cv2.putText(annotated_frame, f"REPS: {self.rep_count}", (30, 50), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-
-            out.write(annotated_frame)
-            if st_frame_placeholder:
-                st_frame_placeholder.image(cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB))
-            
-        cap.release()
-        if out: out.release()
-        return self.rep_count, output_path
\ No newline at end of file
+        return frame if ret else None
+
+    def _resize(self, frame):
+        # (Resize logic)
+        width = 640
+        with METRICS.timer("resize"):
+            return cv2.resize(frame, (width, int(frame.shape[0] * (width/frame.shape[1]))))
+
+    def _batched(self, frames):
+        """Default analyzer: every frame goes through YOLO, batch_size frames per call."""
+        batch = []
+        for frame in frames:
+            batch.append(frame)
+            if len(batch) >= self.batch_size:
+                yield self._infer(batch)
+                batch = []
+        if batch:
+            yield self._infer(batch)
+
+    def _infer(self, frames):
+        """Runs YOLO on a list of frames -> list of (frame, result, keypoint row)."""
+        if self._roi is not None:
+            return self._infer_roi(frames)
+        items = []
+        for frame, result in zip(frames, self._predict(frames)):
+            row, _ = _athlete(*_people(result))
+            items.append((frame, result, row))
+        self.frames_inferred += len(frames)
+        return items
+
+    def _predict(self, frames, **kwargs):
+        results = []
+        for start in range(0, len(frames), self.batch_size):
+            chunk = frames[start:start + self.batch_size]
+            with METRICS.timer("inference", frames=len(chunk)):
+                results.extend(self.detector.model(chunk, verbose=False, **kwargs))
+        return results
+
+    def _infer_roi(self, frames):
+        """
+        _infer on crops around the athlete's last box. Frames where the crop loses
+        them (few confident keypoints, box at the crop edge) are re-run full-frame.
+        Results of cropped frames are in crop coordinates; rows are in frame coordinates.
+        """
+        roi = self._roi
+        items = [None] * len(frames)
+        boxes_out = [None] * len(frames)
+        retry = list(range(len(frames)))
+        region = roi.region(frames[0].shape)
+        if region is not None:
+            x0, y0, x1, y1 = region
+            crops = [frame[y0:y1, x0:x1] for frame in frames]
+            retry = []
+            for i, result in enumerate(self._predict(crops, imgsz=roi.imgsz)):
+                people, boxes = to_frame_coords(*_people(result), region)
+                row, box = _athlete(people, boxes)
+                if roi.accept(row, box, region, frames[i].shape):
+                    items[i], boxes_out[i] = (frames[i], result, row), box
+                else:
+                    retry.append(i)
+            roi.frames_cropped += len(frames) - len(retry)
+            roi.fallbacks += len(retry)
+            METRICS.inc("roi_frames", len(frames) - len(retry))
+            METRICS.inc("roi_fallbacks", len(retry))
+
+        if retry:
+            for i, result in zip(retry, self._predict([frames[i] for i in retry])):
+                row, box = _athlete(*_people(result))
+                items[i], boxes_out[i] = (frames[i], result, row), box
+        roi.update(boxes_out[-1], len(frames), full=bool(retry))
+        self.frames_inferred += len(frames)
+        return items
+
+    def _log_reps(self, exercise_type, reps, **kwargs):
+        for rep in reps:
+            self.logger.log_rep(exercise_type, rep["rep_count"], rep["primary_metric"], rep["secondary_metric"],
+                                rep["error_tag"], **kwargs)
+
+    def _handle_batch(self, items, segmenters, rows, writer, preview):
+        """
+        Geometry for the whole batch in one vectorized pass per exercise
+        hypothesis, then annotate the frames that get encoded or previewed.
+        """
+        batch_rows = [row for _, _, row in items]
+        rows.extend(batch_rows)
+
+        scored = {}
+        with METRICS.timer("geometry", frames=len(items)):
+            kps = stack_keypoints(batch_rows)
+            for name, segmenter in segmenters.items():
+                features = compute_features(kps, name)
+                reps, rep_counts = segmenter.feed(features)
+                self.hypotheses[name].extend(reps)
+                scored[name] = (features, rep_counts)
+                if len(segmenters) == 1:
+                    # Known exercise: log as we go (auto-detect logs once the clip is done)
+                    self._log_reps(name, reps)
+
+        # The overlay follows the hypothesis with the most reps so far
+        exercise_type = max(segmenters, key=lambda name: segmenters[name].rep_count)
+        features, rep_counts = scored[exercise_type]
+        self.rep_count = segmenters[exercise_type].rep_count
+
+        for i, (frame, _, row) in enumerate(items):
+            show = preview is not None and preview.due()
+            if writer is None and not show:
+                continue
+            guide = None
+            if exercise_type == "Bicep Curl" and features["valid"][i] and np.isfinite(features["swing"][i]):
+                sh, hi = features["shoulder"][i], features["hip"][i]
+                guide = (sh[0], sh[1], hi[1])
+            # Interpolated frames (adaptive stride) are drawn from their keypoint rows like any other
+            with METRICS.timer("render"):
+                annotate_frame(frame, row, rep_counts[i], guide)
+            self._emit(frame, writer, preview if show else None)
+
+    def _handle_tracked_batch(self, items, segmenter, tracker, rows, writer, exercise_type, preview):
+        """Multi-person version of _handle_batch: one state machine per tracked athlete."""
+        rows.extend(row for _, _, row in items)
+
+        # Track ids and dense slots for every detection, then a (frames, slots, 17, 3)
+        # tensor with zeros wherever a track wasn't seen (-> invalid features for that
+        # frame). Slots are only recycled between batches, so within one batch each
+        # slot belongs to a single track id.
+        tracked, slot_ids = [], {}
+        with METRICS.timer("tracking", frames=len(items)):
+            for _, result, _ in items:
+                people, boxes = _people(result)
+                ids, slots = tracker.update(boxes)
+                slot_ids.update(zip(slots.tolist(), ids.tolist()))
+                tracked.append((ids, slots, people, boxes))
+        n_slots = max(slot_ids, default=-1) + 1
+        kps = np.zeros((len(items), n_slots, NUM_KEYPOINTS, 3), dtype=np.float32)
+        for i, (_, slots, people, _) in enumerate(tracked):
+            kps[i, slots] = people
+
+        with METRICS.timer("geometry", frames=len(items)):
+            flat = compute_features(kps.reshape(-1, NUM_KEYPOINTS, 3), exercise_type)
+            features = {key: value.reshape(len(items), n_slots)
+                        for key, value in flat.items() if value is not None and value.ndim == 1}
+            reps, rep_counts = segmenter.feed(features)
+        segmenter.reset(tracker.recycle())
+        for rep in reps:
+            rep["track_id"] = slot_ids[rep.pop("slot")]
+            athlete = f"{self.logger.user_id}/athlete-{rep['track_id'] + 1}"
+            self._log_reps(exercise_type, [rep], user_id=athlete)
+            self.athletes[rep["track_id"]] = rep["rep_count"]
+        self.reps.extend(reps)
+        self.rep_count = len(self.reps)
+
+        for i, (frame, _, _) in enumerate(items):
+            show = preview is not None and preview.due()
+            if writer is None and not show:
+                continue
+            ids, slots, people, boxes = tracked[i]
+            with METRICS.timer("render"):
+                annotate_tracked(frame, ids, people, boxes, rep_counts[i, slots])
+            self._emit(frame, writer, preview if show else None)
+
+    def _emit(self, frame, writer, preview):
+        if writer:
+            with METRICS.timer("encode"):
+                writer.write(frame)
+        if preview:
+            with METRICS.timer("preview"):
+                preview.push(frame)
+
+
+def _athlete(people, boxes):
+    """
+    The biggest person is the athlete; YOLO's own order (by confidence) can flip
+    between people from frame to frame. -> (keypoint row, box), (empty row, None) if nobody.
+    """
+    if len(people) == 0:
+        return pack_keypoints(), None
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    best = int(np.argmax(areas))
+    return people[best], boxes[best]
+
+
+def _people(result):
+    """All detected people of a YOLO result -> ((n, 17, 3) keypoints, (n, 4) xyxy boxes)."""
+    if result is None or len(result.keypoints) == 0:
+        return np.zeros((0, NUM_KEYPOINTS, 3), dtype=np.float32), np.zeros((0, 4), dtype=np.float32)
+    xy = result.keypoints.xy.cpu().numpy()
+    conf = result.keypoints.conf
+    conf = conf.cpu().numpy() if conf is not None else np.zeros(xy.shape[:2], dtype=np.float32)
+    people = np.concatenate([xy, conf[..., None]], axis=-1).astype(np.float32)
+    boxes = result.boxes.xyxy.cpu().numpy().astype(np.float32)
+    return people, boxes
+
+
+class _AnnotatedWriter:
+    """Lazily opens the cv2.VideoWriter once the first frame size is known."""
+
+    def __init__(self, output_path, fps):
+        self.output_path = output_path
+        self.fps = fps
+        self.fourcc = cv2.VideoWriter_fourcc(*'avc1')
+        self.out = None
+
+    def write(self, frame):
+        if self.out is None:
+            h, w, _ = frame.shape
+            self.out = cv2.VideoWriter(self.output_path, self.fourcc, self.fps, (w, h))
+        self.out.write(frame)
+
+    def release(self):
+        if self.out: self.out.release()
+
+
+def _drain(q, stop):
+    """Yields queue items until the _END marker (or a failed stage)."""
+    while True:
+        item = _get(q, stop)
+        if item is _END: return
+        yield item
+
+
+def _put(q, item, stop, timeout=0.1):
+    """Blocking put that gives up once another stage has failed."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=timeout)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop, timeout=0.1):
+    """Blocking get that returns _END once another stage has failed."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=timeout)
+        except queue.Empty:
+            continue
+    return _END
@@ -0,0 +1,78 @@
+# core/render.py
+# Lightweight overlays and a throttled preview. Drawing straight from our
+# keypoint rows with a few cv2 primitives is much cheaper than Ultralytics'
+# generic result.plot(), and frames nobody will see are never drawn at all.
+import time
+import cv2
+import numpy as np
+
+# COCO-17 limbs (YOLO pose keypoint order)
+SKELETON = (
+    (5, 7), (7, 9), (6, 8), (8, 10),            # arms
+    (5, 6), (5, 11), (6, 12), (11, 12),         # torso
+    (11, 13), (13, 15), (12, 14), (14, 16),     # legs
+    (0, 1), (0, 2), (1, 3), (2, 4),             # face
+)
+LIMB_COLOR = (255, 128, 0)
+JOINT_COLOR = (0, 0, 255)
+TEXT_COLOR = (0, 255, 0)
+
+
+def draw_pose(frame, row, min_conf=0.5):
+    """Draws one (17, 3) keypoint row (skeleton + joints) onto frame in place."""
+    ok = (row[:, 2] >= min_conf) & (row[:, 0] > 0) & (row[:, 1] > 0)
+    if not ok.any():
+        return frame
+    pts = row[:, :2].astype(np.int32).tolist()
+    for a, b in SKELETON:
+        if ok[a] and ok[b]:
+            cv2.line(frame, pts[a], pts[b], LIMB_COLOR, 2)
+    for i in np.flatnonzero(ok).tolist():
+        cv2.circle(frame, pts[i], 3, JOINT_COLOR, -1)
+    return frame
+
+
+def annotate_frame(frame, row, rep_count, guide=None):
+    """Single athlete overlay: pose, optional curl guide line ((x, y0, y1)) and the rep counter."""
+    draw_pose(frame, row)
+    if row.any():
+        if guide is not None:
+            # DRAW A HELPER LINE: Shows the "Pinned" position
+            x, y0, y1 = guide
+            cv2.line(frame, (int(x), int(y0)), (int(x), int(y1)), (255, 255, 0), 1)
+        cv2.putText(frame, f"REPS: {rep_count}", (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.8, TEXT_COLOR, 2)
+    return frame
+
+
+def annotate_tracked(frame, track_ids, people, boxes, rep_counts):
+    """Group overlay: every tracked athlete's pose, box and rep count (one count per detection)."""
+    for track_id, row, box, reps in zip(track_ids.tolist(), people, boxes, rep_counts.tolist()):
+        draw_pose(frame, row)
+        x0, y0, x1, y1 = (int(v) for v in box)
+        cv2.rectangle(frame, (x0, y0), (x1, y1), TEXT_COLOR, 1)
+        cv2.putText(frame, f"#{track_id + 1} REPS: {reps}", (x0, max(20, y0 - 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, TEXT_COLOR, 2)
+    cv2.putText(frame, f"ATHLETES: {len(track_ids)}", (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.8, TEXT_COLOR, 2)
+    return frame
+
+
+class PreviewThrottle:
+    """
+    Pushes at most `fps` frames per second to a Streamlit placeholder. Callers
+    check due() first and only draw a frame when it will actually be shown.
+    """
+
+    def __init__(self, placeholder, fps=10.0):
+        self.placeholder = placeholder
+        self.interval = 1.0 / fps if fps and fps > 0 else 0.0
+        self.next_at = 0.0
+        self.pushed = 0
+
+    def due(self):
+        return self.placeholder is not None and time.perf_counter() >= self.next_at
+
+    def push(self, frame):
+        # BGR in, no cvtColor copy needed
+        self.placeholder.image(frame, channels="BGR")
+        self.next_at = time.perf_counter() + self.interval
+        self.pushed += 1
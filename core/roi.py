@@ -0,0 +1,76 @@
+# core/roi.py
+# Follow-the-athlete inference: once the athlete has been found on a full frame,
+# the next frames only send a crop around their last box (plus a margin) through
+# YOLO, at a smaller input size. The athlete usually fills a small, mostly fixed
+# part of the frame, so the crop keeps their native resolution while the model
+# sees a fraction of the pixels. Keypoints are shifted back to frame coordinates,
+# so the joint angles are the same as from a full-frame pass.
+import numpy as np
+
+# Crops smaller than this (pixels, either side) aren't worth it -> full frame
+MIN_CROP = 64
+
+
+class AthleteROI:
+    """
+    Region-of-interest state for one clip.
+
+    margin:        crop padding, as a fraction of the last box's width / height
+    imgsz:         YOLO input size for crops (full frames keep the model default)
+    min_conf:      keypoint confidence counted as "seen"
+    min_keypoints: a crop detection with fewer seen keypoints is re-run on the full frame
+    refresh:       frames between forced full-frame passes (picks up a bigger /
+                   closer person entering the scene, like the full-frame selection would)
+    """
+
+    def __init__(self, margin=0.3, imgsz=320, min_conf=0.5, min_keypoints=8, refresh=30):
+        self.margin = margin
+        self.imgsz = imgsz
+        self.min_conf = min_conf
+        self.min_keypoints = min_keypoints
+        self.refresh = refresh
+        self.box = None
+        self.since_full = 0
+        self.frames_cropped = 0
+        self.fallbacks = 0
+
+    def region(self, frame_shape):
+        """Crop (x0, y0, x1, y1) around the last box, or None when a full-frame pass is due."""
+        if self.box is None or self.since_full >= self.refresh:
+            return None
+        h, w = frame_shape[:2]
+        x0, y0, x1, y1 = self.box
+        mx, my = (x1 - x0) * self.margin, (y1 - y0) * self.margin
+        x0, y0 = max(0, int(x0 - mx)), max(0, int(y0 - my))
+        x1, y1 = min(w, int(np.ceil(x1 + mx))), min(h, int(np.ceil(y1 + my)))
+        if x1 - x0 < MIN_CROP or y1 - y0 < MIN_CROP:
+            return None
+        return x0, y0, x1, y1
+
+    def accept(self, row, box, region, frame_shape, edge=2):
+        """
+        Is the athlete found in a crop good enough? No when too few keypoints are
+        confident, or when their box runs into a crop edge that isn't the frame's
+        edge (they are moving out of the crop).
+        """
+        if box is None or int((row[:, 2] >= self.min_conf).sum()) < self.min_keypoints:
+            return False
+        h, w = frame_shape[:2]
+        x0, y0, x1, y1 = region
+        return not ((x0 > 0 and box[0] <= x0 + edge) or (y0 > 0 and box[1] <= y0 + edge)
+                    or (x1 < w and box[2] >= x1 - edge) or (y1 < h and box[3] >= y1 - edge))
+
+    def update(self, box, frames, full):
+        """Remembers the athlete's latest box (None: lost) after a batch of `frames`."""
+        self.box = box
+        self.since_full = 0 if full else self.since_full + frames
+
+
+def to_frame_coords(people, boxes, region):
+    """Shifts crop keypoints / boxes back to frame coordinates in place (missing keypoints stay at 0)."""
+    x0, y0 = region[0], region[1]
+    seen = (people[..., 0] > 0) | (people[..., 1] > 0)
+    people[..., 0] += np.where(seen, x0, 0)
+    people[..., 1] += np.where(seen, y0, 0)
+    boxes += np.array([x0, y0, x0, y0], dtype=boxes.dtype)
+    return people, boxes
@@ -0,0 +1,296 @@
+# core/stride.py
+# Adaptive-stride pose inference: run YOLO on every k-th frame and interpolate
+# keypoints in between, but infer the frames around each turning point where a
+# rep's peak metric is decided. Turning points are found with a hysteresis at
+# least as wide as the keypoint jitter seen so far, so jitter alone never
+# triggers extra inference.
+from collections import deque
+from itertools import islice
+import numpy as np
+from core.exercises import DETECT_SCALES, EXERCISES, resolve_thresholds
+from core.trajectory import compute_features
+
+# Angle ranges where the state machine tracks a peak metric (squat depth, curl
+# contraction, press lockout/depth), as (side, threshold name)
+PEAK_REGIONS = {name: spec["peak_regions"] for name, spec in EXERCISES.items()}
+
+# |third difference| of pure jitter with std 1 is ~N(0, 20); its median is 0.6745 * sqrt(20)
+_JITTER_MEDIAN = 0.6745 * np.sqrt(20.0)
+
+
+class AdaptiveStride:
+    """
+    Decides which frames actually go through YOLO.
+
+    Frames are read in windows of `stride` frames; only the last frame of each
+    window (the anchor) is inferred first, `batch_size` anchors per YOLO call.
+    Every signal a rep metric is taken from (the driving angle and e.g. the curl
+    swing score) is followed across the anchors with a hysteresis of `margin`
+    (per signal, scaled by DETECT_SCALES) or `noise_factor` times the jitter
+    measured on consecutive inferred frames, whichever is larger. Once a signal
+    has turned back by more than that, and the extreme is one the state machine
+    keeps (a minimum inside a "below" peak region, the maximum of a max-tracked
+    signal, ...), the frames around it are inferred: those within reach of the
+    vertex of a parabola through the three anchors around the extreme, widened
+    with the jitter, at most `stride // 2` per turning point. Windows without a
+    usable anchor and the first `calibration` windows are inferred in full;
+    every other frame is linearly interpolated between its inferred neighbours.
+
+    Windows are held back until no pending turning point can still reach them,
+    at most `max_hold` windows; one released early next to a pending turning
+    point is inferred in full to be safe.
+
+    This is an approximation, not a guarantee. Rep counts match the full-frame
+    run as long as the threshold crossings are clearer than the jitter; peak
+    metrics are exact on clean keypoints and otherwise differ by about the
+    jitter (a noisy extreme can fall on a frame that was interpolated).
+    """
+
+    def __init__(self, exercise_type="Squat", stride=4, margin=10.0, thresholds=None, batch_size=4,
+                 calibration=4, noise_factor=1.5, max_hold=8):
+        self.exercise_type = exercise_type
+        self.stride = max(1, int(stride))
+        self.base_margin = margin
+        self.batch_size = max(1, int(batch_size))
+        self.calibration = calibration
+        self.noise_factor = noise_factor
+        self.max_hold = max(2, int(max_hold))
+        limits = resolve_thresholds(exercise_type, thresholds)
+        self.peak_regions = [(side, limits[name]) for side, name in PEAK_REGIONS[exercise_type]]
+        # Non-angle signals the state machine keeps a peak of (swing, back angle, ...) -> "min" / "max"
+        self.tracked = {t["signal"]: t["keep"] for t in EXERCISES[exercise_type]["track"].values()
+                        if t["signal"] != "angle"}
+        self.signals = ["angle", *sorted(self.tracked)]
+
+        # |third differences| of each signal over runs of consecutive inferred frames
+        self.jitter = {name: deque(maxlen=512) for name in self.signals}
+        self._turns = {name: _TurnTracker() for name in self.signals}
+        self.windows = 0
+        self.frames_total = 0
+        self.frames_inferred = 0
+
+    def noise(self, signal="angle"):
+        """Jitter amplitude of a signal (~99th percentile of |jitter|), 0 until measured."""
+        jitter = self.jitter[signal]
+        return 2.6 * float(np.median(jitter)) / _JITTER_MEDIAN if jitter else 0.0
+
+    def margin(self, signal="angle"):
+        base = self.base_margin * DETECT_SCALES[signal] / DETECT_SCALES["angle"]
+        return max(base, self.noise_factor * self.noise(signal))
+
+    def run(self, frames, infer):
+        """
+        frames: iterable of decoded frames.
+        infer:  callable(list_of_frames) -> list of (frame, result, row) items.
+        Yields lists of (frame, result, row) in frame order; interpolated frames
+        have result=None.
+        """
+        it = iter(frames)
+        first = next(it, None)
+        if first is None:
+            return
+        anchor = self._infer([first], infer)[0]
+        yield [anchor]
+        values = self._values(anchor)
+        held = {}
+        self._observe_anchor(-1, values, held)
+
+        while True:
+            groups = []
+            while len(groups) < self.batch_size:
+                interior = list(islice(it, self.stride))
+                if not interior:
+                    break
+                groups.append(interior)
+            if not groups:
+                break
+
+            # One YOLO call for every anchor of the block
+            ends = self._infer([interior.pop() for interior in groups], infer)
+            for interior, end in zip(groups, ends):
+                window = {"index": self.windows, "start": anchor, "interior": interior, "end": end,
+                          "start_values": values, "end_values": self._values(end), "exact": set()}
+                values = window["end_values"]
+                if (self.windows < self.calibration or not np.isfinite(values["angle"])
+                        or not np.isfinite(window["start_values"]["angle"])):
+                    window["exact"] = set(range(len(interior)))
+                held[window["index"]] = window
+                self.windows += 1
+                self._observe_anchor(window["index"], values, held)
+                anchor = end
+
+            ready = self._release(held)
+            if ready:
+                yield self._finish(ready, infer)
+
+        if held:
+            yield self._finish([held.pop(i) for i in sorted(held)], infer)
+
+    def _infer(self, frames, infer):
+        self.frames_total += len(frames)
+        self.frames_inferred += len(frames)
+        return infer(frames)
+
+    def _values(self, item):
+        """{signal: value} of one inferred item, NaN where unusable."""
+        features = compute_features(item[2][None], self.exercise_type)
+        ok = bool(features["valid"][0])
+        return {name: float(features[name][0]) if ok else np.nan for name in self.signals}
+
+    # ---------------- TURNING POINTS ----------------
+    def _observe_anchor(self, index, values, held):
+        """Feeds anchor `index` (the end of window `index`) to every signal's turning-point tracker."""
+        for name in self.signals:
+            turn = self._turns[name].feed(index, values[name], self.margin(name))
+            if turn is not None and self._keeps(name, turn[1], turn[2]):
+                self._mark_peak(name, turn[0], held)
+
+    def _keeps(self, signal, kind, value):
+        """Whether an extreme (kind "min"/"max") of a signal can be a rep's peak metric."""
+        if signal != "angle":
+            return self.tracked[signal] == kind
+        margin = self.margin()
+        return any((side == "below" and kind == "min" and value < limit + margin)
+                   or (side == "above" and kind == "max" and value > limit - margin)
+                   for side, limit in self.peak_regions)
+
+    def _mark_peak(self, signal, k, held):
+        """Marks the interior frames next to anchor k (the end of window k) that may hold the extreme."""
+        before, after = held.get(k), held.get(k + 1)
+        if before is None or after is None:
+            # The other side was already released (or the clip ended there): infer what is left
+            for window in (before, after):
+                if window is not None:
+                    window["exact"] = set(range(len(window["interior"])))
+            return
+        s1, s2 = len(before["interior"]) + 1, len(after["interior"]) + 1
+        v_prev = before["start_values"][signal]
+        v0, v_next = before["end_values"][signal], after["end_values"][signal]
+        # Frame offsets from anchor k of the interior frames on either side
+        offsets = [(before, i, i + 1 - s1) for i in range(s1 - 1)] + [(after, i, i + 1) for i in range(s2 - 1)]
+        vertex, reach = 0.0, float(self.stride)
+        if np.isfinite(v_prev) and np.isfinite(v_next):
+            # Parabola through (-s1, v_prev), (0, v0), (s2, v_next)
+            a = (s1 * (v_next - v0) + s2 * (v_prev - v0)) / (s1 * s2 * (s1 + s2))
+            noise = self.noise(signal)
+            if a != 0 and abs(a) * s1 * s2 > noise:
+                b = (v_next - v0) / s2 - a * s2
+                vertex = float(np.clip(-b / (2 * a), -s1, s2))
+                # Frames whose smooth value is within the jitter of the extreme, plus
+                # how far the jitter can move the vertex itself
+                reach = 0.5 + np.sqrt(noise / abs(a)) + noise / (abs(a) * (s1 + s2))
+        near = sorted((abs(offset - vertex), window["index"], i) for window, i, offset in offsets
+                      if abs(offset - vertex) <= reach)
+        for _, index, i in near[:max(1, self.stride // 2)]:
+            held[index]["exact"].add(i)
+
+    def _release(self, held):
+        """Pops the held windows (in order) that no pending turning point can reach any more."""
+        bound = max(held) if held else 0
+        for name in self.signals:
+            for index, kind, value in self._turns[name].pending():
+                if self._keeps(name, kind, value):
+                    bound = min(bound, index)
+        ready = []
+        for index in sorted(held):
+            if index >= bound and len(held) <= self.max_hold:
+                break
+            window = held.pop(index)
+            if index >= bound:
+                # Forced out while a turning point next to it is still open
+                window["exact"] = set(range(len(window["interior"])))
+            ready.append(window)
+        return ready
+
+    # ---------------- INFERENCE + INTERPOLATION ----------------
+    def _finish(self, windows, infer):
+        """Items of consecutive windows; every exact interior frame goes through one YOLO call."""
+        exact = [window["interior"][i] for window in windows for i in sorted(window["exact"])]
+        inferred = iter(self._infer(exact, infer)) if exact else None
+
+        items, known = [], []
+        for window in windows:
+            interior = window["interior"]
+            self.frames_total += len(interior) - len(window["exact"])
+            # Position 0 is the start anchor, len(interior) + 1 the end anchor
+            rows = {0: window["start"][2], len(interior) + 1: window["end"][2]}
+            window_items = {}
+            for i in sorted(window["exact"]):
+                window_items[i] = next(inferred)
+                rows[i + 1] = window_items[i][2]
+            positions = sorted(rows)
+            for i, frame in enumerate(interior):
+                if i in window_items:
+                    items.append(window_items[i])
+                    continue
+                # Between the nearest inferred frames on either side
+                hi = next(p for p in positions if p > i + 1)
+                lo = max(p for p in positions if p < i + 1)
+                w = (i + 1 - lo) / (hi - lo)
+                items.append((frame, None, (rows[lo] + (rows[hi] - rows[lo]) * w).astype(np.float32)))
+            items.append(window["end"])
+            known.extend([i in window_items for i in range(len(interior))] + [True])
+        self._observe(windows[0]["start"], items, known)
+        return items
+
+    def _observe(self, start, items, known):
+        """Collects the jitter of every signal over runs of consecutive inferred frames (sets the margins)."""
+        known = np.array([True] + known)
+        if known.sum() < 4:
+            return
+        features = compute_features(np.stack([start[2]] + [item[2] for item in items]), self.exercise_type)
+        # Runs of at least 4 consecutive inferred frames with usable features
+        ok = known & features["valid"]
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], ok.astype(np.int8), [0]])))
+        for lo, hi in zip(edges[::2], edges[1::2]):
+            if hi - lo < 4:
+                continue
+            for name in self.signals:
+                third = np.abs(np.diff(np.asarray(features[name][lo:hi], dtype=np.float64), n=3))
+                self.jitter[name].extend(third[np.isfinite(third)].tolist())
+
+
+class _TurnTracker:
+    """
+    Turning points of one signal with hysteresis: a running extreme only counts
+    as a minimum / maximum once the signal has moved back by more than the margin.
+    """
+
+    def __init__(self):
+        self.direction = 0          # +1 following a maximum, -1 a minimum, 0 not known yet
+        self.low = self.high = None  # (index, value) extremes so far, while the direction is unknown
+        self.extreme = None
+
+    def feed(self, index, value, margin):
+        """-> (index, "min"/"max", value) of a turning point confirmed by this value, else None."""
+        if not np.isfinite(value):
+            return None
+        if self.direction == 0:
+            if self.low is None or value < self.low[1]:
+                self.low = (index, value)
+            if self.high is None or value > self.high[1]:
+                self.high = (index, value)
+            if value - self.low[1] > margin:
+                self.direction, self.extreme = 1, (index, value)
+                return self.low[0], "min", self.low[1]
+            if self.high[1] - value > margin:
+                self.direction, self.extreme = -1, (index, value)
+                return self.high[0], "max", self.high[1]
+            return None
+        if (value - self.extreme[1]) * self.direction >= 0:
+            self.extreme = (index, value)
+            return None
+        if abs(value - self.extreme[1]) > margin:
+            turn = (self.extreme[0], "max" if self.direction > 0 else "min", self.extreme[1])
+            self.direction, self.extreme = -self.direction, (index, value)
+            return turn
+        return None
+
+    def pending(self):
+        """
+        [(index, kind, value)] of the extreme that may still be confirmed. Nothing
+        before the first turn: a signal that never moves would hold windows back forever.
+        """
+        if self.direction == 0:
+            return []
+        return [(self.extreme[0], "max" if self.direction > 0 else "min", self.extreme[1])]
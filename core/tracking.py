@@ -0,0 +1,101 @@
+# core/tracking.py
+# Keeps the same id on each person from frame to frame, so every athlete in a
+# group video gets their own rep state machine. Greedy box-IoU matching: cheap,
+# no extra model, good enough for people who mostly stay on their spot.
+import numpy as np
+
+
+def box_iou(a, b):
+    """IoU matrix between (n, 4) and (m, 4) xyxy boxes."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class PoseTracker:
+    """
+    Assigns a track id to every detection of a frame.
+
+    Detections are matched to the live tracks by best IoU first; anything that
+    overlaps no track by at least `iou_threshold` starts a new one. A track that
+    goes unmatched for more than `max_missed` frames is retired, so a brief
+    dropout keeps its id. Ids count up from 0 and are never reused (they label
+    the athletes); each live track also holds a dense `slot` that indexes
+    per-track state arrays. Slots of retired tracks go back to the pool on
+    recycle(), so the state stays as small as the crowd in view.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=30):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.missed = np.zeros(0, dtype=np.int64)
+        self.slots = np.zeros(0, dtype=np.int64)
+        self.next_id = 0
+        self.n_slots = 0
+        self.free = []
+        self.retired = []
+
+    def update(self, boxes):
+        """boxes: (n, 4) xyxy for one frame -> ((n,) track ids, (n,) slots)."""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        det_ids = np.full(len(boxes), -1, dtype=np.int64)
+        det_slots = np.full(len(boxes), -1, dtype=np.int64)
+        matched = np.zeros(len(self.ids), dtype=bool)
+
+        if len(boxes) and len(self.ids):
+            iou = box_iou(self.boxes, boxes)
+            for flat in np.argsort(-iou, axis=None):
+                t, d = np.unravel_index(flat, iou.shape)
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if matched[t] or det_ids[d] >= 0:
+                    continue
+                matched[t] = True
+                det_ids[d], det_slots[d] = self.ids[t], self.slots[t]
+                self.boxes[t] = boxes[d]
+                self.missed[t] = 0
+
+        self.missed[~matched] += 1
+        keep = self.missed <= self.max_missed
+        self.retired.extend(self.slots[~keep].tolist())
+        self.boxes, self.ids, self.missed, self.slots = (
+            self.boxes[keep], self.ids[keep], self.missed[keep], self.slots[keep])
+
+        new = det_ids < 0
+        if new.any():
+            count = int(new.sum())
+            det_ids[new] = np.arange(self.next_id, self.next_id + count)
+            self.next_id += count
+            det_slots[new] = [self._take_slot() for _ in range(count)]
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.ids = np.concatenate([self.ids, det_ids[new]])
+            self.missed = np.concatenate([self.missed, np.zeros(count, dtype=np.int64)])
+            self.slots = np.concatenate([self.slots, det_slots[new]])
+        return det_ids, det_slots
+
+    def recycle(self):
+        """
+        Frees the slots of the tracks retired since the last call and returns them,
+        for the caller to reset its per-slot state before the next update(). Until
+        then a retired slot is never handed out, so one batch can't mix two
+        athletes in one slot.
+        """
+        retired, self.retired = self.retired, []
+        self.free = sorted(self.free + retired)
+        return retired
+
+    def _take_slot(self):
+        if self.free:
+            return self.free.pop(0)
+        self.n_slots += 1
+        return self.n_slots - 1
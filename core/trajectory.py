@@ -0,0 +1,371 @@
+# core/trajectory.py
+# Two-phase rep analysis: pose keypoints for a clip are stacked into a
+# (frames x 17 x 3) tensor of x, y, confidence. Joint angles, swing scores and
+# confidence masks are computed for all frames at once, and the rep state
+# machines run over the resulting angle arrays. What to compute and how reps
+# are segmented and graded comes from the exercise table in core/exercises.py.
+import numpy as np
+from core.exercises import DETECT_SCALES, EXERCISES, JOINTS, SIGNALS, get_exercise, resolve_thresholds
+from core.geometry import COMPARE, calculate_angles, evaluate_form
+
+NUM_KEYPOINTS = 17
+
+# Phase transition angles used by the state machines (degrees)
+DEFAULT_THRESHOLDS = {name: spec["thresholds"] for name, spec in EXERCISES.items()}
+
+
+def pack_keypoints(keypoints=None, conf=None):
+    """Returns one (17, 3) x/y/conf row. A missing person becomes all zeros."""
+    row = np.zeros((NUM_KEYPOINTS, 3), dtype=np.float32)
+    if keypoints is not None and len(keypoints) >= NUM_KEYPOINTS:
+        row[:, :2] = keypoints[:NUM_KEYPOINTS]
+        if conf is not None:
+            row[:, 2] = conf[:NUM_KEYPOINTS]
+    return row
+
+
+def stack_keypoints(rows):
+    """Stacks per-frame (17, 3) rows into a (frames, 17, 3) tensor."""
+    if len(rows) == 0:
+        return np.zeros((0, NUM_KEYPOINTS, 3), dtype=np.float32)
+    return np.stack(rows).astype(np.float32, copy=False)
+
+
+def _side_joints(xy, conf, spec, names):
+    """(frames, 2) coordinates of the named joints on the exercise's side, plus per-frame confidence."""
+    angle_joints = spec["angle"]
+    if spec["side"] == "left":
+        joints = {name: xy[:, JOINTS[name][0]] for name in names}
+        idx = [JOINTS[name][0] for name in angle_joints]
+        confidence = conf[:, idx].min(axis=1) if len(xy) else np.zeros(0, dtype=np.float32)
+        return joints, confidence
+
+    # AUTO-SIDE SELECTION: use whichever side YOLO is more sure about
+    l_score = conf[:, [JOINTS[name][0] for name in angle_joints]].sum(axis=1)
+    r_score = conf[:, [JOINTS[name][1] for name in angle_joints]].sum(axis=1)
+    left = (l_score > r_score)[:, None]
+    joints = {name: np.where(left, xy[:, JOINTS[name][0]], xy[:, JOINTS[name][1]]) for name in names}
+    confidence = np.where(left[:, 0], l_score, r_score) / len(angle_joints)
+    return joints, confidence
+
+
+def compute_features(kps, exercise_type, min_confidence=0.0):
+    """
+    Computes every per-frame signal the state machine needs in one pass.
+
+    Returns a dict of arrays (one entry per frame):
+      angle      - joint angle driving the phases, NaN when unusable
+      swing      - elbow swing score (NaN unless the exercise uses it)
+      confidence - keypoint confidence of the joints used
+      valid      - frames the state machine should look at
+      shoulder / hip - (frames, 2) guide points for overlays (None if unused)
+    plus any other signal the exercise lists (see core.exercises.SIGNALS).
+    """
+    spec = get_exercise(exercise_type)
+    kps = np.asarray(kps, dtype=np.float32)
+    xy, conf = kps[..., :2], kps[..., 2]
+
+    names = dict.fromkeys(spec["angle"])
+    for signal in spec["signals"]:
+        names.update(dict.fromkeys(SIGNALS[signal][0]))
+    joints, confidence = _side_joints(xy, conf, spec, names)
+
+    a, b, c = spec["angle"]
+    angle = calculate_angles(joints[a], joints[b], joints[c])
+    # A 0 degree angle counts as missing, same as the old `if angle:` check
+    valid = np.isfinite(angle) & (angle != 0)
+    if min_confidence > 0:
+        valid &= confidence >= min_confidence
+
+    features = {
+        "angle": angle,
+        "swing": np.full(len(kps), np.nan, dtype=np.float32),
+        "confidence": confidence,
+        "valid": valid,
+        "shoulder": joints.get("shoulder"),
+        "hip": joints.get("hip"),
+    }
+    for signal in spec["signals"]:
+        inputs, fn = SIGNALS[signal]
+        features[signal] = fn(*(joints[name] for name in inputs))
+    return features
+
+
+class _Machine:
+    """
+    An exercise entry resolved for one set of thresholds: the start / finish
+    transitions as (from, compare, threshold, to) and the trackers split into
+    those checked before and after the start transition.
+    """
+
+    def __init__(self, exercise_type, thresholds=None):
+        spec = get_exercise(exercise_type)
+        self.spec = spec
+        self.thresholds = resolve_thresholds(exercise_type, thresholds)
+        self.start = self._transition(spec["start"])
+        self.finish = self._transition(spec["finish"])
+        trackers = [
+            (name, t["signal"], COMPARE["<"] if t["keep"] == "min" else COMPARE[">"], t["stage"], t["reset"],
+             t.get("before_start", False))
+            for name, t in spec["track"].items()
+        ]
+        self.pre = [t[:5] for t in trackers if t[5]]
+        self.post = [t[:5] for t in trackers if not t[5]]
+        self.resets = {name: t["reset"] for name, t in spec["track"].items()}
+        self.signals = sorted({t[1] for t in trackers} - {"angle"})
+
+    def _transition(self, rule):
+        src, op, threshold, dst = rule
+        return src, COMPARE[op], self.thresholds[threshold], dst
+
+    def score(self, reps):
+        """Fills in feedback / error_tag of finished reps, all in one vectorized call."""
+        if not reps:
+            return reps
+        feedback, errors = evaluate_form(self.spec["rules"], [rep["primary_metric"] for rep in reps],
+                                         [rep["secondary_metric"] for rep in reps])
+        for rep, fb, err in zip(reps, feedback.tolist(), errors.tolist()):
+            rep["feedback"], rep["error_tag"] = fb, err
+        return reps
+
+
+class RepSegmenter:
+    """
+    Rep state machine that runs over angle arrays.
+    It keeps its state between calls to feed(), so a clip can be fed all at
+    once or batch by batch while the video is still being decoded.
+    """
+
+    def __init__(self, exercise_type="Squat", thresholds=None):
+        self.machine = _Machine(exercise_type, thresholds)
+        self.exercise_type = exercise_type
+        self.thresholds = self.machine.thresholds
+        self.frame_index = 0
+
+        self.rep_count = 0
+        self.stage = self.machine.spec["initial"]  # IMPORTANT
+        # Peak values of the current rep (depth, lockout, swing, ...)
+        self.values = dict(self.machine.resets)
+
+    def feed(self, features):
+        """
+        Advances the state machine over a chunk of frames.
+        Returns (reps, rep_counts): the reps completed in this chunk and the
+        running rep count after each frame (for on-screen overlays).
+        """
+        angles = features["angle"]
+        rep_counts = np.empty(len(angles), dtype=np.int32)
+        reps = []
+
+        m = self.machine
+        signals = {"angle": angles.tolist()}
+        for name in m.signals:
+            signals[name] = features[name].tolist()
+        # Trackers bound to this chunk's signal lists
+        pre = [(name, signals[signal], better, stage) for name, signal, better, stage, _ in m.pre]
+        post = [(name, signals[signal], better, stage) for name, signal, better, stage, _ in m.post]
+        angle_list = signals["angle"]
+
+        for i, ok in enumerate(features["valid"].tolist()):
+            if ok:
+                rep = self._step(i, angle_list[i], pre, post)
+                if rep is not None:
+                    rep["frame"] = self.frame_index + i
+                    reps.append(rep)
+            rep_counts[i] = self.rep_count
+
+        self.frame_index += len(angles)
+        return m.score(reps), rep_counts
+
+    def _track(self, trackers, i):
+        values = self.values
+        for name, signal, better, stage in trackers:
+            if self.stage == stage and better(signal[i], values[name]):
+                values[name] = signal[i]
+
+    def _step(self, i, angle, pre, post):
+        m = self.machine
+        self._track(pre, i)
+
+        src, passes, threshold, dst = m.start
+        if self.stage == src and passes(angle, threshold):
+            self.stage = dst
+
+        self._track(post, i)
+
+        src, passes, threshold, dst = m.finish
+        if self.stage == src and passes(angle, threshold):
+            self.stage = dst
+            self.rep_count += 1
+            m1, m2 = (self.values[name] if name else 0 for name in m.spec["metrics"])
+            # feedback / error_tag are filled in by _Machine.score
+            rep = {
+                "rep_count": self.rep_count,
+                "primary_metric": m1,
+                "secondary_metric": m2,
+                "feedback": None,
+                "error_tag": None,
+            }
+            self.values = dict(m.resets)
+            return rep
+        return None
+
+
+class TrackSegmenter:
+    """
+    RepSegmenter for many athletes at once (see core.tracking.PoseTracker).
+
+    The state of every track lives in flat arrays indexed by the tracker's dense
+    slot, and each frame advances all tracks together. feed() takes features
+    shaped (frames, slots); a track with no detection in a frame simply has
+    invalid features there, and reset() clears the slots of retired tracks for
+    reuse. For a single track it gives exactly the RepSegmenter reps.
+    """
+
+    def __init__(self, exercise_type="Squat", thresholds=None, capacity=8):
+        self.machine = _Machine(exercise_type, thresholds)
+        self.exercise_type = exercise_type
+        self.thresholds = self.machine.thresholds
+        self.frame_index = 0
+        # Stages are stored as small ints
+        self.stage_codes = {stage: code for code, stage in enumerate(
+            dict.fromkeys([self.machine.spec["initial"], self.machine.start[0], self.machine.start[3]]))}
+        self.capacity = 0
+        self.rep_count = np.zeros(0, dtype=np.int32)
+        self.stage = np.zeros(0, dtype=np.int8)
+        self.values = {name: np.zeros(0, dtype=np.float64) for name in self.machine.resets}
+        self._ensure(capacity)
+
+    def _ensure(self, n):
+        """Grows the state arrays (doubling) so that track ids < n fit."""
+        if n <= self.capacity:
+            return
+        extra = max(n, 2 * self.capacity) - self.capacity
+        initial = self.stage_codes[self.machine.spec["initial"]]
+        self.rep_count = np.concatenate([self.rep_count, np.zeros(extra, dtype=np.int32)])
+        self.stage = np.concatenate([self.stage, np.full(extra, initial, dtype=np.int8)])
+        for name, reset in self.machine.resets.items():
+            self.values[name] = np.concatenate([self.values[name], np.full(extra, reset, dtype=np.float64)])
+        self.capacity += extra
+
+    def reset(self, slots):
+        """Back to the initial state (no reps) for the given slots."""
+        slots = [slot for slot in slots if slot < self.capacity]
+        self.rep_count[slots] = 0
+        self.stage[slots] = self.stage_codes[self.machine.spec["initial"]]
+        for name, reset in self.machine.resets.items():
+            self.values[name][slots] = reset
+
+    def feed(self, features):
+        """
+        Advances every track over a chunk of frames.
+        Returns (reps, rep_counts): the reps completed in this chunk (each with a
+        "slot") and the (frames, slots) running rep counts.
+        """
+        angles = np.asarray(features["angle"], dtype=np.float64)
+        valid = np.asarray(features["valid"], dtype=bool)
+        signals = {name: np.asarray(features[name], dtype=np.float64) for name in self.machine.signals}
+        n_frames, n_tracks = angles.shape
+        self._ensure(n_tracks)
+        rep_counts = np.empty((n_frames, n_tracks), dtype=np.int32)
+        reps = []
+
+        for i in range(n_frames):
+            if valid[i].any():
+                frame_signals = {name: values[i] for name, values in signals.items()}
+                frame_signals["angle"] = angles[i]
+                for rep in self._step(frame_signals, valid[i], n_tracks):
+                    rep["frame"] = self.frame_index + i
+                    reps.append(rep)
+            rep_counts[i] = self.rep_count[:n_tracks]
+
+        self.frame_index += n_frames
+        return self.machine.score(reps), rep_counts
+
+    def _track(self, trackers, signals, ok, n):
+        stage = self.stage[:n]
+        for name, signal, better, tracked_stage, _ in trackers:
+            current, value = self.values[name][:n], signals[signal]
+            hit = ok & (stage == self.stage_codes[tracked_stage]) & better(value, current)  # NaN compares False
+            current[hit] = value[hit]
+
+    def _step(self, signals, ok, n):
+        m, codes = self.machine, self.stage_codes
+        angle, stage = signals["angle"], self.stage[:n]
+        self._track(m.pre, signals, ok, n)
+
+        src, passes, threshold, dst = m.start
+        started = ok & (stage == codes[src]) & passes(angle, threshold)
+        stage[started] = codes[dst]
+
+        self._track(m.post, signals, ok, n)
+
+        src, passes, threshold, dst = m.finish
+        done = ok & (stage == codes[src]) & passes(angle, threshold)
+        if not done.any():
+            return []
+        stage[done] = codes[dst]
+        self.rep_count[:n][done] += 1
+
+        primary, secondary = m.spec["metrics"]
+        reps = []
+        for slot in np.flatnonzero(done).tolist():
+            reps.append({
+                "slot": slot,
+                "rep_count": int(self.rep_count[slot]),
+                "primary_metric": float(self.values[primary][slot]),
+                # Squats have no secondary metric, logged as 0 like RepSegmenter
+                "secondary_metric": float(self.values[secondary][slot]) if secondary else 0,
+                "feedback": None,
+                "error_tag": None,
+            })
+        for name, reset in m.resets.items():
+            self.values[name][:n][done] = reset
+        return reps
+
+
+def analyze_trajectory(kps, exercise_type="Squat", thresholds=None, min_confidence=0.0):
+    """
+    Scores a whole clip from its keypoint tensor, no YOLO needed.
+    Returns the list of completed reps.
+    """
+    features = compute_features(kps, exercise_type, min_confidence=min_confidence)
+    reps, _ = RepSegmenter(exercise_type, thresholds).feed(features)
+    return reps
+
+
+def _fit_margin(features, detect):
+    """
+    Smallest margin (in DETECT_SCALES units) by which the (signal, percentile, op, value)
+    conditions hold over the usable frames; negative if one fails, -inf without data.
+    """
+    margin = np.inf
+    for signal, percentile, op, value in detect:
+        values = np.asarray(features[signal], dtype=np.float64)
+        values = values[features["valid"] & np.isfinite(values)]
+        if len(values) == 0:
+            return -np.inf
+        diff = np.percentile(values, percentile) - value
+        margin = min(margin, (diff if op in (">", ">=") else -diff) / DETECT_SCALES[signal])
+    return float(margin)
+
+
+def detect_exercise(kps, reps_by_exercise=None, min_confidence=0.0):
+    """
+    Scores every exercise hypothesis on the same keypoints and picks the best fit:
+    among the exercises with reps, the one whose `detect` conditions hold by the
+    widest margin (a failed condition is a negative margin, so a clip that fits
+    nothing still gets the closest match). Pass reps_by_exercise to reuse reps
+    already segmented during the pass. Returns (exercise_type, {exercise_type: reps}).
+    """
+    reps_by_exercise = dict(reps_by_exercise or {})
+    margins = {}
+    for name, spec in EXERCISES.items():
+        features = compute_features(kps, name, min_confidence=min_confidence)
+        if name not in reps_by_exercise:
+            reps_by_exercise[name], _ = RepSegmenter(name).feed(features)
+        margins[name] = _fit_margin(features, spec["detect"])
+
+    candidates = [name for name in EXERCISES if reps_by_exercise[name]] or list(EXERCISES)
+    best = max(candidates, key=lambda name: margins[name])
+    return best, reps_by_exercise
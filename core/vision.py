@@ -1,10 +1,88 @@
 # YOLO-Pose implementation
-from ultralytics import YOLO
-import cv2
+import os
+import threading
+import numpy as np
+from core.backends import export_model, resolve_backend
+
+DEFAULT_MODEL = 'yolov8n-pose.pt'
+# Checked-in weights slot; only used once real weights are dropped in (the repo ships a placeholder)
+ASSET_MODEL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'yolo_pose.pt')
+MIN_WEIGHTS_BYTES = 1024 * 1024
+
+
+def resolve_model_path(model_path=None):
+    """Explicit path > POSE_MODEL_PATH env var > assets/yolo_pose.pt (if real) > yolov8n-pose.pt."""
+    if model_path:
+        return model_path
+    env_path = os.getenv("POSE_MODEL_PATH")
+    if env_path:
+        return env_path
+    if os.path.isfile(ASSET_MODEL) and os.path.getsize(ASSET_MODEL) >= MIN_WEIGHTS_BYTES:
+        return ASSET_MODEL
+    return DEFAULT_MODEL
+
+
+class SharedPoseModel:
+    """
+    Thread-safe handle to a YOLO model shared by every session in the process.
+    Ultralytics predictors keep per-call state, so calls are serialized with a lock.
+
+    backend "onnx" / "openvino" loads (exporting on first use) an optimized CPU
+    artifact of the weights instead, see core.backends. model_path is then the
+    artifact's path, so keypoint caches never mix backends.
+    """
+
+    def __init__(self, model_path, backend="torch", int8=False):
+        self.weights_path = model_path
+        self.backend = backend
+        self.int8 = int8
+        self.model_path = export_model(model_path, backend, int8)
+        # torch + ultralytics take seconds to import, so they load with the first model
+        from ultralytics import YOLO
+        self.yolo = YOLO(self.model_path, task="pose")
+        self.lock = threading.Lock()
+        self.warmed_up = False
+
+    def __call__(self, source, **kwargs):
+        with self.lock:
+            return self.yolo(source, **kwargs)
+
+    def warm_up(self, size=(384, 640)):
+        """Runs one dummy inference so the first real frame doesn't pay setup cost."""
+        if self.warmed_up:
+            return
+        dummy = np.zeros((size[0], size[1], 3), dtype=np.uint8)
+        self(dummy, verbose=False)
+        self.warmed_up = True
+
+    def __getattr__(self, name):
+        # Anything else (names, device, ...) goes to the underlying YOLO object
+        return getattr(self.yolo, name)
+
+
+_REGISTRY = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_pose_model(model_path=None, warmup=False, backend=None, int8=None):
+    """Loads each weight file (per backend) once per process and hands out the shared handle."""
+    model_path = resolve_model_path(model_path)
+    backend, int8 = resolve_backend(backend, int8, model_path)
+    key = (model_path, backend, int8)
+    with _REGISTRY_LOCK:
+        model = _REGISTRY.get(key)
+        if model is None:
+            model = SharedPoseModel(model_path, backend, int8)
+            _REGISTRY[key] = model
+    if warmup:
+        model.warm_up()
+    return model
+
 
 class PoseEstimator:
-    def __init__(self, model_path='yolov8n-pose.pt'):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path=None, warmup=False, backend=None, int8=None):
+        self.model = get_pose_model(model_path, warmup=warmup, backend=backend, int8=int8)
+        self.model_path = self.model.model_path
 
     def get_keypoints(self, frame):
         results = self.model(frame, verbose=False)
@@ -13,4 +91,4 @@ class PoseEstimator:
             # 5=L_Shoulder, 11=L_Hip, 13=L_Knee, 15=L_Ankle (Indices for YOLO)
             keypoints = results[0].keypoints.xy[0].cpu().numpy()
             return keypoints
-        return None
\ No newline at end of file
+        return None
@@ -1 +1,270 @@
-# Runner script
\ No newline at end of file
+# Runner script
+# Headless batch analysis: scores every video of a directory (or manifest) on a
+# pool of worker processes, each holding its own pose model, and writes one
+# consolidated rep / error dataset. Interrupted runs pick up where they stopped.
+#
+#   python main.py archive/ --exercise Auto --workers 4 --output data/batch
+import argparse
+import concurrent.futures as cf
+import csv
+import hashlib
+import json
+import logging
+import multiprocessing as mp
+import os
+import sys
+import time
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv")
+DATASET_COLUMNS = ("video", "user_id", "exercise", "athlete", "rep_count", "primary_metric",
+                   "secondary_metric", "error_tag", "feedback", "frame")
+
+# Set in each worker process by _init_worker
+_PROCESSOR = None
+
+
+def discover_videos(source, exercise="Squat", user_id="default"):
+    """
+    Jobs as dicts (video, exercise, user_id) from a directory (searched
+    recursively) or a manifest: a .csv with a "path" column (optional "exercise"
+    and "user_id" columns) or a text file with one path per line.
+    """
+    if os.path.isdir(source):
+        videos = []
+        for root, _, files in os.walk(source):
+            videos.extend(os.path.join(root, f) for f in files if f.lower().endswith(VIDEO_EXTENSIONS))
+        return [{"video": os.path.abspath(v), "exercise": exercise, "user_id": user_id} for v in sorted(videos)]
+
+    base = os.path.dirname(os.path.abspath(source))
+    resolve = lambda path: os.path.abspath(os.path.join(base, path.strip()))
+    jobs = []
+    with open(source, newline="") as f:
+        if source.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                if row.get("path"):
+                    jobs.append({"video": resolve(row["path"]), "exercise": row.get("exercise") or exercise,
+                                 "user_id": row.get("user_id") or user_id})
+        else:
+            for line in f:
+                if line.strip() and not line.lstrip().startswith("#"):
+                    jobs.append({"video": resolve(line), "exercise": exercise, "user_id": user_id})
+    return jobs
+
+
+def job_key(job, video_hash, settings):
+    """
+    Identity of one analysis: the video (path and content), its exercise and the
+    model / inference settings. A rerun with other settings, or an edited video,
+    is a new job; the key also becomes the session id of its reps in the store.
+    """
+    raw = json.dumps([job["video"], video_hash, job["exercise"], settings], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def load_results(results_path):
+    """{job key: record} of finished jobs in a results log (a torn last line is ignored)."""
+    done = {}
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok" and record.get("key"):
+                done[record["key"]] = record
+    return done
+
+
+class _RepRows:
+    """Stands in for the workout store in workers: keeps the rows of the current video."""
+
+    def __init__(self):
+        self.rows = []
+
+    def append(self, rows):
+        self.rows.extend(rows)
+
+
+def _init_worker(model_path, backend, stride, roi, multi_person, torch_threads):
+    """Builds this worker's processor (and pose model) once; every job reuses it."""
+    global _PROCESSOR
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    from core.processor import VideoProcessor
+    from core.vision import PoseEstimator
+    from utils.csv_handler import WorkoutLogger
+    # No Streamlit script here; silence its "missing ScriptRunContext" warnings
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+    # Reps and metrics only: no annotated video to draw or encode. Rows go back to
+    # the parent, which stores them only once the video has succeeded
+    _PROCESSOR = VideoProcessor(detector=PoseEstimator(model_path, warmup=True, backend=backend), stride=stride, roi=roi,
+                                multi_person=multi_person, logger=WorkoutLogger(store=_RepRows()),
+                                output="metrics")
+
+
+def _analyze(job):
+    """Runs one video in a worker -> result record (never raises)."""
+    started = time.time()
+    record = {"video": job["video"], "key": job["key"], "exercise": job["exercise"], "user_id": job["user_id"]}
+    logger = _PROCESSOR.logger
+    logger.store.rows = []
+    try:
+        logger.user_id = job["user_id"]
+        rep_count, _ = _PROCESSOR.process_video(job["video"], exercise_type=job["exercise"])
+        if _PROCESSOR.frames_total == 0:
+            raise ValueError("no frames could be decoded")
+        logger.flush()
+        record.update(
+            status="ok",
+            exercise=_PROCESSOR.exercise_type,
+            rep_count=rep_count,
+            frames=_PROCESSOR.frames_total,
+            frames_inferred=_PROCESSOR.frames_inferred,
+            reps=[dict(rep) for rep in _PROCESSOR.reps],
+            # Store rows under the job key, so storing them twice is detectable
+            rows=[(row[0], job["key"], *row[2:]) for row in logger.store.rows],
+        )
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    record["seconds"] = round(time.time() - started, 2)
+    return record
+
+
+def write_dataset(results, dataset_path):
+    """Flattens result records into one CSV row per rep."""
+    tmp_path = dataset_path + ".tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=DATASET_COLUMNS)
+        writer.writeheader()
+        for record in results:
+            for rep in record["reps"]:
+                track_id = rep.get("track_id")
+                writer.writerow({
+                    "video": record["video"],
+                    "user_id": record["user_id"],
+                    "exercise": record["exercise"],
+                    "athlete": "" if track_id is None else track_id + 1,
+                    "rep_count": rep["rep_count"],
+                    "primary_metric": round(float(rep["primary_metric"]), 2),
+                    "secondary_metric": round(float(rep["secondary_metric"]), 2),
+                    "error_tag": rep["error_tag"],
+                    "feedback": rep["feedback"],
+                    "frame": rep.get("frame", ""),
+                })
+    os.replace(tmp_path, dataset_path)
+
+
+def run_batch(jobs, output_dir, workers=2, model_path=None, backend=None, stride=1, roi=False, multi_person=False,
+              db_path=None):
+    """
+    Analyzes jobs on `workers` processes. Each finished video is appended to
+    <output_dir>/results.jsonl right away, so a rerun skips every job already
+    done with the same video content and settings (failed ones are retried);
+    <output_dir>/reps.csv is rebuilt at the end. A video's reps reach the workout
+    store in one transaction once it has succeeded, at most once per job key.
+    Returns (videos ok, videos failed) for this run.
+    """
+    from core.backends import export_model, resolve_backend
+    from core.cache import hash_file, model_fingerprint
+    from core.vision import resolve_model_path
+    from utils.workout_store import DEFAULT_DB, get_workout_store
+
+    os.makedirs(output_dir, exist_ok=True)
+    results_path = os.path.join(output_dir, "results.jsonl")
+    done = load_results(results_path)
+    weights = resolve_model_path(model_path)
+    settings = {"model": model_fingerprint(weights), "backend": resolve_backend(backend, model_path=weights),
+                "stride": stride, "roi": roi, "multi_person": multi_person}
+    for job in jobs:
+        try:
+            video_hash = hash_file(job["video"])
+        except OSError:
+            video_hash = None   # missing / unreadable: the worker reports the error
+        job["key"] = job_key(job, video_hash, settings)
+    todo = [job for job in jobs if job["key"] not in done]
+    print(f"{len(jobs)} video(s), {len(jobs) - len(todo)} already done, {len(todo)} to analyze", file=sys.stderr)
+
+    ok = failed = 0
+    if todo:
+        # Export once here; workers would otherwise race to write the same artifact
+        export_model(weights, *settings["backend"])
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+        # spawn: forking a process that has already touched torch / OpenCV threads is not safe
+        pool = cf.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path, backend, stride, roi, multi_person, torch_threads),
+        )
+        store = get_workout_store(db_path or DEFAULT_DB)
+        try:
+            with open(results_path, "a") as log:
+                futures = [pool.submit(_analyze, job) for job in todo]
+                for i, future in enumerate(cf.as_completed(futures), start=1):
+                    record = future.result()
+                    if record["status"] == "ok":
+                        # Store first, then mark done: a crash in between re-runs the job,
+                        # and append_session skips the rows it already holds
+                        store.append_session(record["key"], record.pop("rows"))
+                    log.write(json.dumps(record) + "\n")
+                    log.flush()
+                    os.fsync(log.fileno())
+                    if record["status"] == "ok":
+                        ok += 1
+                        done[record["key"]] = record
+                        summary = f"{record['rep_count']} reps ({record['exercise']})"
+                    else:
+                        failed += 1
+                        summary = record["error"]
+                    print(f"[{i}/{len(todo)}] {record['video']}: {summary} in {record['seconds']}s", file=sys.stderr)
+        except KeyboardInterrupt:
+            print("Interrupted; finished videos are saved, rerun the same command to resume.", file=sys.stderr)
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+
+    # Keep the manifest order in the dataset
+    write_dataset([done[job["key"]] for job in jobs if job["key"] in done], os.path.join(output_dir, "reps.csv"))
+    return ok, failed
+
+
+def main(argv=None):
+    from core.backends import BACKENDS
+    from core.exercises import AUTO_DETECT, EXERCISES
+
+    parser = argparse.ArgumentParser(description="Batch rep / form analysis of workout videos.")
+    parser.add_argument("source", help="directory of videos, or a manifest (.csv with a 'path' column, or .txt)")
+    parser.add_argument("--exercise", default="Squat", choices=[*EXERCISES, AUTO_DETECT],
+                        help="exercise when the manifest doesn't say (default: Squat)")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes, one pose model each")
+    parser.add_argument("--output", default="data/batch", help="output directory (results.jsonl + reps.csv)")
+    parser.add_argument("--user-id", default="default", help="user id when the manifest doesn't say")
+    parser.add_argument("--model", default=None, help="pose weights (default: see core/vision.py)")
+    parser.add_argument("--backend", default=None, choices=BACKENDS,
+                        help="pose runtime (default: POSE_BACKEND or torch)")
+    parser.add_argument("--stride", type=int, default=1, help="adaptive inference stride (1 = every frame)")
+    parser.add_argument("--roi", action="store_true",
+                        help="run pose on a crop around the athlete, full frame only to find them")
+    parser.add_argument("--group", action="store_true", help="count reps for every athlete in the video")
+    parser.add_argument("--db", default=None, help="workout history database the reps are logged to")
+    args = parser.parse_args(argv)
+    if args.group and args.exercise == AUTO_DETECT:
+        parser.error("--group needs an explicit --exercise (auto-detect follows a single athlete)")
+
+    jobs = discover_videos(args.source, args.exercise, args.user_id)
+    if not jobs:
+        parser.error(f"no videos found in {args.source}")
+    try:
+        ok, failed = run_batch(jobs, args.output, workers=max(1, args.workers), model_path=args.model,
+                               backend=args.backend, stride=args.stride, roi=args.roi, multi_person=args.group, db_path=args.db)
+    except KeyboardInterrupt:
+        return 130
+    print(f"Done: {ok} analyzed, {failed} failed. Dataset: {os.path.join(args.output, 'reps.csv')}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,25 @@
 # nlp/agent.py
+import asyncio
 import os
+import threading
+import time
+import weakref
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from nlp.lexical import is_tag_query
 from nlp.rag_engine import KnowledgeBase
+from utils.metrics import METRICS
 
 load_dotenv()
 
-class FitnessAgent:
-    def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
-        self.llm = ChatOpenAI(model="gpt-4o", openai_api_key=api_key, temperature=0.7)
-        self.kb = KnowledgeBase(api_key)
+TECHNICAL_KEYWORDS = ["squat", "form", "depth", "pain", "angle", "error", "biomechanics"]
 
-    def get_coaching_advice(self, user_query, chat_history, workout_summary):
-        # 1. Get Biomechanical Knowledge from PDFs (only if query is technical)
-        is_technical = any(word in user_query.lower() for word in ["squat", "form", "depth", "pain", "angle", "error", "biomechanics"])
-        expert_context = self.kb.query(user_query) if is_technical else "Generic interaction."
 
-        # 2. The "Human Coach" Prompt
-        template = """
+def is_technical(user_query):
+    """Worth a knowledge-base lookup: a technical keyword or an error tag ("ELBOW_SWINGING?")."""
+    return any(word in user_query.lower() for word in TECHNICAL_KEYWORDS) or is_tag_query(user_query)
+
+# The "Human Coach" Prompt
+COACH_TEMPLATE = """
         You are 'Coach Alex', a friendly, professional, and world-class Biomechanics Coach.
         
         PERSONA:
@@ -37,21 +37,157 @@ class FitnessAgent:
         2. If they ask about their performance, use the LAST WORKOUT DATA provided.
         3. If they ask "Why" an error matters, use the SCIENTIFIC RESEARCH to explain the biomechanics (e.g., joint shear, lumbar stress).
         4. Remember the conversation history to stay helpful.
-        """
+"""
+
 
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", template),
+class FitnessAgent:
+    def __init__(self, llm=None, kb=None, max_concurrency=8):
+        # LangChain / OpenAI client modules take seconds to import: loaded with the first agent
+        import httpx
+        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+        from langchain_openai import ChatOpenAI
+
+        api_key = os.getenv("OPENAI_API_KEY")
+        # Any LangChain chat model works here (tests pass a local fake model).
+        # The async client keeps a bounded pool of keep-alive connections shared by all
+        # sessions; OPENAI_BASE_URL can point it at a local stub server.
+        self.llm = llm or ChatOpenAI(
+            model="gpt-4o",
+            openai_api_key=api_key,
+            temperature=0.7,
+            http_async_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+            ),
+        )
+        self.kb = kb or KnowledgeBase(api_key)
+
+        # At most max_concurrency requests in flight to the model endpoint per event loop
+        self.max_concurrency = max_concurrency
+        self._limiters = weakref.WeakKeyDictionary()
+        # Long-lived loop for the blocking wrappers; pooled connections are tied to
+        # the loop that opened them, so they must not hop between asyncio.run() calls
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+        # Prompt + chain are built once and reused for every message
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", COACH_TEMPLATE),
             MessagesPlaceholder(variable_name="chat_history"),
             ("user", "{input}")
         ])
+        self.chain = self.prompt | self.llm
 
-        chain = prompt | self.llm
-        
-        response = chain.invoke({
+    def _build_inputs(self, user_query, chat_history, workout_summary):
+        # 1. Get Biomechanical Knowledge from PDFs (only if query is technical)
+        expert_context = self._retrieve(user_query) if is_technical(user_query) else "Generic interaction."
+
+        return {
             "input": user_query,
             "chat_history": chat_history,
             "workout_summary": workout_summary,
             "expert_knowledge": expert_context
-        })
-        
-        return response.content
\ No newline at end of file
+        }
+
+    def _retrieve(self, user_query):
+        with METRICS.timer("retrieval"):
+            return self.kb.query(user_query)
+
+    def get_coaching_advice(self, user_query, chat_history, workout_summary):
+        inputs = self._build_inputs(user_query, chat_history, workout_summary)
+        with METRICS.timer("llm"):
+            response = self.chain.invoke(inputs)
+        return response.content
+
+    def stream_coaching_advice(self, user_query, chat_history, workout_summary):
+        """Yields the answer token by token as the model generates it."""
+        inputs = self._build_inputs(user_query, chat_history, workout_summary)
+        started = time.perf_counter()
+        first = True
+        for chunk in self.chain.stream(inputs):
+            if first:
+                METRICS.observe("llm_first_token", time.perf_counter() - started)
+                first = False
+            if chunk.content:
+                yield chunk.content
+        METRICS.observe("llm", time.perf_counter() - started)
+
+    # ---------------- ASYNC API ----------------
+    def _limiter(self):
+        loop = asyncio.get_running_loop()
+        limiter = self._limiters.get(loop)
+        if limiter is None:
+            limiter = self._limiters[loop] = asyncio.Semaphore(self.max_concurrency)
+        return limiter
+
+    async def _abuild_inputs(self, user_query, chat_history, workout_summary):
+        """
+        Retrieval and workout summary run at the same time, off the event loop.
+        workout_summary may be a string or a zero-argument callable
+        (e.g. utils.helpers.generate_workout_summary).
+        """
+        async def knowledge():
+            if not is_technical(user_query):
+                return "Generic interaction."
+            return await asyncio.to_thread(self._retrieve, user_query)
+
+        async def summary():
+            if callable(workout_summary):
+                return await asyncio.to_thread(workout_summary)
+            return workout_summary
+
+        expert_context, summary_text = await asyncio.gather(knowledge(), summary())
+        return {
+            "input": user_query,
+            "chat_history": chat_history,
+            "workout_summary": summary_text,
+            "expert_knowledge": expert_context
+        }
+
+    async def aget_coaching_advice(self, user_query, chat_history, workout_summary):
+        """
+        Async version of get_coaching_advice. Await it from one long-lived event loop
+        (the pooled HTTP client belongs to the loop that first uses it).
+        """
+        inputs = await self._abuild_inputs(user_query, chat_history, workout_summary)
+        # Waits here when max_concurrency requests are already in flight (backpressure)
+        async with self._limiter():
+            with METRICS.timer("llm"):
+                response = await self.chain.ainvoke(inputs)
+        return response.content
+
+    async def astream_coaching_advice(self, user_query, chat_history, workout_summary):
+        inputs = await self._abuild_inputs(user_query, chat_history, workout_summary)
+        async with self._limiter():
+            started = time.perf_counter()
+            first = True
+            async for chunk in self.chain.astream(inputs):
+                if first:
+                    METRICS.observe("llm_first_token", time.perf_counter() - started)
+                    first = False
+                if chunk.content:
+                    yield chunk.content
+            METRICS.observe("llm", time.perf_counter() - started)
+
+    async def abatch_coaching_advice(self, requests, return_exceptions=False):
+        """
+        Answers many (user_query, chat_history, workout_summary) requests concurrently,
+        e.g. several chat sessions sharing one event loop. Results keep request order.
+        """
+        return await asyncio.gather(
+            *(self.aget_coaching_advice(*request) for request in requests),
+            return_exceptions=return_exceptions,
+        )
+
+    def batch_coaching_advice(self, requests, return_exceptions=False):
+        """Blocking wrapper around abatch_coaching_advice for scripts and workers."""
+        future = asyncio.run_coroutine_threadsafe(
+            self.abatch_coaching_advice(requests, return_exceptions), self._background_loop()
+        )
+        return future.result()
+
+    def _background_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="agent-loop", daemon=True).start()
+            return self._loop
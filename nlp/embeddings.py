@@ -0,0 +1,153 @@
+# nlp/embeddings.py
+# Embedding providers for the knowledge base: OpenAI or a local CPU hashing model,
+# wrapped in a persistent cache so the same text is never embedded twice.
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Offline embedding model: signed feature hashing of word unigrams and bigrams,
+    L2-normalised. No network, no weights, deterministic across processes,
+    good enough for keyword-ish retrieval and for tests.
+    """
+
+    def __init__(self, size=384):
+        self.size = size
+        self.model_id = f"hashing-{size}"
+
+    def _embed(self, text):
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vec = np.zeros(self.size, dtype=np.float32)
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            h = int.from_bytes(digest, "little")
+            vec[h % self.size] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm > 0 else vec).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class EmbeddingCache:
+    """SQLite store of text-hash -> float32 vector, shared by every process on the box."""
+
+    def __init__(self, path="data/cache/embeddings.sqlite"):
+        self.path = path
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self.conn.commit()
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in items],
+            )
+            self.conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps any provider: texts are looked up by content hash first, and only the
+    misses are sent to the provider, batch_size texts per call.
+    """
+
+    def __init__(self, provider, model_id, cache=None, batch_size=256):
+        self.provider = provider
+        self.model_id = model_id
+        self.cache = cache or EmbeddingCache()
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_id}\x00{text}".encode()).hexdigest()
+
+    def embed_documents(self, texts):
+        keys = [self._key(t) for t in texts]
+        found = self.cache.get_many(list(set(keys)))
+
+        # Embed each distinct missing text once, in large batches
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        pending = list(missing.items())
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            vectors = self.provider.embed_documents([text for _, text in batch])
+            new_items = [(key, vec) for (key, _), vec in zip(batch, vectors)]
+            self.cache.put_many(new_items)
+            found.update(new_items)
+
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text):
+        key = self._key(f"query\x00{text}")
+        found = self.cache.get_many([key])
+        if key in found:
+            self.hits += 1
+            return found[key]
+        self.misses += 1
+        vector = self.provider.embed_query(text)
+        self.cache.put_many([(key, vector)])
+        return vector
+
+
+def get_embeddings(api_key=None, provider=None, cache=True):
+    """
+    Embedding backend selected by `provider` or the EMBEDDING_PROVIDER env var:
+      "openai" (default) - OpenAIEmbeddings, needs an API key
+      "local"            - HashingEmbeddings, offline CPU model
+    """
+    provider = (provider or os.getenv("EMBEDDING_PROVIDER", "openai")).lower()
+    if provider in ("local", "hashing"):
+        backend = HashingEmbeddings()
+        model_id = backend.model_id
+    elif provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        backend = OpenAIEmbeddings(openai_api_key=api_key)
+        model_id = f"openai-{backend.model}"
+    else:
+        raise ValueError(f"Unknown embedding provider: {provider}")
+
+    if not cache:
+        return backend
+    return CachedEmbeddings(backend, model_id)
+
+
+def embedding_model_id(embeddings):
+    """Identifier of the vector space an Embeddings object produces."""
+    return getattr(embeddings, "model_id", type(embeddings).__name__)
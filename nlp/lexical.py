@@ -0,0 +1,140 @@
+# nlp/lexical.py
+# BM25 inverted index over the knowledge-base chunks, stored next to the FAISS
+# index. Error-tag lookups (ELBOW_SWINGING) and bare keyword lookups ("knee
+# valgus") are answered from it without an embedding call; every other question
+# fuses its ranking with the vector search (reciprocal rank fusion), so short
+# questions still get semantic matches.
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+import numpy as np
+
+LEXICAL_FILE = "lexical.json"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_TAG_RE = re.compile(r"\b[A-Z]+(?:_[A-Z]+)+\b")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by do does for from how i in is it my of on or so that the this to "
+    "was what when where which who why with you your can should".split()
+)
+
+
+def tokenize(text):
+    """'Knees caving (KNEE_VALGUS)' -> ['knee', 'caving', 'knee', 'valgu']"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        # Crude plural folding so "knees" finds "knee"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def is_tag_query(text):
+    """Mentions an error tag (ELBOW_SWINGING): an exact lookup, lexical matching is enough."""
+    return bool(_TAG_RE.search(text))
+
+
+def is_lexical_query(text, index):
+    """An error tag, or a few distinctive terms of the index's vocabulary: BM25 alone answers it."""
+    return is_tag_query(text) or (index is not None and index.is_keyword_query(text))
+
+
+class BM25Index:
+    """
+    Okapi BM25 with the per-posting weights computed at build time, so a query
+    is just a sum over the postings of its terms.
+    """
+
+    def __init__(self, ids, texts, postings, k1=1.5, b=0.75):
+        self.ids = ids
+        self.texts = texts
+        self.postings = postings    # term -> [[chunk index, weight], ...]
+        self.k1 = k1
+        self.b = b
+        # Same postings as (indices, weights) arrays for scoring
+        self._arrays = {}
+        for term, entries in postings.items():
+            entries = np.asarray(entries, dtype=np.float64).reshape(-1, 2)
+            self._arrays[term] = (entries[:, 0].astype(np.int64), entries[:, 1])
+
+    @classmethod
+    def build(cls, ids, texts, k1=1.5, b=0.75):
+        counts = [Counter(tokenize(text)) for text in texts]
+        lengths = [sum(c.values()) for c in counts]
+        avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+        doc_freq = Counter(term for c in counts for term in c)
+        n = len(texts)
+
+        postings = defaultdict(list)
+        for i, c in enumerate(counts):
+            norm = k1 * (1 - b + b * lengths[i] / avg_length) if avg_length else k1
+            for term, tf in c.items():
+                idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                postings[term].append([i, round(idf * tf * (k1 + 1) / (tf + norm), 4)])
+        return cls(list(ids), list(texts), dict(postings), k1, b)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def idf(self, term):
+        """BM25 idf of a term, 0 if no chunk has it."""
+        entries = self._arrays.get(term)
+        if entries is None:
+            return 0.0
+        n, df = len(self.ids), len(entries[0])
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def is_keyword_query(self, query, min_idf=1.5, max_terms=3):
+        """
+        A bare lookup of known vocabulary ("knee valgus", "lumbar flexion?"): at
+        most max_terms terms, each in the index and rarer than min_idf allows
+        (1.5 ~ in at most a fifth of the chunks). Longer or vaguer questions
+        need the semantic match.
+        """
+        terms = set(tokenize(query))
+        return 0 < len(terms) <= max_terms and all(self.idf(term) >= min_idf for term in terms)
+
+    def search(self, query, k=2):
+        """[(chunk id, text, score)] best first; only chunks sharing a term with the query."""
+        terms = [term for term in set(tokenize(query)) if term in self._arrays]
+        if not terms or not self.ids:
+            return []
+        scores = np.zeros(len(self.ids))
+        for term in terms:
+            indices, weights = self._arrays[term]
+            scores[indices] += weights   # a chunk appears once per term
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        best = sorted(matched.tolist(), key=lambda i: (-scores[i], i))
+        return [(self.ids[i], self.texts[i], float(scores[i])) for i in best]
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "ids": self.ids, "texts": self.texts,
+                       "postings": self.postings}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["ids"], data["texts"], data["postings"], data["k1"], data["b"])
+
+
+def fuse_rankings(rankings, k=2, rrf_k=60):
+    """
+    Reciprocal rank fusion of several rankings (chunk texts, best first) -> top k texts.
+    Rank based, so BM25 scores and FAISS distances never need a common scale.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, text in enumerate(ranking):
+            scores[text] += 1.0 / (rrf_k + rank + 1)
+    return sorted(scores, key=lambda text: -scores[text])[:k]
@@ -1,49 +1,359 @@
 # nlp/rag_engine.py
+import concurrent.futures as cf
+import hashlib
+import json
+import multiprocessing as mp
 import os
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
+import threading
+import numpy as np
+from core.cache import hash_file
+from nlp.embeddings import get_embeddings, embedding_model_id
+from nlp.lexical import LEXICAL_FILE, BM25Index, fuse_rankings, is_lexical_query
+from nlp.retrieval_cache import RetrievalCache, normalize_query
+
+# Loaded indexes shared by every KnowledgeBase in the process:
+# (db_path, embedding model) -> (file signature, vectorstore)
+_INDEX_CACHE = {}
+_INDEX_LOCK = threading.Lock()
+INDEX_FILES = ("index.faiss", "index.pkl")
+# db_path -> (file signature, BM25Index)
+_LEXICAL_CACHE = {}
+
+# Retrieval results shared by all chat sessions in the process
+_RETRIEVAL_CACHE = RetrievalCache()
+
+
+def _faiss():
+    # langchain_community is slow to import; only pay for it once an index is touched
+    from langchain_community.vectorstores import FAISS
+    return FAISS
+
+
+def _index_signature(db_path):
+    """mtime/size of the index files; changes whenever the index is rebuilt."""
+    try:
+        return tuple(
+            (os.stat(os.path.join(db_path, name)).st_mtime_ns, os.stat(os.path.join(db_path, name)).st_size)
+            for name in INDEX_FILES
+        )
+    except FileNotFoundError:
+        return None
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return None
+
+
+def _mmap_flags():
+    import faiss
+    # Flat indexes can map their vectors straight from disk (faiss >= 1.8), others fall back to MMAP
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", 0) or faiss.IO_FLAG_MMAP
+
+
+def load_shared_index(db_path, embeddings):
+    """
+    Returns the process-wide vectorstore for db_path, loading it at most once per
+    version of the files on disk. The index is memory-mapped where FAISS allows it.
+    """
+    key = (os.path.abspath(db_path), embedding_model_id(embeddings))
+    signature = _index_signature(db_path)
+    if signature is None:
+        return None
+
+    cached = _INDEX_CACHE.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    with _INDEX_LOCK:
+        cached = _INDEX_CACHE.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+        FAISS = _faiss()
+        try:
+            vectorstore = FAISS.load_local(
+                db_path,
+                embeddings,
+                allow_dangerous_deserialization=True,
+                io_flags=_mmap_flags(),
+            )
+        except Exception:
+            # Index type / FAISS build without mmap support
+            vectorstore = FAISS.load_local(db_path, embeddings, allow_dangerous_deserialization=True)
+        _INDEX_CACHE[key] = (signature, vectorstore)
+        return vectorstore
+
+
+def load_shared_lexical(db_path):
+    """Process-wide BM25 index stored next to the FAISS index, or None if there is none yet."""
+    path = os.path.join(db_path, LEXICAL_FILE)
+    signature = _file_signature(path)
+    if signature is None:
+        return None
+    key = os.path.abspath(db_path)
+    cached = _LEXICAL_CACHE.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+    with _INDEX_LOCK:
+        cached = _LEXICAL_CACHE.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+        lexical = BM25Index.load(path)
+        _LEXICAL_CACHE[key] = (signature, lexical)
+        return lexical
+
+
+def save_lexical_index(vectorstore, db_path):
+    """(Re)builds the BM25 index over every chunk in the vectorstore."""
+    ids = list(vectorstore.index_to_docstore_id.values())
+    texts = [vectorstore.docstore.search(chunk_id).page_content for chunk_id in ids]
+    os.makedirs(db_path, exist_ok=True)
+    BM25Index.build(ids, texts).save(os.path.join(db_path, LEXICAL_FILE))
+    with _INDEX_LOCK:
+        _LEXICAL_CACHE.pop(os.path.abspath(db_path), None)
+
+
+def _split_pdf(path):
+    """Parses and chunks one PDF -> (texts, metadatas). Runs in the ingestion pool."""
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    documents = PyPDFLoader(path).load()
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    splits = text_splitter.split_documents(documents)
+    return [doc.page_content for doc in splits], [doc.metadata for doc in splits]
+
+
+def split_pdfs(paths, workers=None):
+    """
+    {path: (texts, metadatas)}, parsed across a process pool (INGEST_WORKERS,
+    default: one per core). PDF parsing is pure Python, so threads wouldn't help.
+    """
+    if workers is None:
+        workers = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+    workers = min(workers, len(paths))
+    if workers <= 1:
+        return {path: _split_pdf(path) for path in paths}
+    # spawn: the app process may already run torch / OpenCV threads
+    with cf.ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        return dict(zip(paths, pool.map(_split_pdf, paths)))
+
+
+def save_index(vectorstore, db_path):
+    """
+    Writes the index next to the live one and swaps the files in with os.replace.
+    Readers that memory-mapped the old files keep a valid mapping (the old inode
+    lives on) instead of seeing the file truncated under them.
+    """
+    tmp_path = f"{db_path}.tmp"
+    vectorstore.save_local(tmp_path)
+    os.makedirs(db_path, exist_ok=True)
+    for name in INDEX_FILES:
+        os.replace(os.path.join(tmp_path, name), os.path.join(db_path, name))
+    os.rmdir(tmp_path)
+    clear_shared_index(db_path)
+
+
+def clear_shared_index(db_path=None):
+    with _INDEX_LOCK:
+        if db_path is None:
+            _INDEX_CACHE.clear()
+        else:
+            for key in [k for k in _INDEX_CACHE if k[0] == os.path.abspath(db_path)]:
+                _INDEX_CACHE.pop(key)
+
 
 class KnowledgeBase:
-    def __init__(self, api_key):
-        self.embeddings = OpenAIEmbeddings(openai_api_key=api_key)
+    def __init__(self, api_key, embeddings=None, retrieval_cache=None):
+        # OpenAI or local backend (EMBEDDING_PROVIDER), behind a persistent embedding cache
+        self.embeddings = embeddings or get_embeddings(api_key=api_key)
+        self.model_id = embedding_model_id(self.embeddings)
+        # Pass False to disable result caching
+        self.retrieval_cache = _RETRIEVAL_CACHE if retrieval_cache is None else retrieval_cache
         self.db_path = "data/vector_store/faiss_index"
         self.source_path = "assets/knowledge_base"
+        # PDF name -> content hash + chunk ids currently in the index
+        self.manifest_path = "data/vector_store/manifest.json"
+        # One .npz of chunk texts/embeddings per PDF content hash
+        self.chunk_store_path = "data/vector_store/chunks"
 
     def build_knowledge_base(self):
-        """Builds the index if PDFs are present."""
+        """
+        Builds or updates the index if PDFs are present.
+        Only new or changed PDFs are split and embedded; chunks of removed PDFs are deleted.
+        """
         if not os.path.exists(self.source_path):
             os.makedirs(self.source_path)
             return "Folder created. Please add PDFs."
 
         # Check if there are actually PDFs in the folder
         pdfs = [f for f in os.listdir(self.source_path) if f.endswith('.pdf')]
-        if not pdfs:
+        if not pdfs and not os.path.exists(self.manifest_path):
             return "No PDFs found in assets/knowledge_base."
 
         try:
-            loader = DirectoryLoader(self.source_path, glob="./*.pdf", loader_cls=PyPDFLoader)
-            documents = loader.load()
-            
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-            splits = text_splitter.split_documents(documents)
-            
-            vectorstore = FAISS.from_documents(documents=splits, embedding=self.embeddings)
-            vectorstore.save_local(self.db_path)
-            return "Knowledge Base successfully indexed."
+            current = {name: hash_file(os.path.join(self.source_path, name)) for name in sorted(pdfs)}
+            manifest = self._load_manifest()
+            # An index without a manifest (older build) or from another embedding model
+            # can't be patched -> start over
+            if not manifest or _index_signature(self.db_path) is None:
+                manifest = {}
+
+            stale = [name for name, entry in manifest.items() if current.get(name) != entry["hash"]]
+            fresh = [name for name, digest in current.items() if name not in manifest or manifest[name]["hash"] != digest]
+            if not stale and not fresh:
+                if load_shared_lexical(self.db_path) is None:
+                    # Index from before the lexical index existed
+                    vectorstore = load_shared_index(self.db_path, self.embeddings)
+                    save_lexical_index(vectorstore, self.db_path)
+                return "Knowledge Base is up to date."
+
+            FAISS = _faiss()
+            vectorstore = None
+            if manifest:
+                vectorstore = FAISS.load_local(self.db_path, self.embeddings, allow_dangerous_deserialization=True)
+
+            # 1. Drop chunks of removed / changed PDFs
+            stale_ids = [chunk_id for name in stale for chunk_id in manifest[name]["chunk_ids"]]
+            if vectorstore is not None and stale_ids:
+                vectorstore.delete(stale_ids)
+            for name in stale:
+                manifest.pop(name)
+
+            # 2. Split + embed only new / changed PDFs; parsing runs in parallel up front
+            unseen = [name for name in fresh if not os.path.exists(self._store_file(current[name]))]
+            splits = split_pdfs([os.path.join(self.source_path, name) for name in unseen])
+            for name in fresh:
+                split = splits.get(os.path.join(self.source_path, name))
+                texts, metadatas, ids, vectors = self._load_chunks(name, current[name], split)
+                manifest[name] = {"hash": current[name], "chunk_ids": ids}
+                if not ids:
+                    continue
+                pairs = list(zip(texts, vectors.tolist()))
+                if vectorstore is None:
+                    vectorstore = FAISS.from_embeddings(pairs, self.embeddings, metadatas=metadatas, ids=ids)
+                else:
+                    vectorstore.add_embeddings(pairs, metadatas=metadatas, ids=ids)
+
+            if vectorstore is None:
+                return "No text could be extracted from the PDFs."
+
+            save_index(vectorstore, self.db_path)
+            save_lexical_index(vectorstore, self.db_path)
+            self._save_manifest(manifest)
+            self._prune_chunk_store(manifest)
+            removed = len([name for name in stale if name not in current])
+            return f"Knowledge Base updated: {len(fresh)} document(s) indexed, {removed} removed."
         except Exception as e:
             return f"Error during indexing: {str(e)}"
 
-    def query(self, user_query):
-        """Retrieves expert info from your PDFs."""
-        if not os.path.exists(self.db_path):
-            return "Scientific research papers are currently being processed. Using general knowledge."
-        
-        vectorstore = FAISS.load_local(
-            self.db_path, 
-            self.embeddings, 
-            allow_dangerous_deserialization=True
+    # ---------------- INCREMENTAL INDEXING ----------------
+    def _load_manifest(self):
+        """PDF name -> {hash, chunk_ids}; empty if missing or built with another embedding model."""
+        try:
+            with open(self.manifest_path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if data.get("embedding_model") != self.model_id:
+            return {}
+        return data.get("documents", {})
+
+    def _save_manifest(self, manifest):
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"embedding_model": self.model_id, "documents": manifest}, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _store_file(self, digest):
+        return os.path.join(self.chunk_store_path, self.model_id, f"{digest}.npz")
+
+    def _load_chunks(self, name, digest, split=None):
+        """
+        Chunks + embeddings for one PDF version. Read from the chunk store when this
+        exact content was embedded before, otherwise split (unless `split` already
+        holds the texts/metadatas), embed and store.
+        """
+        # Ids depend on the file name too, so duplicate copies of a PDF don't collide
+        prefix = hashlib.sha256(f"{name}|{digest}".encode()).hexdigest()[:16]
+        store_file = self._store_file(digest)
+        if os.path.exists(store_file):
+            data = np.load(store_file, allow_pickle=False)
+            texts = data["texts"].tolist()
+            metadatas = [json.loads(m) for m in data["metadatas"].tolist()]
+            for m in metadatas:
+                m["source"] = os.path.join(self.source_path, name)
+            ids = [f"{prefix}-{i}" for i in range(len(texts))]
+            return texts, metadatas, ids, data["vectors"]
+
+        texts, metadatas = split or _split_pdf(os.path.join(self.source_path, name))
+        ids = [f"{prefix}-{i}" for i in range(len(texts))]
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32) if texts else np.zeros((0, 0), dtype=np.float32)
+
+        os.makedirs(os.path.dirname(store_file), exist_ok=True)
+        tmp_file = f"{store_file}.tmp.npz"
+        np.savez_compressed(
+            tmp_file,
+            texts=np.array(texts, dtype=str),
+            metadatas=np.array([json.dumps(m, default=str) for m in metadatas], dtype=str),
+            vectors=vectors,
         )
-        docs = vectorstore.similarity_search(user_query, k=2)
-        return "\n".join([doc.page_content for doc in docs])
\ No newline at end of file
+        os.replace(tmp_file, store_file)
+        return texts, metadatas, ids, vectors
+
+    def _prune_chunk_store(self, manifest):
+        """Deletes stored embeddings of PDF versions that are no longer indexed."""
+        store_dir = os.path.join(self.chunk_store_path, self.model_id)
+        if not os.path.isdir(store_dir):
+            return
+        live = {entry["hash"] for entry in manifest.values()}
+        for file_name in os.listdir(store_dir):
+            if file_name.endswith(".npz") and file_name[:-4] not in live:
+                os.remove(os.path.join(store_dir, file_name))
+
+    def query(self, user_query, k=2):
+        """
+        Retrieves expert info from your PDFs.
+        Error-tag and bare keyword lookups are answered from the BM25 index
+        alone, without an embedding call; everything else fuses BM25 with
+        vector search.
+        """
+        # Loaded once per process and shared; reloaded only when the files change
+        vectorstore = load_shared_index(self.db_path, self.embeddings)
+        if vectorstore is None:
+            return "Scientific research papers are currently being processed. Using general knowledge."
+
+        cache = self.retrieval_cache
+        # Results are only valid for this exact index build
+        version = (_index_signature(self.db_path), self.model_id)
+        key = normalize_query(user_query)
+        if cache:
+            result = cache.get(key, version)
+            if result is not None:
+                return result
+
+        lexical = load_shared_lexical(self.db_path)
+        lexical_hits = [text for _, text, _ in lexical.search(user_query, k=2 * k)] if lexical else []
+        if lexical_hits and is_lexical_query(user_query, lexical):
+            result = "\n".join(lexical_hits[:k])
+            if cache:
+                cache.miss()
+                cache.put(key, result, None, version)
+            return result
+
+        embedding = self.embeddings.embed_query(user_query)
+        # Paraphrase of a question we already answered?
+        result = cache.get_similar(embedding, version) if cache else None
+        if result is None:
+            if cache:
+                cache.miss()
+            docs = vectorstore.similarity_search_by_vector(embedding, k=2 * k if lexical_hits else k)
+            vector_hits = [doc.page_content for doc in docs]
+            result = "\n".join(fuse_rankings([vector_hits, lexical_hits], k=k) if lexical_hits else vector_hits)
+        if cache:
+            cache.put(key, result, embedding, version)
+        return result
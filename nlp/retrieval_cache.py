@@ -0,0 +1,128 @@
+# nlp/retrieval_cache.py
+# Cache of knowledge-base retrieval results for the coaching chat.
+# Exact repeats hit on the normalised query text; paraphrases hit when their
+# query embedding is close enough to one we already answered. Hits, semantic
+# hits and misses are also counted in utils.metrics (Prometheus, sidebar panel).
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from utils.metrics import METRICS
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text):
+    """'Why does SQUAT depth matter??' -> 'why does squat depth matter'"""
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", text.lower())).strip()
+
+
+class RetrievalCache:
+    """
+    Bounded LRU + TTL cache of retrieval results.
+    Entries are tagged with the index version they came from; a different
+    version (index rebuilt) empties the cache.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600.0, similarity_threshold=0.92):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.entries = OrderedDict()    # key -> (result, unit embedding or None, created_at)
+        self.index_version = None
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_version(self, index_version):
+        if index_version != self.index_version:
+            if self.entries:
+                self.invalidations += 1
+                METRICS.inc("retrieval_cache_invalidations")
+            self.entries.clear()
+            self.index_version = index_version
+
+    def _expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key, index_version=None):
+        """Exact lookup on an already-normalised key."""
+        now = time.monotonic()
+        with self.lock:
+            self._check_version(index_version)
+            entry = self.entries.get(key)
+            if entry is None or self._expired(entry[2], now):
+                self.entries.pop(key, None)
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        METRICS.inc("retrieval_cache_hits")
+        return entry[0]
+
+    def get_similar(self, embedding, index_version=None):
+        """Nearest cached query by cosine similarity, if above the threshold."""
+        query = _unit(embedding)
+        now = time.monotonic()
+        with self.lock:
+            self._check_version(index_version)
+            keys, vectors = [], []
+            for key, (_, vec, created_at) in list(self.entries.items()):
+                if self._expired(created_at, now):
+                    del self.entries[key]
+                elif vec is not None and len(vec) == len(query):
+                    keys.append(key)
+                    vectors.append(vec)
+            if not keys:
+                return None
+            scores = np.stack(vectors) @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                return None
+            self.entries.move_to_end(keys[best])
+            self.semantic_hits += 1
+            result = self.entries[keys[best]][0]
+        METRICS.inc("retrieval_cache_semantic_hits")
+        return result
+
+    def miss(self):
+        with self.lock:
+            self.misses += 1
+        METRICS.inc("retrieval_cache_misses")
+
+    def put(self, key, result, embedding=None, index_version=None):
+        with self.lock:
+            self._check_version(index_version)
+            vec = _unit(embedding) if embedding is not None else None
+            self.entries[key] = (result, vec, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+        METRICS.inc("retrieval_cache_invalidations")
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.semantic_hits) / lookups, 3) if lookups else 0.0,
+                "size": len(self.entries),
+                "invalidations": self.invalidations,
+            }
+
+
+def _unit(vec):
+    vec = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
@@ -0,0 +1,80 @@
+# Stand-ins for YOLO and real footage, so the video paths run without a model:
+# a lossless clip whose frames carry their own index, and a detector that
+# returns known keypoints for that index.
+import cv2
+import numpy as np
+
+FRAME_SIZE = (640, 480)
+
+
+def write_clip(path, frames, fps=30.0):
+    """Lossless FFV1 .avi of `frames` blank frames, each with its index in pixel (0, 0)."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"FFV1"), fps, FRAME_SIZE)
+    for i in range(frames):
+        frame = np.zeros((FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8)
+        frame[0, 0] = (i % 256, i // 256, 0)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def frame_index(frame):
+    return int(frame[0, 0, 0]) + 256 * int(frame[0, 0, 1])
+
+
+class _Tensor:
+    def __init__(self, array):
+        self.array = np.asarray(array, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class _Keypoints:
+    def __init__(self, people):
+        self.xy, self.conf = _Tensor(people[..., :2]), _Tensor(people[..., 2])
+
+    def __len__(self):
+        return len(self.xy.array)
+
+
+class _Boxes:
+    def __init__(self, people):
+        xy = people[..., :2]
+        self.xyxy = _Tensor(np.concatenate([xy.min(axis=1), xy.max(axis=1)], axis=-1).reshape(-1, 4))
+
+
+class FakeResult:
+    def __init__(self, people):
+        people = np.asarray(people, dtype=np.float32).reshape(-1, 17, 3)
+        self.keypoints, self.boxes = _Keypoints(people), _Boxes(people)
+
+
+class FakeDetector:
+    """
+    PoseEstimator stand-in. `people` is a list of (frames, 17, 3) keypoint
+    tensors, one per person; a person whose row is all zeros is not detected
+    in that frame. Records the calls (frames per call) and the frame indices
+    it ran on, in order.
+    """
+
+    model_path = "fake-pose.pt"
+
+    def __init__(self, *people):
+        self.people = [np.asarray(kps, dtype=np.float32) for kps in people]
+        self.calls = []
+        self.seen = []
+
+    def model(self, frames, verbose=False, **kwargs):
+        frames = frames if isinstance(frames, list) else [frames]
+        self.calls.append(len(frames))
+        results = []
+        for frame in frames:
+            i = frame_index(frame)
+            self.seen.append(i)
+            detected = [kps[i] for kps in self.people if i < len(kps) and kps[i].any()]
+            results.append(FakeResult(np.stack(detected) if detected else np.zeros((0, 17, 3))))
+        return results
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+pytest.importorskip("langchain_openai")
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.runnables import RunnableLambda  # noqa: E402
+from nlp.agent import FitnessAgent  # noqa: E402
+
+ANSWER = "Hey there! Keep your knees out."
+
+
+class _KB:
+    def __init__(self):
+        self.queries = []
+
+    def query(self, user_query):
+        self.queries.append(user_query)
+        return "Knee valgus raises ACL strain."
+
+
+@pytest.fixture
+def kb():
+    return _KB()
+
+
+def test_invoke_uses_the_fake_model_and_retrieval(kb):
+    agent = FitnessAgent(llm=FakeListChatModel(responses=[ANSWER]), kb=kb)
+    assert agent.get_coaching_advice("Why does my squat depth matter?", [], "3 reps") == ANSWER
+    assert kb.queries == ["Why does my squat depth matter?"]
+    # Small talk skips the knowledge base
+    agent.get_coaching_advice("Hi!", [], "3 reps")
+    assert len(kb.queries) == 1
+
+
+def test_bare_error_tag_goes_through_retrieval(kb):
+    agent = FitnessAgent(llm=FakeListChatModel(responses=[ANSWER, ANSWER]), kb=kb)
+    agent.get_coaching_advice("ELBOW_SWINGING?", [], "3 reps")
+    asyncio.run(agent.aget_coaching_advice("ELBOW_SWINGING?", [], "3 reps"))
+    assert kb.queries == ["ELBOW_SWINGING?", "ELBOW_SWINGING?"]
+
+
+def test_stream_yields_the_whole_answer(kb):
+    agent = FitnessAgent(llm=FakeListChatModel(responses=[ANSWER]), kb=kb)
+    chunks = list(agent.stream_coaching_advice("Hello", [], "3 reps"))
+    assert len(chunks) > 1
+    assert "".join(chunks) == ANSWER
+
+
+def test_async_stream_and_batch(kb):
+    agent = FitnessAgent(llm=FakeListChatModel(responses=[ANSWER]), kb=kb)
+
+    async def run():
+        answer = await agent.aget_coaching_advice("What about my squat form?", [], lambda: "3 reps")
+        chunks = [chunk async for chunk in agent.astream_coaching_advice("Hello", [], "3 reps")]
+        return answer, "".join(chunks)
+
+    assert asyncio.run(run()) == (ANSWER, ANSWER)
+    assert kb.queries == ["What about my squat form?"]
+    # Blocking wrapper on the agent's own loop; results keep request order
+    assert agent.batch_coaching_advice([("Hello", [], "3 reps")] * 3) == [ANSWER] * 3
+
+
+def test_semaphore_bounds_requests_in_flight(kb):
+    in_flight, peak = 0, 0
+
+    async def slow_model(_prompt):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        return AIMessage(content=ANSWER)
+
+    agent = FitnessAgent(llm=RunnableLambda(lambda _: AIMessage(content=ANSWER), afunc=slow_model), kb=kb,
+                         max_concurrency=2)
+    answers = agent.batch_coaching_advice([(f"Hello {i}", [], "3 reps") for i in range(8)])
+    assert answers == [ANSWER] * 8
+    assert peak == 2
+
+
+class _ChatCompletions(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible POST /chat/completions: a fixed answer after a short delay."""
+    protocol_version = "HTTP/1.1"   # keep-alive, so pooled connections are visible
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+            server.connections.add(self.client_address)
+            server.paths.append(self.path)
+        time.sleep(0.05)
+        with server.lock:
+            server.in_flight -= 1
+        body = json.dumps({
+            "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": ANSWER}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def chat_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatCompletions)
+    server.lock, server.in_flight, server.peak = threading.Lock(), 0, 0
+    server.connections, server.paths = set(), []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_default_client_pools_connections_to_a_local_endpoint(kb, chat_server, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{chat_server.server_port}/v1")
+    agent = FitnessAgent(kb=kb, max_concurrency=3)
+
+    requests = [(f"Hello {i}", [], "3 reps") for i in range(9)]
+    assert agent.batch_coaching_advice(requests) == [ANSWER] * 9
+    assert agent.batch_coaching_advice(requests) == [ANSWER] * 9
+    assert chat_server.paths == ["/v1/chat/completions"] * 18
+    # The semaphore caps requests in flight, and every call went through the one
+    # pooled client: no more connections than its max_concurrency keep-alive slots
+    assert chat_server.peak == 3
+    assert len(chat_server.connections) <= 3
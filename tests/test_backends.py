@@ -0,0 +1,37 @@
+import os
+import shutil
+import pytest
+from core.backends import exported_path, resolve_backend
+
+
+def test_int8_env_needs_an_existing_export(tmp_path, monkeypatch):
+    weights = tmp_path / "pose.pt"
+    weights.write_bytes(b"weights")
+    monkeypatch.setenv("POSE_INT8", "1")
+    assert resolve_backend("onnx", model_path=str(weights)) == ("onnx", False)
+
+    open(exported_path(str(weights), "onnx", int8=True), "wb").close()
+    assert resolve_backend("onnx", model_path=str(weights)) == ("onnx", True)
+    assert resolve_backend("torch", model_path=str(weights)) == ("torch", False)
+
+
+@pytest.mark.parametrize("int8", [False, True])
+def test_onnx_export_matches_torch_angles(tmp_path, int8):
+    pytest.importorskip("ultralytics")
+    pytest.importorskip("onnxruntime")
+    cv2 = pytest.importorskip("cv2")
+    from ultralytics.utils import ASSETS
+    from core.backends import check_parity
+    from core.vision import resolve_model_path
+
+    source = resolve_model_path()
+    if not os.path.isfile(source):
+        pytest.skip(f"pose weights {source} not available offline")
+    # Exports land next to the weights: keep them out of the repo
+    weights = str(tmp_path / os.path.basename(source))
+    shutil.copy(source, weights)
+    frames = [cv2.imread(str(path)) for path in sorted(ASSETS.glob("*.jpg"))]
+
+    report = check_parity(frames, weights, backend="onnx", int8=int8, batch_size=1)
+    assert report["compared"] > 0
+    assert report["ok"], report
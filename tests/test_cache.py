@@ -0,0 +1,20 @@
+import os
+from core.cache import KeypointCache
+
+
+def test_key_follows_the_weights_not_their_name(tmp_path):
+    cache = KeypointCache(str(tmp_path / "cache"))
+    a, b = tmp_path / "a", tmp_path / "b"
+    a.mkdir()
+    b.mkdir()
+    (a / "pose.pt").write_bytes(b"weights v1")
+    (b / "pose.pt").write_bytes(b"other weights")
+
+    key = cache.make_key("video", a / "pose.pt")
+    assert key == cache.make_key("video", a / "pose.pt")
+    assert key != cache.make_key("video", b / "pose.pt")
+
+    # Retrained weights written over the same file
+    (a / "pose.pt").write_bytes(b"weights v2, longer")
+    os.utime(a / "pose.pt", ns=(0, 1))
+    assert key != cache.make_key("video", a / "pose.pt")
@@ -0,0 +1,12 @@
+import pytest
+from benchmarks.synthetic import PROFILES, synthetic_trajectory
+from core.trajectory import detect_exercise
+
+
+@pytest.mark.parametrize("noise", [0.0, 5.0])
+@pytest.mark.parametrize("exercise", list(PROFILES))
+def test_detect_exercise_on_synthetic_clips(exercise, noise):
+    kps = synthetic_trajectory(exercise, frames=600, reps=10, noise=noise, seed=1)
+    detected, reps_by_exercise = detect_exercise(kps)
+    assert detected == exercise
+    assert len(reps_by_exercise[exercise]) >= 10
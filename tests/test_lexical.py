@@ -0,0 +1,43 @@
+import pytest
+from nlp.lexical import BM25Index, is_lexical_query, is_tag_query
+
+CHUNKS = [
+    "Knee valgus (KNEE_VALGUS) raises ACL strain during the squat.",
+    "Elbow swinging (ELBOW_SWINGING) moves load off the biceps during the curl.",
+    "Lumbar flexion under load raises disc pressure in the deadlift.",
+    "Squat depth below parallel loads the glutes more than a half squat.",
+    "Lockout in the overhead press finishes with the elbows fully extended.",
+    "Rest intervals of two to three minutes help strength training.",
+    "Squat training improves vertical jump height in athletes.",
+    "Sleep and protein intake drive recovery after training.",
+    "Bar path in the squat should stay over the mid foot.",
+    "Training volume is the main driver of hypertrophy.",
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return BM25Index.build([f"c{i}" for i in range(len(CHUNKS))], CHUNKS)
+
+
+@pytest.mark.parametrize("query", ["knee valgus", "Lumbar flexion?", "valgus", "ELBOW_SWINGING?"])
+def test_known_keywords_are_lexical_lookups(index, query):
+    assert is_lexical_query(query, index)
+
+
+@pytest.mark.parametrize("query", [
+    "training",                                     # in the vocabulary but common
+    "squat",
+    "knee hurts",                                   # unknown term
+    "why does my knee cave in when I go deep",      # a real question
+    "knee valgus lumbar flexion lockout",           # too many terms
+    "",
+])
+def test_common_or_unknown_terms_need_the_vector_search(index, query):
+    assert not is_lexical_query(query, index)
+
+
+def test_tags_are_lexical_even_without_an_index():
+    assert is_tag_query("Why is ELBOW_SWINGING bad?")
+    assert is_lexical_query("ELBOW_SWINGING", None)
+    assert not is_lexical_query("knee valgus", None)
@@ -0,0 +1,39 @@
+import time
+import numpy as np
+from benchmarks.synthetic import synthetic_trajectory
+from core.live import LiveSession
+from core.trajectory import analyze_trajectory
+from tests.fakes import FakeDetector, write_clip
+from utils.csv_handler import WorkoutLogger
+from utils.workout_store import WorkoutStore
+
+
+def test_looping_file_counts_reps_across_the_loop_boundary(tmp_path):
+    # 1.5 squats per pass: every pass ends at the bottom, so the second rep of
+    # each pass is only finished by the first frames of the next one
+    frames = 60
+    kps = synthetic_trajectory("Squat", frames=frames, reps=1.5, seed=0)
+    detector = FakeDetector(kps)
+    store = WorkoutStore(str(tmp_path / "workouts.sqlite"))
+    clip = write_clip(str(tmp_path / "camera.avi"), frames, fps=300.0)
+
+    session = LiveSession(clip, "Squat", detector=detector, latency_budget=10.0, loop=True,
+                          logger=WorkoutLogger(store=store))
+    with session:
+        deadline = time.perf_counter() + 20.0
+        while session.frames_processed < 4 * frames and time.perf_counter() < deadline:
+            assert session.error is None
+            time.sleep(0.01)
+    assert session.error is None
+
+    seen = np.array(detector.seen)
+    passes = int((np.diff(seen) < 0).sum())
+    assert passes >= 3
+    # Rep counting runs on exactly the frames inference picked up, wrap-arounds included
+    expected = analyze_trajectory(kps[seen], "Squat")
+    assert len(session.reps) == len(expected)
+    assert len(session.reps) >= 2 * passes - 1 > passes
+
+    rows = store.fetch(session_id=session.session_id)
+    assert len(rows) == len(session.reps)
+    assert {row["video_id"] for row in rows} == {f"live:{clip}"}
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from benchmarks.synthetic import synthetic_trajectory
+from core.processor import VideoProcessor
+from tests.fakes import FakeDetector, write_clip
+from utils.csv_handler import WorkoutLogger
+from utils.tempfiles import remove_quietly
+from utils.workout_store import WorkoutStore
+
+FRAMES = 150
+LOGGED = ("exercise", "rep_count", "primary_metric", "secondary_metric", "error_tag")
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    return write_clip(str(tmp_path_factory.mktemp("clips") / "squats.avi"), FRAMES)
+
+
+@pytest.fixture(scope="module")
+def kps():
+    return synthetic_trajectory("Squat", frames=FRAMES, reps=4, noise=1.0, seed=0)
+
+
+def _process(clip, kps, tmp_path, name, **settings):
+    store = WorkoutStore(str(tmp_path / f"{name}.sqlite"))
+    processor = VideoProcessor(detector=FakeDetector(kps), cache=False, logger=WorkoutLogger(store=store),
+                               **settings)
+    _, output_path = processor.process_video(clip, "Squat")
+    remove_quietly(output_path)
+    rows = [tuple(row[key] for key in LOGGED) for row in store.fetch(session_id=processor.session_id)]
+    return processor, rows
+
+
+@pytest.mark.parametrize("batch_size,queue_depth,output", [
+    (1, 1, "metrics"), (4, 16, "metrics"), (8, 4, "metrics"), (8, 1, "metrics"), (16, 64, "metrics"),
+    (8, 4, "video"),
+])
+def test_pipelined_run_matches_sequential_run(clip, kps, tmp_path, batch_size, queue_depth, output):
+    sequential, expected_rows = _process(clip, kps, tmp_path, "sequential", pipelined=False,
+                                         batch_size=batch_size, output=output)
+    pipelined, rows = _process(clip, kps, tmp_path, "pipelined", pipelined=True, batch_size=batch_size,
+                               queue_depth=queue_depth, output=output)
+
+    assert sequential.rep_count == 4
+    assert pipelined.rep_count == sequential.rep_count
+    assert pipelined.reps == sequential.reps
+    assert rows == expected_rows and len(rows) == 4
+    assert pipelined.frames_total == pipelined.frames_inferred == FRAMES
+    np.testing.assert_array_equal(pipelined.trajectory, sequential.trajectory)
+    np.testing.assert_array_equal(pipelined.trajectory, kps)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from benchmarks.synthetic import PROFILES, synthetic_trajectory
+from core.exercises import get_exercise
+from core.stride import AdaptiveStride
+from core.trajectory import analyze_trajectory, compute_features
+
+
+def _run_strided(kps, exercise, stride):
+    calls = []
+
+    def infer(frames):
+        calls.append(len(frames))
+        return [(i, None, kps[i]) for i in frames]
+
+    strider = AdaptiveStride(exercise, stride)
+    rows = np.stack([item[2] for items in strider.run(range(len(kps)), infer) for item in items])
+    return rows, strider, calls
+
+
+def _tolerances(exercise, noise, seed):
+    """
+    Per-metric tolerance: the worst keypoint jitter on the metric's own signal.
+    A peak taken over noisy frames can land on any jittered sample, so the
+    strided and full-frame peaks agree to within that, not exactly.
+    """
+    spec = get_exercise(exercise)
+    if noise == 0:
+        return [1e-4 for _ in spec["metrics"]]
+    clean = compute_features(synthetic_trajectory(exercise, frames=900, reps=12, seed=seed), exercise)
+    noisy = compute_features(synthetic_trajectory(exercise, frames=900, reps=12, noise=noise, seed=seed), exercise)
+    tolerances = []
+    for name in spec["metrics"]:
+        if name is None:
+            tolerances.append(1e-4)
+            continue
+        signal = spec["track"][name]["signal"]
+        tolerances.append(float(np.nanmax(np.abs(noisy[signal] - clean[signal]))))
+    return tolerances
+
+
+@pytest.mark.parametrize("stride", [2, 4, 8])
+@pytest.mark.parametrize("noise", [0.0, 2.0])
+@pytest.mark.parametrize("exercise", list(PROFILES))
+def test_strided_run_matches_full_frame_run(exercise, noise, stride):
+    # Beyond ~2 px of jitter the full-frame run itself miscounts these clips, so
+    # there is no stable reference to compare against
+    kps = synthetic_trajectory(exercise, frames=900, reps=12, noise=noise, seed=0)
+    rows, strider, _ = _run_strided(kps, exercise, stride)
+    assert len(rows) == len(kps)
+    assert strider.frames_total == len(kps)
+
+    full, strided = analyze_trajectory(kps, exercise), analyze_trajectory(rows, exercise)
+    assert len(strided) == len(full)
+    primary, secondary = _tolerances(exercise, noise, seed=0)
+    for a, b in zip(full, strided):
+        assert b["primary_metric"] == pytest.approx(a["primary_metric"], abs=primary)
+        assert b["secondary_metric"] == pytest.approx(a["secondary_metric"], abs=secondary)
+
+
+@pytest.mark.parametrize("noise", [0.0, 2.0])
+@pytest.mark.parametrize("exercise", list(PROFILES))
+def test_stride_infers_at_most_a_third_of_the_frames(exercise, noise):
+    kps = synthetic_trajectory(exercise, frames=900, reps=12, noise=noise, seed=0)
+    _, strider, calls = _run_strided(kps, exercise, 4)
+    assert strider.frames_inferred <= len(kps) / 3
+    # 4 anchors per call, plus one call per released block for its exact frames
+    assert len(calls) <= 2 * len(kps) / (4 * strider.batch_size) + 2
@@ -0,0 +1,68 @@
+import numpy as np
+from benchmarks.synthetic import synthetic_trajectory
+from core.processor import VideoProcessor
+from core.tracking import PoseTracker
+from core.trajectory import analyze_trajectory
+from tests.fakes import FakeDetector, write_clip
+from utils.csv_handler import WorkoutLogger
+from utils.workout_store import WorkoutStore
+
+BOX = np.array([[100, 100, 200, 300]], dtype=np.float32)
+EMPTY = np.zeros((0, 4), dtype=np.float32)
+
+
+def test_brief_dropout_keeps_the_track_id_and_slot():
+    tracker = PoseTracker(max_missed=5)
+    ids, slots = tracker.update(BOX)
+    for _ in range(5):
+        tracker.update(EMPTY)
+    again, again_slots = tracker.update(BOX + 4)
+    assert again.tolist() == ids.tolist() and again_slots.tolist() == slots.tolist()
+    assert tracker.recycle() == []
+
+
+def test_retired_slots_are_reused_only_after_recycle():
+    tracker = PoseTracker(max_missed=2)
+    ids, slots = tracker.update(BOX)
+    for _ in range(3):
+        tracker.update(EMPTY)
+    # Retired but not recycled yet: a newcomer gets a fresh slot
+    newcomer, newcomer_slot = tracker.update(BOX)
+    assert newcomer[0] != ids[0] and newcomer_slot[0] != slots[0]
+    assert tracker.recycle() == slots.tolist()
+
+    for _ in range(3):
+        tracker.update(EMPTY)
+    tracker.recycle()
+    late, late_slot = tracker.update(BOX)
+    assert late[0] == tracker.next_id - 1
+    assert late_slot[0] == slots[0]
+    assert tracker.n_slots == 2
+
+
+def _shifted(kps, dx):
+    kps = kps.copy()
+    kps[..., 0] -= dx * (kps[..., 2] > 0)
+    return kps
+
+
+def test_group_video_keeps_state_per_athlete_across_slot_reuse(tmp_path):
+    # A squats the whole clip; B squats on the left, leaves, and C takes the spot
+    # well after B's grace period: C gets a new id but B's recycled slot
+    frames = 480
+    a = synthetic_trajectory("Squat", frames=frames, reps=8, seed=0)
+    b = _shifted(synthetic_trajectory("Squat", frames=frames, reps=8, seed=1), 250)
+    c = b.copy()
+    b[200:] = 0
+    c[:280] = 0
+    detector = FakeDetector(a, b, c)
+
+    store = WorkoutStore(str(tmp_path / "workouts.sqlite"))
+    processor = VideoProcessor(batch_size=8, detector=detector, cache=False, multi_person=True,
+                               output="metrics", logger=WorkoutLogger(store=store))
+    processor.process_video(write_clip(str(tmp_path / "group.avi"), frames))
+
+    expected = {track_id: len(analyze_trajectory(kps, "Squat")) for track_id, kps in enumerate((a, b, c))}
+    assert processor.athletes == expected
+    assert sorted(rep["track_id"] for rep in processor.reps) == sorted(
+        track_id for track_id, count in expected.items() for _ in range(count))
@@ -0,0 +1,55 @@
+import random
+import pytest
+from utils.aggregates import WorkoutAggregate
+from utils.workout_store import SECONDS_PER_DAY, WorkoutStore
+
+NOW = 1_760_000_000.0
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = WorkoutStore(str(tmp_path / "workouts.sqlite"))
+    rng = random.Random(0)
+    rows = []
+    for s in range(300):
+        start = NOW - rng.uniform(0, 60) * SECONDS_PER_DAY
+        exercise = rng.choice(["Squat", "Bicep Curl", "Deadlift"])
+        for rep in range(5):
+            rows.append((start + rep * 5, f"s{s}", f"u{s % 3}", None, exercise, rep + 1, rng.uniform(60, 120),
+                         rng.uniform(0, 1), rng.choice(["NONE", "SHALLOW_SQUAT", "ELBOW_SWINGING"])))
+    store.append(rows)
+    return store
+
+
+def _from_reps(store, **window):
+    agg = WorkoutAggregate()
+    for row in store.fetch(**window):
+        agg.add(row["exercise"], row["primary_metric"], row["secondary_metric"], row["error_tag"])
+    return agg.as_dict()
+
+
+@pytest.mark.parametrize("window", [
+    {},
+    {"user_id": "u1"},
+    {"since": NOW - 7 * SECONDS_PER_DAY},
+    {"since": NOW - 7.5 * SECONDS_PER_DAY, "user_id": "u2"},
+    {"since": NOW - 30.3 * SECONDS_PER_DAY, "until": NOW - 2.7 * SECONDS_PER_DAY, "exercise": "Squat"},
+    {"since": NOW - 0.4 * SECONDS_PER_DAY},
+    {"session_id": "s5"},
+])
+def test_aggregate_matches_the_reps_in_the_window(store, window):
+    assert store.aggregate(**window).as_dict() == _from_reps(store, **window)
+
+
+def test_window_summaries_do_not_read_session_buckets(store):
+    # All-time reads one bucket per (user, exercise, error), whatever the number of sessions
+    assert store.conn.execute("SELECT COUNT(*) FROM rollup_total").fetchone()[0] <= 3 * 3 * 3
+
+
+def test_append_session_stores_a_session_once(tmp_path):
+    store = WorkoutStore(str(tmp_path / "workouts.sqlite"))
+    rows = [(NOW + i, "job-1", "u0", "video", "Squat", i + 1, 90.0, 0.5, "NONE") for i in range(3)]
+    assert store.append_session("job-1", rows)
+    assert not store.append_session("job-1", rows)   # retried job
+    assert len(store.fetch(session_id="job-1")) == 3
+    assert store.aggregate(session_id="job-1").as_dict() == store.aggregate().as_dict()
@@ -10,46 +10,123 @@ import sys
 import os
 import streamlit as st
 from ui.upload_mode import render_upload_mode
-from nlp.agent import FitnessAgent
-from nlp.rag_engine import KnowledgeBase
-from langchain_core.messages import HumanMessage, AIMessage
+from ui.live_mode import render_live_mode
+from ui.metrics_panel import render_metrics_panel
+from utils.metrics import start_metrics_server
+from utils.tempfiles import start_temp_janitor
+from utils.warmup import DONE, FAILED, Warmup
 
 # Ensure pathing is correct
 # ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 # if ROOT_DIR not in sys.path:
 #     sys.path.append(ROOT_DIR)
 
-@st.cache_resource
-def startup_indexing():
-    """Automatically builds the Knowledge Base on startup if missing."""
+# Heavy modules (torch / ultralytics, LangChain, FAISS) are imported by these
+# warm-up tasks in the background, never while the page renders.
+def _load_pose_model():
+    """Loads the shared YOLO model once per process and runs a warm-up inference."""
+    from core.vision import PoseEstimator
+    PoseEstimator(warmup=True)
+    return "Ready"
+
+def _build_knowledge_base():
+    """Builds the Knowledge Base, or updates it for added/changed/removed PDFs."""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return "Missing API Key"
-    
-    kb = KnowledgeBase(api_key)
-    # If the index folder doesn't exist, build it
-    if not os.path.exists(kb.db_path):
-        return kb.build_knowledge_base()
+    from nlp.rag_engine import KnowledgeBase
+    # Incremental: only new or changed PDFs get embedded, a no-op when nothing changed
+    return KnowledgeBase(api_key).build_knowledge_base()
+
+def _import_coach():
+    """Imports the LLM client stack so the first chat message doesn't pay for it."""
+    import langchain_openai  # noqa: F401
+    from nlp.agent import FitnessAgent  # noqa: F401
     return "Ready"
 
+@st.cache_resource
+def startup_warmup():
+    """Starts the background warm-up once per process; the UI is usable meanwhile."""
+    return Warmup([
+        ("Pose model", _load_pose_model),
+        ("Knowledge base", _build_knowledge_base),
+        ("Coach", _import_coach),
+    ]).start()
+
+@st.cache_resource
+def startup_temp_janitor():
+    """Sweeps old annotated videos / spooled uploads out of the temp folder every 10 minutes."""
+    return start_temp_janitor()
+
+@st.cache_resource
+def startup_metrics_server():
+    """Serves Prometheus metrics on METRICS_PORT (e.g. 9464) when it is set."""
+    port = os.getenv("METRICS_PORT")
+    if not port:
+        return "Disabled"
+    try:
+        start_metrics_server(int(port))
+        return "Ready"
+    except (OSError, ValueError) as e:
+        return f"Error starting metrics server: {str(e)}"
+
+@st.cache_resource
+def get_agent():
+    """One FitnessAgent (LLM client, KB, prebuilt chain) shared by every session."""
+    from nlp.agent import FitnessAgent
+    return FitnessAgent()
+
+def render_startup_status(warmup):
+    """Sidebar warm-up progress; polls itself every second until everything is loaded."""
+    polling = not warmup.done
+
+    @st.fragment(run_every=1.0 if polling else None)
+    def status():
+        if polling and warmup.done:
+            st.rerun()  # whole app once more: final statuses, and the polling stops
+
+        if not warmup.done:
+            st.progress(warmup.progress, text="Warming up in the background...")
+            for name, state, _, seconds in warmup.status():
+                icon = {DONE: "✅", FAILED: "⚠️"}.get(state, "⏳")
+                st.caption(f"{icon} {name}" + (f" ({seconds}s)" if seconds is not None else ""))
+            return
+
+        results = {name: (state, result) for name, state, result, _ in warmup.status()}
+        for name in ("Pose model", "Coach"):
+            state, result = results[name]
+            if state == FAILED:
+                st.warning(f"Error loading {name.lower()}: {result}")
+        # Show indexing status only if there's an issue
+        state, kb_status = results["Knowledge base"]
+        if state == FAILED or "Error" in kb_status or "Missing" in kb_status:
+            st.warning(f"KB Status: {kb_status}")
+        else:
+            st.success("🎓 Coach Alex is fully briefed on research.")
+
+    with st.sidebar:
+        status()
+
 def main():
     st.set_page_config(page_title="AI Fitness Coach", layout="wide")
     
-    # 1. Trigger the startup check
-    with st.spinner("Initializing Knowledge Base..."):
-        kb_status = startup_indexing()
-    
-    # Show indexing status only if there's an issue
-    if "Error" in kb_status or "Missing" in kb_status:
-        st.sidebar.warning(f"KB Status: {kb_status}")
-    else:
-        st.sidebar.success("🎓 Coach Alex is fully briefed on research.")
+    # 1. Start-up work runs in the background; the page renders right away
+    warmup = startup_warmup()
+    startup_temp_janitor()
+    metrics_status = startup_metrics_server()
+    if metrics_status.startswith("Error"):
+        st.sidebar.warning(metrics_status)
+    render_startup_status(warmup)
+    render_metrics_panel()
 
     st.title("🏋️ AI Fitness Coach (Agentic Edition)")
     
     # ---------------- SESSION STATE ----------------
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    # Agent memory as LangChain messages, appended as we go instead of rebuilt per rerun
+    if "chat_history" not in st.session_state:
+        st.session_state.chat_history = []
     if "workout_summary" not in st.session_state:
         st.session_state.workout_summary = "No workout analyzed yet."
 
@@ -57,14 +134,13 @@ def main():
     left, right = st.columns([7, 3], gap="large")
 
     with left:
-        # tab1, tab2 = st.tabs(["🎥 Video Analysis", "⚡ Live Mode"])
-        tab1 = st.tabs(["🎥 Video Analysis"])[0]
+        tab1, tab2 = st.tabs(["🎥 Video Analysis", "⚡ Live Mode"])
 
     with tab1:
         render_upload_mode()
 
-    # with tab2:
-    #     st.info("Live coaching coming soon.")
+    with tab2:
+        render_live_mode()
 
     with right:
         st.markdown("## 💬 Coach Alex")
@@ -79,29 +155,26 @@ def main():
         user_input = st.chat_input("Say 'Hi' to start...")
 
         if user_input:
+            from langchain_core.messages import AIMessage, HumanMessage
             st.session_state.messages.append({"role": "user", "content": user_input})
+            st.session_state.chat_history.append(HumanMessage(content=user_input))
             with chat_box:
                 with st.chat_message("user"):
                     st.markdown(user_input)
 
-            # Convert history for Agent memory
-            chat_history = []
-            for m in st.session_state.messages[-5:]:
-                if m["role"] == "user": chat_history.append(HumanMessage(content=m["content"]))
-                else: chat_history.append(AIMessage(content=m["content"]))
+            chat_history = st.session_state.chat_history[-5:]
 
             with chat_box:
                 with st.chat_message("assistant"):
-                    with st.spinner("Alex is typing..."):
-                        agent = FitnessAgent()
-                        response = agent.get_coaching_advice(
-                            user_input, 
-                            chat_history, 
-                            st.session_state.workout_summary
-                        )
-                        st.markdown(response)
+                    # Tokens are rendered as they arrive instead of after the full answer
+                    response = st.write_stream(get_agent().stream_coaching_advice(
+                        user_input, 
+                        chat_history, 
+                        st.session_state.workout_summary
+                    ))
 
             st.session_state.messages.append({"role": "assistant", "content": response})
+            st.session_state.chat_history.append(AIMessage(content=response))
             st.rerun()
 
 if __name__ == "__main__":
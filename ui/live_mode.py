@@ -1 +1,81 @@
-# Real-time UI logic for live mode functionality
\ No newline at end of file
+# Real-time UI logic for live mode functionality
+import streamlit as st
+from core.exercises import EXERCISES
+from utils.csv_handler import WorkoutLogger
+from utils.helpers import generate_training_history
+
+
+def _parse_source(raw):
+    """'0' -> camera index 0, anything else is a path / URL."""
+    raw = raw.strip()
+    return int(raw) if raw.isdigit() else raw
+
+
+def _stop_session():
+    session = st.session_state.pop("live_session", None)
+    if session:
+        session.stop()
+        st.session_state.workout_summary = generate_training_history(session_id=session.logger.session_id,
+                                                                     session_aggregate=session.logger.aggregate)
+
+
+def render_live_mode():
+    st.subheader("⚡ Live Coaching")
+
+    exercise = st.radio("Select Exercise:", list(EXERCISES), horizontal=True, key="live_exercise")
+    source = st.text_input("Camera index, stream URL or video file", value="0", key="live_source")
+    loop = st.checkbox("Loop video file (use a recording as the camera)", key="live_loop")
+    budget_ms = st.slider("Latency budget (ms)", 100, 1000, 250, step=50, key="live_budget")
+
+    col1, col2 = st.columns(2)
+    start = col1.button("▶️ Start", use_container_width=True)
+    stop = col2.button("⏹️ Stop", use_container_width=True)
+
+    if stop:
+        _stop_session()
+
+    if start:
+        _stop_session()
+        # Imported on first use (OpenCV / YOLO stack), not with the page
+        from core.live import LiveSession
+        try:
+            st.session_state.live_session = LiveSession(
+                _parse_source(source),
+                exercise_type=exercise,
+                latency_budget=budget_ms / 1000.0,
+                loop=loop,
+                logger=WorkoutLogger(),
+            ).start()
+        except RuntimeError as e:
+            st.error(str(e))
+
+    session = st.session_state.get("live_session")
+    if not session:
+        st.info("Pick a source and press Start.")
+        return
+
+    # Redraws itself ~10x a second without blocking the script, so the rest of
+    # the page (coach chat included) renders and stays interactive
+    @st.fragment(run_every=0.1)
+    def live_view():
+        if not session.running:
+            st.rerun()  # whole app once more: summary, and this fragment goes away
+        output = session.latest()
+        if output is None:
+            st.caption("Waiting for the first frame...")
+            return
+        st.image(output["frame"], channels="BGR")
+        st.markdown(
+            f"**Reps:** {output['rep_count']} &nbsp; **Feedback:** {output['feedback'] or '-'} "
+            f"&nbsp; **Latency:** {output['latency_ms']} ms "
+            f"&nbsp; **Dropped:** {session.frames_dropped}/{session.frames_captured}"
+        )
+        st.table(session.stats.summary())
+
+    if session.running:
+        live_view()
+        return
+
+    if session.error:
+        st.error(f"Live session stopped: {session.error}")
+    _stop_session()
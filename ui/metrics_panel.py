@@ -0,0 +1,35 @@
+# ui/metrics_panel.py
+import streamlit as st
+from utils.metrics import METRICS
+
+
+def render_metrics_panel():
+    """Sidebar view of utils.metrics: per-stage latency, throughput and memory."""
+    if not st.sidebar.toggle("📈 Performance metrics"):
+        return
+
+    snapshot = METRICS.snapshot()
+    with st.sidebar:
+        if not METRICS.enabled:
+            st.caption("Metrics are off (FITNESS_METRICS=0).")
+            return
+        gauges, counters = snapshot["gauges"], snapshot["counters"]
+        peak = gauges.get("peak_memory_bytes")
+        cols = st.columns(3)
+        cols[0].metric("Videos", counters.get("videos", 0))
+        cols[1].metric("Last FPS", gauges.get("last_video_fps", "-"))
+        cols[2].metric("Peak RAM", f"{peak / 2**20:.0f} MB" if peak else "-")
+        # Coaching chat's knowledge-base retrieval cache (nlp.retrieval_cache)
+        cols = st.columns(3)
+        cols[0].metric("KB cache hits", counters.get("retrieval_cache_hits", 0))
+        cols[1].metric("Semantic hits", counters.get("retrieval_cache_semantic_hits", 0))
+        cols[2].metric("KB cache misses", counters.get("retrieval_cache_misses", 0))
+
+        if snapshot["stages"]:
+            # Video stages are per frame, the rest per call
+            columns = ("count", "mean_ms", "p95_ms", "max_ms", "per_sec")
+            st.dataframe({column: {stage: row[column] for stage, row in snapshot["stages"].items()}
+                          for column in columns})
+        else:
+            st.caption("Nothing measured yet.")
+        st.download_button("Prometheus snapshot", METRICS.render_prometheus(), file_name="metrics.txt")
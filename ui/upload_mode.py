@@ -1,29 +1,36 @@
 # ui/upload_mode.py
-import streamlit as st
-from core.processor import VideoProcessor
-from utils.csv_handler import WorkoutLogger
-from utils.helpers import generate_workout_summary
-import pandas as pd
 import os
+import streamlit as st
+from core.exercises import AUTO_DETECT, EXERCISES
+from utils.helpers import generate_training_history
+from utils.tempfiles import remove_quietly
+from utils.workout_store import get_workout_store
 
 
 def render_upload_mode():
     st.subheader("📹 Workout Analysis")
     
     # NEW: Exercise Selection
-    exercise = st.radio("Select Exercise:", ["Squat", "Bicep Curl", "Overhead Press"], horizontal=True)
+    exercise = st.radio("Select Exercise:", [*EXERCISES, AUTO_DETECT], horizontal=True)
+    fast_mode = st.toggle("⚡ Fast analysis (skip frames away from rep transitions, run pose on a crop around the athlete)")
+    group_mode = st.toggle("👥 Group class (count reps for every athlete in the video)")
+    skip_video = st.toggle("🎞️ Skip annotated video (faster, plays the original upload)")
     
     uploaded_file = st.file_uploader("Upload video", type=["mp4", "mov", "avi"], key="workout_video_uploader")
 
-    if uploaded_file:
-        file_key = f"processed_{uploaded_file.name}_{exercise}" # Key includes exercise type
+    if uploaded_file and group_mode and exercise == AUTO_DETECT:
+        st.info("Auto-detect follows a single athlete. Pick the exercise for group classes.")
+    elif uploaded_file:
+        file_key = f"processed_{uploaded_file.name}_{exercise}_{fast_mode}_{group_mode}_{skip_video}" # Key includes exercise type
 
         if file_key not in st.session_state:
             st.session_state.is_analyzing = True
-            WorkoutLogger().clear_log()
             frame_placeholder = st.empty()
 
-            processor = VideoProcessor()
+            # Imported on first use (OpenCV / YOLO stack), not with the page
+            from core.processor import VideoProcessor
+            processor = VideoProcessor(stride=4 if fast_mode else 1, roi=fast_mode, multi_person=group_mode,
+                                       output="metrics" if skip_video else "video")
             # Pass the exercise type to the processor
             reps, saved_video_path = processor.process_video(
                 uploaded_file, 
@@ -32,23 +39,56 @@ def render_upload_mode():
             )
 
             st.session_state[file_key] = reps
+            # The previous annotated video is no longer shown
+            remove_quietly(st.session_state.get("processed_video_path"))
             st.session_state.processed_video_path = saved_video_path
-            st.session_state.workout_summary = generate_workout_summary()
+            st.session_state.frames_inferred = (processor.frames_inferred, processor.frames_total)
+            st.session_state.athletes = dict(processor.athletes) if group_mode else None
+            st.session_state.detected_exercise = processor.exercise_type if exercise == AUTO_DETECT else None
+            st.session_state.workout_summary = generate_training_history(session_id=processor.session_id,
+                                                                         session_aggregate=processor.logger.aggregate)
+            # Read this upload's reps once here, not on every rerun
+            import pandas as pd
+            st.session_state.rep_log = pd.DataFrame(
+                get_workout_store().fetch(session_id=processor.session_id),
+                columns=["user_id", "rep_count", "primary_metric", "secondary_metric", "error_tag"],
+            )
             st.session_state.is_analyzing = False
             st.rerun()
 
         # --- AFTER ANALYSIS UI ---
         # 1. Play the analyzed video on a loop
+        # (No annotated video when it was skipped, the keypoints came from the cache, or
+        # once the temp folder has been swept -> play the upload itself)
         if "processed_video_path" in st.session_state:
-            st.video(st.session_state.processed_video_path, loop=True, autoplay=True, muted=True)
+            video_path = st.session_state.processed_video_path
+            st.video(video_path if video_path and os.path.exists(video_path) else uploaded_file,
+                     loop=True, autoplay=True, muted=True)
+
+        if "frames_inferred" in st.session_state:
+            inferred, total = st.session_state.frames_inferred
+            st.caption(f"Pose inference ran on {inferred} of {total} frames.")
+
+        if st.session_state.get("detected_exercise"):
+            st.caption(f"Detected exercise: **{st.session_state.detected_exercise}**")
+
+        if st.session_state.get("athletes"):
+            st.markdown("### 👥 Reps per Athlete")
+            st.table([{"athlete": f"#{track_id + 1}", "reps": reps}
+                      for track_id, reps in sorted(st.session_state.athletes.items())])
 
-        # 2. Show logs below the video
-        if os.path.exists("data/logs/workout_log.csv"):
-            df = pd.read_csv("data/logs/workout_log.csv")
-            errors = df[df["error_tag"] != "NONE"].drop_duplicates(subset=["rep_count"])
+        # 2. Show logs below the video (this upload's session only; history is kept)
+        if "rep_log" in st.session_state:
+            df = st.session_state.rep_log
+            columns = ["rep_count", "primary_metric", "secondary_metric", "error_tag"]
+            if st.session_state.get("athletes"):
+                # One row per athlete and rep; athletes are logged as "<user>/athlete-N"
+                df = df.assign(athlete=df["user_id"].str.rsplit("-", n=1).str[-1].radd("#"))
+                columns = ["athlete"] + columns
+            errors = df[df["error_tag"] != "NONE"].drop_duplicates(subset=[c for c in ("athlete", "rep_count") if c in columns])
             st.markdown("### 📊 Form Issue Logs")
             if not errors.empty:
-                display_df = errors[["rep_count", "primary_metric", "secondary_metric", "error_tag"]].copy()
+                display_df = errors[columns].copy()
                 st.table(display_df)
             else:
                 st.success("Perfect form! No issues detected.")
\ No newline at end of file
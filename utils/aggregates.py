@@ -0,0 +1,109 @@
+# utils/aggregates.py
+# Running workout aggregates: rep counts, error counts and metric stats that
+# are updated per rep and read in O(1), whatever the size of the history.
+import math
+
+
+class MetricStats:
+    """Count / sum / sum of squares / min / max of one metric."""
+
+    __slots__ = ("count", "total", "total_sq", "min", "max")
+
+    def __init__(self, count=0, total=0.0, total_sq=0.0, min_val=math.inf, max_val=-math.inf):
+        self.count = count
+        self.total = total
+        self.total_sq = total_sq
+        self.min = min_val
+        self.max = max_val
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(max(self.total_sq / self.count - self.mean ** 2, 0.0))
+
+    def as_dict(self):
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "mean": round(self.mean, 2), "std": round(self.std, 2),
+                "min": round(self.min, 2), "max": round(self.max, 2)}
+
+
+class ExerciseAggregate:
+    __slots__ = ("reps", "errors", "primary", "secondary")
+
+    def __init__(self):
+        self.reps = 0
+        self.errors = {}
+        self.primary = MetricStats()
+        self.secondary = MetricStats()
+
+
+class WorkoutAggregate:
+    """Totals per exercise; add() per rep, or merge() pre-aggregated buckets."""
+
+    def __init__(self):
+        self.exercises = {}
+
+    def _exercise(self, exercise):
+        agg = self.exercises.get(exercise)
+        if agg is None:
+            agg = self.exercises[exercise] = ExerciseAggregate()
+        return agg
+
+    def add(self, exercise, m1, m2, error_tag):
+        agg = self._exercise(exercise)
+        agg.reps += 1
+        tag = error_tag or "NONE"
+        agg.errors[tag] = agg.errors.get(tag, 0) + 1
+        agg.primary.add(m1)
+        agg.secondary.add(m2)
+
+    def merge_bucket(self, exercise, error_tag, reps, primary, secondary):
+        agg = self._exercise(exercise)
+        agg.reps += reps
+        agg.errors[error_tag] = agg.errors.get(error_tag, 0) + reps
+        agg.primary.merge(primary)
+        agg.secondary.merge(secondary)
+
+    @property
+    def total_reps(self):
+        return sum(agg.reps for agg in self.exercises.values())
+
+    def error_counts(self):
+        """{error_tag: count} across exercises, most frequent first, without NONE."""
+        counts = {}
+        for agg in self.exercises.values():
+            for tag, n in agg.errors.items():
+                if tag != "NONE":
+                    counts[tag] = counts.get(tag, 0) + n
+        return dict(sorted(counts.items(), key=lambda kv: -kv[1]))
+
+    def as_dict(self):
+        return {
+            exercise: {
+                "reps": agg.reps,
+                "errors": dict(agg.errors),
+                "primary_metric": agg.primary.as_dict(),
+                "secondary_metric": agg.secondary.as_dict(),
+            }
+            for exercise, agg in self.exercises.items()
+        }
@@ -1,28 +1,65 @@
 # utils/csv_handler.py
-import pandas as pd
-import os
-from datetime import datetime
+import time
+import uuid
+from utils.aggregates import WorkoutAggregate
+from utils.workout_store import DEFAULT_DB, get_workout_store
+
 
 class WorkoutLogger:
-    def __init__(self, filename="data/logs/workout_log.csv"):
+    """
+    Per-session rep logger. Reps are buffered in memory and written to the
+    workout store in batches (every `flush_every` reps and on flush()), each
+    tagged with the session, user and video it came from. History is kept
+    across uploads. `store` replaces the workout store (anything with an
+    append(rows) method).
+    """
+
+    def __init__(self, filename=DEFAULT_DB, user_id="default", video_id=None, flush_every=32, store=None):
         self.filename = filename
-        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
-        if not os.path.isfile(self.filename):
-            self.clear_log()
+        self.store = store if store is not None else get_workout_store(filename)
+        self.user_id = user_id
+        self.video_id = video_id
+        self.session_id = uuid.uuid4().hex
+        self.flush_every = flush_every
+        self.buffer = []
+        # Running totals of the current session, readable without touching the store
+        self.aggregate = WorkoutAggregate()
 
-    def clear_log(self):
-        # Changed headers to be exercise-agnostic
-        df = pd.DataFrame(columns=['timestamp', 'exercise', 'rep_count', 'primary_metric', 'secondary_metric', 'error_tag'])
-        df.to_csv(self.filename, index=False)
+    def start_session(self, video_id=None, user_id=None):
+        """Flushes the current session and starts a new one; returns its id."""
+        self.flush()
+        self.session_id = uuid.uuid4().hex
+        self.aggregate = WorkoutAggregate()
+        self.video_id = video_id
+        if user_id is not None:
+            self.user_id = user_id
+        return self.session_id
 
-    def log_rep(self, exercise, rep_count, m1, m2, error_tag):
-        data = {
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'exercise': exercise,
-            'rep_count': rep_count,
-            'primary_metric': round(m1, 2),
-            'secondary_metric': round(m2, 2),
-            'error_tag': error_tag if error_tag else "NONE"
-        }
-        df = pd.DataFrame([data])
-        df.to_csv(self.filename, mode='a', header=False, index=False)
\ No newline at end of file
+    def log_rep(self, exercise, rep_count, m1, m2, error_tag, user_id=None):
+        """user_id overrides the logger's user for this rep (e.g. one athlete of a group video)."""
+        m1, m2 = round(float(m1), 2), round(float(m2), 2)
+        error_tag = error_tag if error_tag else "NONE"
+        self.aggregate.add(exercise, m1, m2, error_tag)
+        self.buffer.append((
+            time.time(),
+            self.session_id,
+            user_id or self.user_id,
+            self.video_id,
+            exercise,
+            int(rep_count),
+            m1,
+            m2,
+            error_tag,
+        ))
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        rows, self.buffer = self.buffer, []
+        self.store.append(rows)
+
+    def clear_log(self):
+        """Deletes the whole workout history (no longer done on every upload)."""
+        self.buffer = []
+        self.aggregate = WorkoutAggregate()
+        self.store.clear()
@@ -1,61 +1,80 @@
 # utils/helpers.py
-import pandas as pd
+import time
+from utils.metrics import METRICS
+from utils.workout_store import get_workout_store
 
-def generate_workout_summary():
+SECONDS_PER_DAY = 86400
+
+ERROR_PHRASES = {
+    "ELBOW_SWINGING": "Elbow swung forward on {count} bicep curl reps.",
+    "INCOMPLETE_CONTRACTION": "{count} curls were not fully contracted at the top.",
+    "SHALLOW_SQUAT": "{count} squats were slightly shallow.",
+    "CRITICAL_SHALLOW": "{count} squats lacked sufficient depth.",
+    "INCOMPLETE_LOCKOUT": "User didn't fully lock out the arms on {count} shoulder press reps.",
+    "SHORT_RANGE_OF_MOTION": "Hands didn't come down far enough on {count} press reps.",
+    "EXCESSIVE_LEAN": "Back was too horizontal on {count} deadlift reps.",
+    "SQUATTY_DEADLIFT": "Hips sat too low (squatty setup) on {count} deadlift reps.",
+}
+
+
+def summarize_aggregate(agg):
+    """Turns a WorkoutAggregate into the sentences Coach Alex reads."""
+    if agg.total_reps == 0:
+        return "No workout data analyzed yet."
+
+    summary_parts = []
+
+    # ---------------- BASIC STATS ----------------
+    summary_parts.append(f"User completed {agg.total_reps} total reps.")
+
+    # ---------------- ERROR ANALYSIS ----------------
+    errors = agg.error_counts()
+    if not errors:
+        summary_parts.append("Form was consistent across all reps.")
+    else:
+        for err, count in errors.items():
+            phrase = ERROR_PHRASES.get(err)
+            if phrase:
+                summary_parts.append(phrase.format(count=count))
+
+    # ---------------- FINAL SUMMARY ----------------
+    return " ".join(summary_parts)
+
+
+def generate_workout_summary(session_id=None, since=None, until=None, user_id=None, aggregate=None):
     """
-    Reads the workout CSV and generates a concise summary
-    for Coach Alex's memory.
+    Generates a concise summary for Coach Alex's memory.
+
+    By default this covers the latest session; pass since/until (epoch seconds)
+    and/or user_id for other windows, or an in-memory WorkoutAggregate (e.g.
+    WorkoutLogger.aggregate). Reads pre-aggregated buckets, so the cost does
+    not grow with the size of the history.
     """
     try:
-        df = pd.read_csv("data/logs/workout_log.csv")
-
-        if df.empty:
-            return "No workout data analyzed yet."
-
-        summary_parts = []
-
-        # ---------------- BASIC STATS ----------------
-        total_reps = df["rep_count"].max()
-        summary_parts.append(f"User completed {total_reps} total reps.")
-
-        # ---------------- ERROR ANALYSIS ----------------
-        errors = df[df["error_tag"] != "NONE"]
-
-        if errors.empty:
-            summary_parts.append("Form was consistent across all reps.")
-        else:
-            unique_errors = errors["error_tag"].value_counts()
-
-            for err, count in unique_errors.items():
-                if err == "ELBOW_SWINGING":
-                    summary_parts.append(
-                        f"Elbow swung forward on {count} bicep curl reps."
-                    )
-                elif err == "INCOMPLETE_CONTRACTION":
-                    summary_parts.append(
-                        f"{count} curls were not fully contracted at the top."
-                    )
-                elif err == "SHALLOW_SQUAT":
-                    summary_parts.append(
-                        f"{count} squats were slightly shallow."
-                    )
-                elif err == "CRITICAL_SHALLOW":
-                    summary_parts.append(
-                        f"{count} squats lacked sufficient depth."
-                    )
-                elif err == "INCOMPLETE_LOCKOUT":
-                    summary_parts.append(
-                        f"User didn't fully lock out the arms on {count} shoulder press reps."
-                    )
-                elif err == "SHORT_RANGE_OF_MOTION":
-                    summary_parts.append(
-                        f"Hands didn't come down far enough on {count} press reps."
-                    )
-
-        # ---------------- FINAL SUMMARY ----------------
-        return " ".join(summary_parts)
-
-    except FileNotFoundError:
-        return "Workout log not found yet."
+        if aggregate is None:
+            with METRICS.timer("db_load"):
+                store = get_workout_store()
+                if session_id is None and since is None and until is None:
+                    session_id = store.latest_session_id(user_id)
+                    if session_id is None:
+                        return "No workout data analyzed yet."
+                aggregate = store.aggregate(session_id=session_id, user_id=user_id, since=since, until=until)
+        return summarize_aggregate(aggregate)
+
     except Exception as e:
         return f"Workout summary unavailable due to error."
+
+
+def generate_training_history(user_id=None, session_id=None, days=7, session_aggregate=None):
+    """
+    Last session + last `days` days + all time, for the coach prompt.
+    session_aggregate: the running totals of that session (WorkoutLogger.aggregate),
+    read instead of the store.
+    """
+    now = time.time()
+    parts = [
+        f"LAST SESSION: {generate_workout_summary(session_id=session_id, user_id=user_id, aggregate=session_aggregate)}",
+        f"LAST {days} DAYS: {generate_workout_summary(since=now - days * SECONDS_PER_DAY, user_id=user_id)}",
+        f"ALL TIME: {generate_workout_summary(since=0, user_id=user_id)}",
+    ]
+    return " ".join(parts)
@@ -0,0 +1,212 @@
+# utils/metrics.py
+# Process-wide performance metrics: per-stage latency histograms (video decode,
+# inference, rendering, DB loads, retrieval, LLM calls, ...), counters and
+# gauges. Recording is a perf_counter() pair plus a bisect under a lock, so it
+# stays on in production. Read it back as a dict (sidebar panel), Prometheus
+# text (start_metrics_server) or JSON log lines (the "fitness.metrics" logger).
+#
+#   with METRICS.timer("inference", frames=len(batch)):
+#       results = model(batch)
+import bisect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Seconds; per-frame video stages land in the low buckets, LLM calls in the high ones
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIX = "fitness_coach"
+
+log = logging.getLogger("fitness.metrics")
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets (Prometheus layout)."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds, n=1):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += n
+        self.count += n
+        self.sum += seconds * n
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (what histogram_quantile would say)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+def peak_memory_bytes():
+    """Peak resident set size of this process, or None where getrusage is missing."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "frames", "started")
+
+    def __init__(self, metrics, stage, frames):
+        self.metrics, self.stage, self.frames = metrics, stage, frames
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started, self.frames)
+
+
+class Metrics:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def timer(self, stage, frames=1):
+        """
+        Times a block into the stage's histogram. With frames=n the block counts
+        as n samples of duration/n each, so video stages read as seconds per frame.
+        """
+        return _Timer(self, stage, frames)
+
+    def observe(self, stage, seconds, frames=1):
+        if not self.enabled or frames <= 0:
+            return
+        with self.lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.observe(seconds / frames, frames)
+
+    def inc(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[name] = value
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+            self.gauges.clear()
+            self.started = time.time()
+
+    # ---------------- EXPORT ----------------
+    def snapshot(self):
+        """{"stages": {stage: {count, total_s, mean_ms, p50_ms, p95_ms, max_ms, per_sec}}, "counters", "gauges"}."""
+        with self.lock:
+            stages = {
+                stage: {
+                    "count": hist.count,
+                    "total_s": round(hist.sum, 3),
+                    "mean_ms": round(1000.0 * hist.sum / hist.count, 2),
+                    "p50_ms": round(1000.0 * hist.quantile(0.5), 2),
+                    "p95_ms": round(1000.0 * hist.quantile(0.95), 2),
+                    "max_ms": round(1000.0 * hist.max, 2),
+                    # Throughput of the stage on its own (frames/sec for video stages)
+                    "per_sec": round(hist.count / hist.sum, 1) if hist.sum else None,
+                }
+                for stage, hist in sorted(self.stages.items())
+            }
+            counters, gauges = dict(self.counters), dict(self.gauges)
+        gauges["peak_memory_bytes"] = peak_memory_bytes()
+        gauges["uptime_seconds"] = round(time.time() - self.started, 1)
+        return {"stages": stages, "counters": counters, "gauges": gauges}
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        name = f"{PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} Latency per call (per frame for video stages).", f"# TYPE {name} histogram"]
+        with self.lock:
+            for stage, hist in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {hist.sum:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {hist.count}')
+            counters, gauges = dict(self.counters), dict(self.gauges)
+        for key, value in sorted(counters.items()):
+            lines += [f"# TYPE {PREFIX}_{key}_total counter", f"{PREFIX}_{key}_total {value}"]
+        peak = peak_memory_bytes()
+        if peak is not None:
+            gauges["peak_memory_bytes"] = peak
+        for key, value in sorted(gauges.items()):
+            lines += [f"# TYPE {PREFIX}_{key} gauge", f"{PREFIX}_{key} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def log_event(self, event, **fields):
+        """One structured (JSON) log line; free unless the logger is enabled for INFO."""
+        if self.enabled and log.isEnabledFor(logging.INFO):
+            log.info(json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, default=str))
+
+    def log_snapshot(self):
+        self.log_event("metrics", **self.snapshot())
+
+
+# Set FITNESS_METRICS=0 to switch recording off entirely
+METRICS = Metrics(enabled=os.getenv("FITNESS_METRICS", "1") != "0")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # no access log per scrape
+
+
+_SERVER = None
+_SERVER_LOCK = threading.Lock()
+
+
+def start_metrics_server(port=9464, host="0.0.0.0"):
+    """Serves GET /metrics (Prometheus text) from a daemon thread; started once per process."""
+    global _SERVER
+    with _SERVER_LOCK:
+        if _SERVER is None:
+            _SERVER = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _SERVER.daemon_threads = True
+            threading.Thread(target=_SERVER.serve_forever, name="metrics-server", daemon=True).start()
+        return _SERVER
@@ -0,0 +1,84 @@
+# utils/tempfiles.py
+# All temp artifacts (annotated videos, spooled uploads) live in one folder so
+# they can be swept on a schedule instead of piling up in /tmp.
+import os
+import tempfile
+import threading
+import time
+
+TEMP_DIR = os.path.join(tempfile.gettempdir(), "ai_fitness_coach")
+# Annotated videos are shown for the rest of the session, so keep them a while
+DEFAULT_MAX_AGE = 6 * 3600
+
+
+def temp_path(suffix="", temp_dir=TEMP_DIR):
+    """Creates an empty temp file in the app's temp folder and returns its path."""
+    os.makedirs(temp_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=temp_dir)
+    os.close(fd)
+    return path
+
+
+def remove_quietly(path):
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def cleanup_temp_files(max_age=DEFAULT_MAX_AGE, temp_dir=TEMP_DIR):
+    """Deletes temp files not modified for max_age seconds; returns how many went."""
+    if not os.path.isdir(temp_dir):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(temp_dir):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            continue  # already gone or still being written
+    return removed
+
+
+class TempJanitor:
+    """Background thread running cleanup_temp_files every `interval` seconds."""
+
+    def __init__(self, interval=600, max_age=DEFAULT_MAX_AGE, temp_dir=TEMP_DIR):
+        self.interval = interval
+        self.max_age = max_age
+        self.temp_dir = temp_dir
+        self.removed = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="temp-janitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.removed += cleanup_temp_files(self.max_age, self.temp_dir)
+            self._stop.wait(self.interval)
+
+
+_JANITOR = None
+_JANITOR_LOCK = threading.Lock()
+
+
+def start_temp_janitor(interval=600, max_age=DEFAULT_MAX_AGE):
+    """Starts the process-wide janitor once; later calls return the running one."""
+    global _JANITOR
+    with _JANITOR_LOCK:
+        if _JANITOR is None:
+            _JANITOR = TempJanitor(interval, max_age)
+        return _JANITOR.start()
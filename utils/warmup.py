@@ -0,0 +1,56 @@
+# utils/warmup.py
+# Background start-up work (loading the pose model, indexing the knowledge base,
+# importing the LLM client) so the first page renders right away. Each task runs
+# on its own daemon thread; the UI polls status() to show progress.
+import threading
+import time
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+class Warmup:
+    """Runs named zero-argument callables in the background and records how each went."""
+
+    def __init__(self, tasks):
+        self.tasks = dict(tasks)
+        self.state = {name: PENDING for name in self.tasks}
+        self.results = {}
+        self.seconds = {}
+        self.lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        if not self._threads:
+            for name in self.tasks:
+                thread = threading.Thread(target=self._run, args=(name,), name=f"warmup-{name}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        return self
+
+    def _run(self, name):
+        started = time.perf_counter()
+        with self.lock:
+            self.state[name] = RUNNING
+        try:
+            result, state = self.tasks[name](), DONE
+        except Exception as e:
+            result, state = f"{type(e).__name__}: {e}", FAILED
+        with self.lock:
+            self.state[name] = state
+            self.results[name] = result
+            self.seconds[name] = round(time.perf_counter() - started, 1)
+
+    def status(self):
+        """[(name, state, result or None, seconds or None)] in task order."""
+        with self.lock:
+            return [(name, self.state[name], self.results.get(name), self.seconds.get(name)) for name in self.tasks]
+
+    @property
+    def done(self):
+        with self.lock:
+            return all(state in (DONE, FAILED) for state in self.state.values())
+
+    @property
+    def progress(self):
+        with self.lock:
+            return sum(state in (DONE, FAILED) for state in self.state.values()) / max(1, len(self.state))
@@ -0,0 +1,333 @@
+# utils/workout_store.py
+# Append-only workout history in SQLite (WAL mode): safe for many writer
+# processes, indexed for per-user / per-exercise / time-range reads.
+import csv
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from utils.aggregates import MetricStats, WorkoutAggregate
+
+DEFAULT_DB = "data/logs/workout_log.sqlite"
+LEGACY_CSV = "data/logs/workout_log.csv"
+
+COLUMNS = ("ts", "session_id", "user_id", "video_id", "exercise", "rep_count",
+           "primary_metric", "secondary_metric", "error_tag")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reps (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    session_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    video_id TEXT,
+    exercise TEXT NOT NULL,
+    rep_count INTEGER NOT NULL,
+    primary_metric REAL,
+    secondary_metric REAL,
+    error_tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reps_user_ts ON reps (user_id, ts);
+CREATE INDEX IF NOT EXISTS idx_reps_exercise_ts ON reps (exercise, ts);
+CREATE INDEX IF NOT EXISTS idx_reps_ts ON reps (ts);
+CREATE INDEX IF NOT EXISTS idx_reps_session ON reps (session_id);
+
+-- Running totals updated with every insert, so summaries read a handful of
+-- buckets instead of every rep: per session (rollup), per day (rollup_daily),
+-- per hour (rollup_hourly) and per user overall (rollup_total)
+CREATE TABLE IF NOT EXISTS rollup (
+    day INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    exercise TEXT NOT NULL,
+    error_tag TEXT NOT NULL,
+    reps INTEGER NOT NULL,
+    m1_sum REAL NOT NULL, m1_sumsq REAL NOT NULL, m1_min REAL NOT NULL, m1_max REAL NOT NULL,
+    m2_sum REAL NOT NULL, m2_sumsq REAL NOT NULL, m2_min REAL NOT NULL, m2_max REAL NOT NULL,
+    PRIMARY KEY (day, user_id, session_id, exercise, error_tag)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_session ON rollup (session_id);
+CREATE TABLE IF NOT EXISTS rollup_daily (
+    day INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    exercise TEXT NOT NULL,
+    error_tag TEXT NOT NULL,
+    reps INTEGER NOT NULL,
+    m1_sum REAL NOT NULL, m1_sumsq REAL NOT NULL, m1_min REAL NOT NULL, m1_max REAL NOT NULL,
+    m2_sum REAL NOT NULL, m2_sumsq REAL NOT NULL, m2_min REAL NOT NULL, m2_max REAL NOT NULL,
+    PRIMARY KEY (day, user_id, exercise, error_tag)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_daily_user_day ON rollup_daily (user_id, day);
+CREATE TABLE IF NOT EXISTS rollup_hourly (
+    hour INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    exercise TEXT NOT NULL,
+    error_tag TEXT NOT NULL,
+    reps INTEGER NOT NULL,
+    m1_sum REAL NOT NULL, m1_sumsq REAL NOT NULL, m1_min REAL NOT NULL, m1_max REAL NOT NULL,
+    m2_sum REAL NOT NULL, m2_sumsq REAL NOT NULL, m2_min REAL NOT NULL, m2_max REAL NOT NULL,
+    PRIMARY KEY (hour, user_id, exercise, error_tag)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_hourly_user_hour ON rollup_hourly (user_id, hour);
+CREATE TABLE IF NOT EXISTS rollup_total (
+    user_id TEXT NOT NULL,
+    exercise TEXT NOT NULL,
+    error_tag TEXT NOT NULL,
+    reps INTEGER NOT NULL,
+    m1_sum REAL NOT NULL, m1_sumsq REAL NOT NULL, m1_min REAL NOT NULL, m1_max REAL NOT NULL,
+    m2_sum REAL NOT NULL, m2_sumsq REAL NOT NULL, m2_min REAL NOT NULL, m2_max REAL NOT NULL,
+    PRIMARY KEY (user_id, exercise, error_tag)
+);
+"""
+
+SECONDS_PER_DAY = 86400
+SECONDS_PER_HOUR = 3600
+
+# Rollup table -> its bucket key columns
+ROLLUPS = {
+    "rollup": ("day", "user_id", "session_id", "exercise", "error_tag"),
+    "rollup_daily": ("day", "user_id", "exercise", "error_tag"),
+    "rollup_hourly": ("hour", "user_id", "exercise", "error_tag"),
+    "rollup_total": ("user_id", "exercise", "error_tag"),
+}
+# Time buckets a window is cut into, coarsest first: (table, column, seconds)
+_WINDOW_LEVELS = (("rollup_daily", "day", SECONDS_PER_DAY), ("rollup_hourly", "hour", SECONDS_PER_HOUR))
+_STAT_COLUMNS = ("reps", "m1_sum", "m1_sumsq", "m1_min", "m1_max", "m2_sum", "m2_sumsq", "m2_min", "m2_max")
+
+
+def _upsert_sql(table):
+    keys = ROLLUPS[table]
+    columns = keys + _STAT_COLUMNS
+    return f"""
+INSERT INTO {table} ({', '.join(columns)})
+VALUES ({', '.join('?' * len(columns))})
+ON CONFLICT ({', '.join(keys)}) DO UPDATE SET
+    reps = reps + excluded.reps,
+    m1_sum = m1_sum + excluded.m1_sum, m1_sumsq = m1_sumsq + excluded.m1_sumsq,
+    m1_min = MIN(m1_min, excluded.m1_min), m1_max = MAX(m1_max, excluded.m1_max),
+    m2_sum = m2_sum + excluded.m2_sum, m2_sumsq = m2_sumsq + excluded.m2_sumsq,
+    m2_min = MIN(m2_min, excluded.m2_min), m2_max = MAX(m2_max, excluded.m2_max)
+"""
+
+
+_UPSERTS = {table: _upsert_sql(table) for table in ROLLUPS}
+
+
+def _rollup_rows(rows, table):
+    """Collapses rep rows (COLUMNS order) into the buckets of one rollup table."""
+    keys = ROLLUPS[table]
+    buckets = {}
+    for row in rows:
+        values = dict(zip(COLUMNS, row))
+        values["day"] = int(values["ts"] // SECONDS_PER_DAY)
+        values["hour"] = int(values["ts"] // SECONDS_PER_HOUR)
+        key = tuple(values[column] for column in keys)
+        b = buckets.get(key)
+        if b is None:
+            b = buckets[key] = [0, MetricStats(), MetricStats()]
+        b[0] += 1
+        b[1].add(values["primary_metric"] or 0.0)
+        b[2].add(values["secondary_metric"] or 0.0)
+    return [
+        key + (n, p.total, p.total_sq, p.min, p.max, q.total, q.total_sq, q.min, q.max)
+        for key, (n, p, q) in buckets.items()
+    ]
+
+
+def _where(filters, extra=()):
+    """(' WHERE ...', params) for {column: value or None} plus (clause, param) pairs."""
+    clauses, params = [], []
+    for column, value in filters.items():
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    for clause, param in extra:
+        clauses.append(clause)
+        params.append(param)
+    return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+class WorkoutStore:
+    """One SQLite connection per process and database file (see get_workout_store)."""
+
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        is_new = not os.path.exists(self.db_path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+        self._backfill_rollup()
+        if is_new and db_path == DEFAULT_DB and os.path.isfile(LEGACY_CSV):
+            self.import_csv(LEGACY_CSV)
+
+    def append(self, rows):
+        """Inserts rows (tuples in COLUMNS order) in a single transaction."""
+        if not rows:
+            return
+        with self.lock:
+            with self.conn:
+                self._insert(rows)
+
+    def _insert(self, rows):
+        """Reps + rollups; the caller holds the lock and the transaction."""
+        self.conn.executemany(
+            f"INSERT INTO reps ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            rows,
+        )
+        for table, sql in _UPSERTS.items():
+            self.conn.executemany(sql, _rollup_rows(rows, table))
+
+    def fetch(self, session_id=None, user_id=None, exercise=None, since=None, until=None):
+        """Rep rows as dicts, oldest first. since/until are epoch seconds."""
+        extra = [(clause, value) for clause, value in (("ts >= ?", since), ("ts < ?", until)) if value is not None]
+        where, params = _where({"session_id": session_id, "user_id": user_id, "exercise": exercise}, extra)
+        with self.lock:
+            cursor = self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM reps{where} ORDER BY ts, id", params)
+            rows = cursor.fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def aggregate(self, session_id=None, user_id=None, exercise=None, since=None, until=None):
+        """
+        WorkoutAggregate for a window (since/until are epoch seconds, until exclusive).
+
+        All-time windows read the per-user totals. Other windows read whole days
+        from the daily rollup, the whole hours around them from the hourly one and
+        only the partial hours at the edges from the reps themselves, so the window
+        is exact and the cost does not grow with the number of reps or sessions.
+        """
+        agg = WorkoutAggregate()
+        filters = {"user_id": user_id, "exercise": exercise}
+        if since is not None and since <= 0:
+            since = None
+        if session_id is not None:
+            # One session: its rollup buckets, or its reps when cut by time
+            if since is None and until is None:
+                self._merge_rollup(agg, "rollup", {**filters, "session_id": session_id})
+            else:
+                self._merge_reps(agg, {**filters, "session_id": session_id}, since, until)
+            return agg
+        if since is None and until is None:
+            self._merge_rollup(agg, "rollup_total", filters)
+        else:
+            self._merge_window(agg, filters, since, until, _WINDOW_LEVELS)
+        return agg
+
+    def _merge_window(self, agg, filters, since, until, levels):
+        """[since, until): whole buckets of the first level, the rest from finer levels / the reps."""
+        if not levels:
+            self._merge_reps(agg, filters, since, until)
+            return
+        (table, column, size), finer = levels[0], levels[1:]
+        first = None if since is None else int(-(-since // size))
+        end = None if until is None else int(until // size)
+        if first is not None and end is not None and first >= end:
+            self._merge_window(agg, filters, since, until, finer)
+            return
+        extra = []
+        if first is not None:
+            extra.append((f"{column} >= ?", first))
+            if since < first * size:
+                self._merge_window(agg, filters, since, first * size, finer)
+        if end is not None:
+            extra.append((f"{column} < ?", end))
+            if until > end * size:
+                self._merge_window(agg, filters, end * size, until, finer)
+        self._merge_rollup(agg, table, filters, extra)
+
+    def _merge_rollup(self, agg, table, filters, extra=()):
+        where, params = _where(filters, extra)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT exercise, error_tag, SUM(reps), SUM(m1_sum), SUM(m1_sumsq), MIN(m1_min), MAX(m1_max),"
+                " SUM(m2_sum), SUM(m2_sumsq), MIN(m2_min), MAX(m2_max)"
+                f" FROM {table}{where} GROUP BY exercise, error_tag",
+                params,
+            ).fetchall()
+        for exercise_name, error_tag, reps, s1, q1, lo1, hi1, s2, q2, lo2, hi2 in rows:
+            agg.merge_bucket(exercise_name, error_tag, reps,
+                             MetricStats(reps, s1, q1, lo1, hi1), MetricStats(reps, s2, q2, lo2, hi2))
+
+    def _merge_reps(self, agg, filters, since=None, until=None):
+        extra = [(clause, value) for clause, value in (("ts >= ?", since), ("ts < ?", until)) if value is not None]
+        where, params = _where(filters, extra)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT exercise, primary_metric, secondary_metric, error_tag FROM reps{where}", params
+            ).fetchall()
+        for exercise_name, m1, m2, error_tag in rows:
+            agg.add(exercise_name, m1 or 0.0, m2 or 0.0, error_tag)
+
+    def _backfill_rollup(self):
+        """Builds rollup tables that are empty while there are reps (databases created before them)."""
+        with self.lock:
+            if not self.conn.execute("SELECT 1 FROM reps LIMIT 1").fetchone():
+                return
+            empty = [table for table in ROLLUPS
+                     if not self.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()]
+            if not empty:
+                return
+            rows = self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM reps").fetchall()
+            with self.conn:
+                for table in empty:
+                    self.conn.executemany(_UPSERTS[table], _rollup_rows(rows, table))
+
+    def latest_session_id(self, user_id=None):
+        query = "SELECT session_id FROM reps"
+        params = []
+        if user_id is not None:
+            query += " WHERE user_id = ?"
+            params.append(user_id)
+        with self.lock:
+            row = self.conn.execute(query + " ORDER BY ts DESC, id DESC LIMIT 1", params).fetchone()
+        return row[0] if row else None
+
+    def append_session(self, session_id, rows):
+        """
+        Inserts all rows of one session in a single transaction, unless that
+        session is already stored -> True if inserted. Makes retried writes
+        (e.g. a batch job rerun after a crash) idempotent.
+        """
+        with self.lock:
+            with self.conn:
+                if self.conn.execute("SELECT 1 FROM reps WHERE session_id = ? LIMIT 1", (session_id,)).fetchone():
+                    return False
+                self._insert(rows)
+        return True
+
+    def clear(self):
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM reps")
+                for table in ROLLUPS:
+                    self.conn.execute(f"DELETE FROM {table}")
+
+    def import_csv(self, path, session_id="legacy-csv", user_id="default"):
+        """One-off import of the old workout_log.csv format."""
+        rows = []
+        with open(path, newline="") as f:
+            for r in csv.DictReader(f):
+                try:
+                    ts = datetime.strptime(r["timestamp"], "%Y-%m-%d %H:%M:%S").timestamp()
+                except (KeyError, ValueError):
+                    ts = time.time()
+                rows.append((ts, session_id, user_id, None, r.get("exercise", ""), int(r.get("rep_count") or 0),
+                             float(r.get("primary_metric") or 0), float(r.get("secondary_metric") or 0),
+                             r.get("error_tag") or "NONE"))
+        self.append(rows)
+
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_workout_store(db_path=DEFAULT_DB):
+    with _STORES_LOCK:
+        store = _STORES.get(db_path)
+        if store is None:
+            store = _STORES[db_path] = WorkoutStore(db_path)
+        return store